@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Homomorphic aggregation over `transactions.amount_enc`.
+
+Totals are computed by multiplying Paillier ciphertexts together (which adds
+the plaintexts) and decrypting only the final product. Two paths:
+
+- encrypted_total(): streams amount_enc in chunks and multiplies them in
+  parallel across a process pool (full scan, used for audits and rebuilds).
+- running_total(): O(1) read of the `encrypted_totals` collection, which
+  record_transfer() / record_reversal() keep up to date at write time.
+
+The all-users total is spread over GLOBAL_SHARDS documents (one picked at
+random per write) so transfers do not all contend on one document; reads
+multiply the shards together. An update that still loses its optimistic
+retries is logged and queued in `encrypted_total_pending`; reads include
+queued ciphertexts, and `fold` merges them into the totals.
+
+Usage:
+  python3 aggregation.py total [--user USERNAME] [--direction sent|received] [--workers N]
+  python3 aggregation.py running [--user USERNAME] [--direction sent|received]
+  python3 aggregation.py rebuild
+  python3 aggregation.py fold
+"""
+
+import os
+import sys
+import random
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pymongo.errors import DuplicateKeyError
+from homomorphic import get_paillier
+from searchable_encryption import token_for
+from ledger import DIRECTION_FIELDS, user_filter
+from storage_codec import encode_ciphertext, decode_ciphertext, ciphertext_width
+from runtime import env_int
+
+logger = logging.getLogger(__name__)
+
+
+GLOBAL_ID = "global"
+GLOBAL_SHARDS = max(1, env_int("SAFEPAY_TOTAL_SHARDS", 8))
+# Reversed (undone) transactions are excluded from every total
+NOT_REVERSED = {"reversed": {"$ne": True}}
+
+
+def _encode(c):
+    return encode_ciphertext(c, ciphertext_width(get_paillier().nsquare))
+
+
+def multiply_chunk(nsquare, values):
+    """Product of the ciphertexts in `values` mod n^2 (worker entry point)."""
+    product = 1
+    for value in values:
+        c = decode_ciphertext(value)
+        if c is not None:
+            product = (product * c) % nsquare
+    return product
+
+
+def _chunks(cursor, size):
+    chunk = []
+    for doc in cursor:
+        chunk.append(doc.get("amount_enc"))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def user_query(username=None, direction="sent"):
+    """Filter selecting one user's sent/received transactions (all if None)."""
+    if username is None:
+        return dict(NOT_REVERSED)
+    return dict(NOT_REVERSED, **user_filter(username, direction))
+
+
+def encrypted_total(db, query=None, workers=1, chunk_size=2000, batch_size=2000):
+    """Encrypted sum (a ciphertext) of amount_enc over transactions matching `query`.
+
+    Chunks are multiplied in a process pool with at most 2 x workers chunks
+    in flight, so memory stays bounded for any collection size.
+    """
+    nsquare = get_paillier().nsquare
+    if query is None:
+        query = NOT_REVERSED
+    cursor = db.transactions.find(query, {"_id": 0, "amount_enc": 1}).batch_size(batch_size)
+    # 1 is a valid encryption of 0 (r = 1)
+    total = 1
+    if workers <= 1:
+        for chunk in _chunks(cursor, chunk_size):
+            total = (total * multiply_chunk(nsquare, chunk)) % nsquare
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for chunk in _chunks(cursor, chunk_size):
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total = (total * future.result()) % nsquare
+            in_flight.add(pool.submit(multiply_chunk, nsquare, chunk))
+        for future in wait(in_flight).done:
+            total = (total * future.result()) % nsquare
+    return total
+
+
+def decrypt_total(ciphertext):
+    """Decrypt an encrypted total to rupees."""
+    return get_paillier().decrypt(int(ciphertext)) / 100.0
+
+
+# ---------------- RUNNING TOTALS ----------------
+def _global_ids():
+    # The unsharded GLOBAL_ID doc is where rebuild writes the whole total
+    return [GLOBAL_ID] + [f"{GLOBAL_ID}:{i}" for i in range(GLOBAL_SHARDS)]
+
+
+def _global_shard():
+    return f"{GLOBAL_ID}:{random.randrange(GLOBAL_SHARDS)}"
+
+
+def _try_add(db, doc_id, field, ciphertext, retries):
+    """Multiply `ciphertext` into encrypted_totals[doc_id][field]; False if every retry lost.
+
+    Ciphertext products can't be computed server-side, so this is an
+    optimistic read-modify-write guarded by a version counter.
+    """
+    paillier = get_paillier()
+    for _ in range(retries):
+        doc = db.encrypted_totals.find_one({"_id": doc_id})
+        if doc is None:
+            try:
+                db.encrypted_totals.insert_one({"_id": doc_id, field: _encode(ciphertext), "version": 1})
+                return True
+            except DuplicateKeyError:
+                continue
+        current = decode_ciphertext(doc.get(field))
+        new_value = ciphertext if current is None else paillier.add_ciphertexts(current, ciphertext)
+        result = db.encrypted_totals.update_one(
+            {"_id": doc_id, "version": doc["version"]},
+            {"$set": {field: _encode(new_value)}, "$inc": {"version": 1}},
+        )
+        if result.modified_count:
+            return True
+    return False
+
+
+def _add_to_running_total(db, doc_id, field, ciphertext, retries=20):
+    """_try_add(), queueing the ciphertext for a later fold if it keeps losing."""
+    if _try_add(db, doc_id, field, ciphertext, retries):
+        return True
+    logger.warning("encrypted total %s.%s: %d update conflicts, queued for fold", doc_id, field, retries)
+    db.encrypted_total_pending.insert_one({"doc_id": doc_id, "field": field, "c": _encode(ciphertext)})
+    return False
+
+
+def fold_pending(db, limit=0):
+    """Merge queued ciphertexts into their running totals; returns how many.
+
+    Each entry is claimed with find_one_and_delete, so concurrent folds never
+    apply one twice. An entry that still cannot be applied is put back.
+    """
+    folded = 0
+    while not limit or folded < limit:
+        entry = db.encrypted_total_pending.find_one_and_delete({}, sort=[("_id", 1)])
+        if entry is None:
+            break
+        if not _try_add(db, entry["doc_id"], entry["field"], decode_ciphertext(entry["c"]), 20):
+            entry.pop("_id")
+            db.encrypted_total_pending.insert_one(entry)
+            logger.warning("fold of %s.%s lost every retry; left queued", entry["doc_id"], entry["field"])
+            break
+        folded += 1
+    return folded
+
+
+def _add_for_transfer(db, customer_token, receiver_token, ciphertext):
+    _add_to_running_total(db, customer_token, "sent_enc", ciphertext)
+    _add_to_running_total(db, receiver_token, "received_enc", ciphertext)
+    _add_to_running_total(db, _global_shard(), "sent_enc", ciphertext)
+
+
+def record_transfer(db, customer_token, receiver_token, amount_enc):
+    """Fold a new transaction's stored amount_enc into the running totals."""
+    ciphertext = decode_ciphertext(amount_enc)
+    if ciphertext is None:
+        return
+    _add_for_transfer(db, customer_token, receiver_token, ciphertext)
+
+
+def record_reversal(db, customer_token, receiver_token, amount):
+    """Subtract a reversed amount: add an encryption of -amount (mod n)."""
+    paillier = get_paillier()
+    ciphertext = paillier.encrypt(paillier.n - int(round(amount * 100)))
+    _add_for_transfer(db, customer_token, receiver_token, ciphertext)
+
+
+def record_reversals(db, reversals):
+    """record_reversal() for many (customer_token, receiver_token, amount).
+
+    Amounts are netted per running total first, so each total gets one
+    encryption and one update however many reversals touch it.
+    """
+    cents = {}
+    global_shard = _global_shard()
+    for customer_token, receiver_token, amount in reversals:
+        value = int(round(amount * 100))
+        for key in ((customer_token, "sent_enc"), (receiver_token, "received_enc"), (global_shard, "sent_enc")):
+            cents[key] = cents.get(key, 0) + value
+    paillier = get_paillier()
+    for (doc_id, field), value in cents.items():
+        _add_to_running_total(db, doc_id, field, paillier.encrypt(paillier.n - value))
+
+
+def running_total(db, username=None, direction="sent"):
+    """Encrypted running total (a ciphertext, or None if nothing recorded).
+
+    Includes ciphertexts still queued for a fold.
+    """
+    doc_ids = _global_ids() if username is None else [token_for(username)]
+    field = "sent_enc" if username is None else f"{direction}_enc"
+    parts = [decode_ciphertext(doc.get(field))
+             for doc in db.encrypted_totals.find({"_id": {"$in": doc_ids}}, {field: 1})]
+    parts += [decode_ciphertext(doc["c"])
+              for doc in db.encrypted_total_pending.find({"doc_id": {"$in": doc_ids}, "field": field}, {"c": 1})]
+    parts = [c for c in parts if c is not None]
+    if not parts:
+        return None
+    nsquare = get_paillier().nsquare
+    total = 1
+    for c in parts:
+        total = (total * c) % nsquare
+    return total
+
+
+def rebuild_running_totals(db, batch_size=2000):
+    """Recompute every running total in one pass over transactions.
+
+    The new totals are written to a scratch collection and renamed over
+    `encrypted_totals` in one step, so readers never see a partial set and
+    concurrent updates never hit duplicate keys. Updates made while the scan
+    runs land on the old collection and are lost with it: run this when
+    transfers are paused (or re-run it afterwards).
+    """
+    nsquare = get_paillier().nsquare
+    totals = {GLOBAL_ID: {}}
+    fields = {"_id": 0, "amount_enc": 1, "customer_token": 1, "receiver_token": 1}
+    for doc in db.transactions.find(NOT_REVERSED, fields).batch_size(batch_size):
+        c = decode_ciphertext(doc.get("amount_enc"))
+        if c is None:
+            continue
+        for doc_id, field in ((GLOBAL_ID, "sent_enc"),
+                              (doc.get("customer_token"), "sent_enc"),
+                              (doc.get("receiver_token"), "received_enc")):
+            if doc_id:
+                entry = totals.setdefault(doc_id, {})
+                entry[field] = (entry.get(field, 1) * c) % nsquare
+
+    scratch = db["encrypted_totals_rebuild"]
+    scratch.drop()
+    scratch.insert_many([
+        dict({"_id": doc_id, "version": 1}, **{f: _encode(v) for f, v in entry.items()})
+        for doc_id, entry in totals.items()
+    ])
+    scratch.rename("encrypted_totals", dropTarget=True)
+    # Queued ciphertexts belong to transactions the scan has just counted
+    db.encrypted_total_pending.delete_many({})
+    return len(totals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypted transaction totals")
+    parser.add_argument("command", choices=["total", "running", "rebuild", "fold"])
+    parser.add_argument("--user", help="username (default: all transactions)")
+    parser.add_argument("--direction", choices=sorted(DIRECTION_FIELDS), default="sent")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    from mongo_client import get_db
+    db = get_db()
+    who = args.user or "all users"
+    if args.command == "total":
+        total = encrypted_total(db, user_query(args.user, args.direction), workers=args.workers)
+        print(f"Total {args.direction} ({who}, full scan): ₹{decrypt_total(total):,.2f}")
+    elif args.command == "running":
+        total = running_total(db, args.user, args.direction)
+        amount = decrypt_total(total) if total is not None else 0.0
+        print(f"Total {args.direction} ({who}, running): ₹{amount:,.2f}")
+    elif args.command == "fold":
+        print(f"✓ Folded {fold_pending(db)} queued updates")
+    else:
+        count = rebuild_running_totals(db)
+        print(f"✓ Rebuilt {count} running totals")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,70 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 import os
-from pymongo import MongoClient, ReturnDocument
+import mongo_client
 from encryption import encrypt_data, decrypt_data
-from hashing import generate_hash, verify_password, hash_password
-from digital_signature import sign_data, verify_signature
-from model_predict import predict_fraud, predict_fraud_augmented
+from hashing import generate_hash, hash_password
+from digital_signature import sign_data, verify_signature, load_keys, SCHEME as SIGNATURE_SCHEME
+from model_predict import load_model
+from scoring import score_transaction
 from homomorphic import get_paillier
 from searchable_encryption import token_for
+from transfer import transfer_funds
+from reversal import reverse_logs, MAX_BATCH as REVERSAL_MAX_BATCH
+from pagination import keyset_page
+from ledger import user_transactions, ledger_row, LEDGER_FIELDS
+from indexes import ensure_indexes
+import aggregation
+import rollups
+import cache
+import login_guard
+from storage_codec import encode_ciphertext, ciphertext_width, encode_security_fields, decode_security_fields
 from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = "safepay_secret"
 
-# Paillier homomorphic instance (used for additive homomorphic operations)
-paillier = get_paillier()
+# Behind N reverse proxies (Render, Railway, ...) take the client IP from
+# X-Forwarded-For so login rate limits are per client, not per proxy
+_trusted_proxies = int(os.environ.get("SAFEPAY_TRUSTED_PROXIES", "0") or 0)
+if _trusted_proxies:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=_trusted_proxies)
 
-def get_db():
-    uri = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/safepay")
-    client = MongoClient(uri)
-    db = client.get_default_database()
-    if db is None:
-        db = client["safepay"]
+def warm_up():
+    """Load the fraud model, signing key and Paillier keys up front.
+
+    Everything here is otherwise loaded lazily on first use. Gunicorn calls
+    this in the master when preloading (see gunicorn.conf.py) so forked
+    workers share the loaded state copy-on-write instead of each paying for
+    it on their first request.
+    """
+    load_model()
+    load_keys()
+    get_paillier()
+
+_indexes_ready = False
+_indexes_retry_at = 0.0
+# Seconds before retrying a failed ensure_indexes()
+INDEXES_RETRY_SECONDS = 60
 
+
+def get_db():
+    # Shared, per-process connection pool (see mongo_client.py)
+    global _indexes_ready, _indexes_retry_at
+    db = mongo_client.get_db()
+    if not _indexes_ready and time.monotonic() >= _indexes_retry_at:
+        # Idempotent; once per process so every query shape has its index
+        try:
+            ensure_indexes(db)
+            _indexes_ready = True
+        except Exception:
+            # Serve the request anyway; back off so every request doesn't retry
+            _indexes_retry_at = time.monotonic() + INDEXES_RETRY_SECONDS
+            logger.exception("ensure_indexes failed; retrying in %ds", INDEXES_RETRY_SECONDS)
     return db
 
 # ---------------- LOGIN ----------------
@@ -33,9 +76,15 @@ def login():
         role = request.form["role"]
 
         db = get_db()
-        user = db.users.find_one({"username": username, "role": role})
-
-        if user and verify_password(password, user.get("password", "")):
+        try:
+            # Rate limited, bounded PBKDF2 off the request thread (see login_guard.py)
+            user = login_guard.check_login(db, username, password, role, request.remote_addr or "")
+        except login_guard.RateLimited as e:
+            return str(e), 429
+        except login_guard.LoginBusy:
+            return "Too many logins in progress. Try again shortly.", 503, {"Retry-After": "1"}
+
+        if user:
             session["user"] = username
             session["role"] = role
             return redirect(url_for("dashboard"))
@@ -44,6 +93,34 @@ def login():
     return render_template("login.html")
 
 # ---------------- DASHBOARD ----------------
+ADMIN_PAGE_SIZE = 50
+USER_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NOTIFICATION_LIMIT = 20
+USER_TXN_FIELDS = {
+    "receiver_id": 1, "amount": 1, "txntype": 1, "merchant": 1, "balance": 1,
+    "fraud_status": 1, "verified": 1,
+}
+ADMIN_TXN_FIELDS = {
+    "customer_id": 1, "receiver_id": 1, "amount": 1, "txntype": 1, "card_type": 1,
+    "expiry_date": 1, "fraud_status": 1, "verified": 1, "hash": 1, "signature": 1, "signature_hex": 1, "enc_data": 1,
+}
+
+def _txn_row(txn):
+    """A user-facing transaction row (JSON-safe, no _id)."""
+    return {k: v for k, v in txn.items() if k != "_id"}
+
+
+def _load_balance(db, username):
+    u = db.users.find_one({"username": username}, {"_id": 0, "balance": 1})
+    return float(u.get("balance", 0.0)) if u else 0.0
+
+
+def _load_first_page(db, username):
+    txns, next_cursor = user_transactions(db, username, "sent", USER_TXN_FIELDS, USER_PAGE_SIZE)
+    return {"rows": [_txn_row(t) for t in txns], "next_cursor": next_cursor}
+
+
 @app.route("/dashboard")
 def dashboard():
     if "user" not in session:
@@ -51,21 +128,106 @@ def dashboard():
     
     db = get_db()
     if session["role"] == "admin":
-        users = list(db.users.find({}, {"_id": 0, "username": 1, "role": 1, "balance": 1}))
-        txns = list(db.transactions.find({}, {"_id": 0}).sort("_id", -1))
+        users = list(db.users.find({}, {"_id": 0, "username": 1, "role": 1, "balance": 1}).sort("username", 1))
+        # One page of transactions (keyset on _id) with only the displayed fields
+        try:
+            txns, next_cursor = keyset_page(
+                db.transactions, {}, ADMIN_TXN_FIELDS, ADMIN_PAGE_SIZE, request.args.get("cursor")
+            )
+        except ValueError:
+            return redirect(url_for("dashboard"))
+        # Binary security fields back to the displayed base64/hex strings
+        txns = [dict(t, **decode_security_fields(t)) for t in txns]
+        # Header counters come from the precomputed rollups (see rollups.py)
+        stats = rollups.get_stats(db)
         # Get transaction logs for admin
         logs = list(db.transaction_logs.find({}).sort("timestamp", -1).limit(100))
-        return render_template("admin_dashboard.html", users=users, txns=txns, logs=logs)
+        return render_template(
+            "admin_dashboard.html",
+            users=users,
+            txns=txns,
+            logs=logs,
+            stats=stats,
+            next_cursor=next_cursor,
+            is_first_page=not request.args.get("cursor"),
+        )
     else:
-        u = db.users.find_one({"username": session["user"]}, {"_id": 0, "balance": 1})
-        balance = float(u.get("balance", 0.0)) if u else 0.0
-        data = list(db.transactions.find({"customer_id": session["user"]}, {"_id": 0}).sort("_id", -1))
-        # Get unread notifications for the user
-        notifications = list(db.notifications.find({
-            "user_id": session["user"],
-            "read": False
-        }).sort("timestamp", -1))
-        return render_template("dashboard.html", data=data, balance=balance, notifications=notifications)
+        user = session["user"]
+        # Balance, first history page and unread count are cached per user
+        # (see cache.py) and invalidated by transfers, undo and mark-read
+        balance = cache.cached("balance", user, lambda: _load_balance(db, user))
+        # First page only; the rest is fetched from /api/transactions on scroll
+        history = cache.cached("history", user, lambda: _load_first_page(db, user))
+        unread = cache.cached("unread", user, lambda: db.notifications.count_documents(
+            {"user_id": user, "read": False}
+        ))
+        stats = rollups.get_user_stats(db, user)
+        # Get unread notifications for the user (skipped when there are none)
+        notifications = []
+        if unread:
+            notifications = list(db.notifications.find({
+                "user_id": user,
+                "read": False
+            }).sort("timestamp", -1).limit(NOTIFICATION_LIMIT))
+        return render_template(
+            "dashboard.html",
+            data=history["rows"],
+            balance=balance,
+            notifications=notifications,
+            stats=stats,
+            next_cursor=history["next_cursor"],
+        )
+
+# ---------------- TRANSACTIONS API ----------------
+@app.route("/api/transactions")
+def api_transactions():
+    """One page of the user's transactions, newest first, as JSON."""
+    if "user" not in session:
+        return jsonify(error="login required"), 401
+
+    limit = min(max(request.args.get("limit", USER_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    db = get_db()
+    try:
+        txns, next_cursor = user_transactions(
+            db, session["user"], "sent", USER_TXN_FIELDS, limit, request.args.get("cursor")
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(transactions=[_txn_row(t) for t in txns], next_cursor=next_cursor)
+
+# ---------------- LEDGER ----------------
+def _ledger_page(db, user):
+    """(rows, next_cursor, direction) for the ledger query string; ValueError if invalid."""
+    direction = request.args.get("direction", "all")
+    limit = min(max(request.args.get("limit", USER_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    txns, next_cursor = user_transactions(
+        db, user, direction, LEDGER_FIELDS, limit, request.args.get("cursor")
+    )
+    return [ledger_row(t, user) for t in txns], next_cursor, direction
+
+
+@app.route("/ledger")
+def ledger():
+    """Sent and received transactions in one list, newest first."""
+    if "user" not in session or session["role"] == "admin":
+        return redirect("/")
+    try:
+        rows, next_cursor, direction = _ledger_page(get_db(), session["user"])
+    except ValueError:
+        return redirect(url_for("ledger"))
+    return render_template("ledger.html", rows=rows, next_cursor=next_cursor, direction=direction)
+
+
+@app.route("/api/ledger")
+def api_ledger():
+    """One page of the user's ledger as JSON (?direction=all|sent|received&cursor=&limit=)."""
+    if "user" not in session:
+        return jsonify(error="login required"), 401
+    try:
+        rows, next_cursor, _ = _ledger_page(get_db(), session["user"])
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(transactions=rows, next_cursor=next_cursor)
 
 # ---------------- TRANSACTION ----------------
 @app.route("/transaction", methods=["GET", "POST"])
@@ -92,43 +254,9 @@ def transaction():
         }
 
         db = get_db()
-        try:
-            if base_data["Customer_ID"] == base_data["Receiver_ID"]:
-                raise ValueError("Cannot transfer to self")
-
-            sender = db.users.find_one({"username": base_data["Customer_ID"]})
-            if not sender:
-                raise ValueError("Sender not found")
-            sender_balance = float(sender.get("balance", 0.0))
-            amount = float(base_data["Transaction_Amount"])
-            if amount <= 0 or sender_balance < amount:
-                raise ValueError("Insufficient balance")
-
-            receiver = db.users.find_one({"username": base_data["Receiver_ID"]})
-            if not receiver:
-                raise ValueError("Receiver not found")
-            receiver_balance = float(receiver.get("balance", 0.0))
-
-            new_sender_balance = sender_balance - amount
-            new_receiver_balance = receiver_balance + amount
-
-            updated_sender = db.users.find_one_and_update(
-                {"username": base_data["Customer_ID"], "balance": sender_balance},
-                {"$set": {"balance": new_sender_balance}},
-                return_document=ReturnDocument.AFTER
-            )
-            if not updated_sender:
-                raise ValueError("Concurrent update detected for sender; please retry")
-
-            updated_receiver = db.users.find_one_and_update(
-                {"username": base_data["Receiver_ID"], "balance": receiver_balance},
-                {"$set": {"balance": new_receiver_balance}},
-                return_document=ReturnDocument.AFTER
-            )
-            if not updated_receiver:
-                db.users.update_one({"username": base_data["Customer_ID"]}, {"$set": {"balance": sender_balance}})
-                raise ValueError("Concurrent update detected for receiver; please retry")
+        amount = float(base_data["Transaction_Amount"])
 
+        def build_documents(sender_balance):
             data = dict(base_data)
             data["Account_Balance"] = sender_balance
 
@@ -138,18 +266,19 @@ def transaction():
             signature = sign_data(hash_value)
             verified = verify_signature(hash_value, signature)
 
-            # Use augmented model for fraud prediction
-            fraud_status = predict_fraud_augmented(data)
+            # Use augmented model for fraud prediction (micro-batched across requests)
+            fraud_status = score_transaction(data)
 
-            # Insert transaction
             # Store homomorphic encryption of amount (as integer cents) and searchable tokens
             try:
                 amount_cents = int(round(amount * 100))
+                paillier = get_paillier()
                 amount_cipher = paillier.encrypt(amount_cents)
-                amount_cipher_str = str(amount_cipher)
+                # Fixed-width binary, see storage_codec.py
+                amount_enc = encode_ciphertext(amount_cipher, ciphertext_width(paillier.nsquare))
             except Exception:
                 # Fallback: if homomorphic encryption fails, leave blank but do not interrupt transaction
-                amount_cipher_str = ""
+                amount_enc = ""
 
             try:
                 customer_token = token_for(data["Customer_ID"])
@@ -158,7 +287,7 @@ def transaction():
                 customer_token = ""
                 receiver_token = ""
 
-            txn_result = db.transactions.insert_one({
+            txn_doc = {
                 "customer_id": data["Customer_ID"],
                 "receiver_id": data["Receiver_ID"],
                 "name": data["Customer_Name"],
@@ -169,52 +298,67 @@ def transaction():
                 "branch": data["Bank_Branch"],
                 "acc_type": data["Account_Type"],
                 "amount": amount,
-                "amount_enc": amount_cipher_str,
+                "amount_enc": amount_enc,
                 "txntype": data["Transaction_Type"],
                 "merchant": data["Merchant_Category"],
-                "balance": new_sender_balance,
+                # balance (after the debit) is filled in by the transfer engine
                 "expiry_date": data["Expiry_Date"],
                 "card_type": data["Card_Type"],
-                "enc_data": enc_data,
-                "hash": hash_value,
-                "signature_hex": signature.hex() if hasattr(signature, "hex") else str(signature),
+                # enc_data, hash and signature as raw bytes (see storage_codec.py)
+                **encode_security_fields(enc_data, hash_value, signature),
+                "signature_scheme": SIGNATURE_SCHEME,
                 "verified": bool(verified),
                 "fraud_status": fraud_status,
                 "customer_token": customer_token,
                 "receiver_token": receiver_token
-            })
-            
-            # Log transaction
-            db.transaction_logs.insert_one({
-                "transaction_id": str(txn_result.inserted_id),
+            }
+
+            # Log transaction (transaction_id, filled in by the transfer engine,
+            # references the transaction)
+            log_doc = {
                 "customer_id": data["Customer_ID"],
                 "receiver_id": data["Receiver_ID"],
                 "amount": amount,
                 "timestamp": datetime.now(),
                 "fraud_flagged": fraud_status == "Fraudulent",
                 "status": "completed",
-                "sender_balance_before": sender_balance,
-                "sender_balance_after": new_sender_balance,
-                "receiver_balance_before": receiver_balance,
-                "receiver_balance_after": new_receiver_balance,
+                # *_balance_before/after are filled in by the transfer engine
                 "expiry_date": data["Expiry_Date"],
                 "card_type": data["Card_Type"],
                 "can_undo": True,
-                "enc_data": enc_data,
+                # enc_data, hash and signature live only on the transaction
                 "verified": bool(verified),
-                "hash": hash_value,
-                "signature_hex": signature.hex() if hasattr(signature, "hex") else str(signature)
-            })
+            }
+            return txn_doc, log_doc
+
+        try:
+            # Debit, credit and both inserts without read-then-write races (see transfer.py)
+            result = transfer_funds(db, base_data["Customer_ID"], base_data["Receiver_ID"], amount, build_documents)
         except Exception as e:
             return str(e)
+        cache.invalidate_user(base_data["Customer_ID"], base_data["Receiver_ID"])
+
+        try:
+            # Keep the encrypted per-user totals and admin rollups current
+            aggregation.record_transfer(
+                db,
+                result.transaction["customer_token"],
+                result.transaction["receiver_token"],
+                result.transaction["amount_enc"],
+            )
+            rollups.record_transaction(db, result.transaction)
+        except Exception:
+            # The money has moved; both can be rebuilt with `aggregation.py rebuild`
+            # and `rollups.py reconcile`
+            logger.exception("running totals / rollups not updated")
 
         return render_template(
             "transaction_result.html",
-            fraud_status=fraud_status,
-            verified=verified,
+            fraud_status=result.transaction["fraud_status"],
+            verified=result.transaction["verified"],
             amount=amount,
             receiver=base_data["Receiver_ID"],
-            new_balance=new_sender_balance
+            new_balance=result.transaction["balance"]
         )
 
     return render_template("transaction.html")
@@ -242,6 +386,7 @@ def signup():
             "role": role,
             "balance": initial_balance
         })
+        rollups.record_user(db)
         return redirect(url_for("login"))
 
     return render_template("signup.html")
@@ -254,117 +399,136 @@ def undo_transaction(log_id):
     
     db = get_db()
     try:
-        from bson.objectid import ObjectId
-        
-        # Get the transaction log
-        log = db.transaction_logs.find_one({"_id": ObjectId(log_id)})
-        if not log:
-            return "Transaction log not found"
-        
-        if not log.get("can_undo", False):
-            return "Transaction cannot be undone"
-        
-        if log.get("status") == "undone":
-            return "Transaction already undone"
-        
-        # Reverse the transaction
-        sender_id = log["customer_id"]
-        receiver_id = log["receiver_id"]
-        amount = log["amount"]
-        
-        # Get current balances
-        sender = db.users.find_one({"username": sender_id})
-        receiver = db.users.find_one({"username": receiver_id})
-        
-        if not sender or not receiver:
-            return "User not found"
-        
-        sender_balance = float(sender.get("balance", 0.0))
-        receiver_balance = float(receiver.get("balance", 0.0))
-        
-        # Reverse: add back to sender, deduct from receiver
-        new_sender_balance = sender_balance + amount
-        new_receiver_balance = receiver_balance - amount
-        
-        if new_receiver_balance < 0:
-            return "Cannot undo: Receiver has insufficient balance"
-        
-        # Update balances
-        db.users.update_one({"username": sender_id}, {"$set": {"balance": new_sender_balance}})
-        db.users.update_one({"username": receiver_id}, {"$set": {"balance": new_receiver_balance}})
-        
-        # Create notifications for both sender and receiver
-        timestamp = datetime.now()
-        notification_message = f"Transaction of ₹{amount:.2f} has been reversed by admin. Your new balance is ₹{new_sender_balance:.2f}"
-        receiver_notification = f"Transaction of ₹{amount:.2f} has been reversed by admin. Your new balance is ₹{new_receiver_balance:.2f}"
-
-        # Generate security fields for notifications (for display purposes only)
-        notification_data_str = f"{sender_id}|{receiver_id}|{amount}|{timestamp}|reversal"
-        enc_data = encrypt_data(notification_data_str)
-        hash_value = generate_hash(notification_data_str)
-        signature = sign_data(hash_value)
-        verified = verify_signature(hash_value, signature)
-
-        db.notifications.insert_many([
-            {
-                "user_id": sender_id,
-                "message": notification_message,
-                "timestamp": timestamp,
-                "read": False,
-                "type": "transaction_reversal",
-                "enc_data": enc_data,
-                "verified": bool(verified),
-                "hash": hash_value,
-                "signature_hex": signature.hex() if hasattr(signature, "hex") else str(signature)
-            },
-            {
-                "user_id": receiver_id,
-                "message": receiver_notification,
-                "timestamp": timestamp,
-                "read": False,
-                "type": "transaction_reversal",
-                "enc_data": enc_data,
-                "verified": bool(verified),
-                "hash": hash_value,
-                "signature_hex": signature.hex() if hasattr(signature, "hex") else str(signature)
-            }
-        ])
-        
-        # Update log status
-        db.transaction_logs.update_one(
-            {"_id": ObjectId(log_id)},
-            {"$set": {
-                "status": "undone",
-                "can_undo": False,
-                "undone_at": timestamp,
-                "undone_by": session["user"]
-            }}
-        )
-        
+        # Same path as the batch undo (see reversal.py), with one log
+        result = reverse_logs(db, [log_id], session["user"])[0]
+        if not result["ok"]:
+            return result["error"]
         return redirect(url_for("dashboard"))
     except Exception as e:
         return str(e)
 
-# ---------------- MARK NOTIFICATION AS READ ----------------
+@app.route("/admin/undo_batch", methods=["POST"])
+def undo_batch():
+    """Undo many logs at once: JSON {"log_ids": [...]} or form field `log_ids` (repeated)."""
+    if "user" not in session or session["role"] != "admin":
+        return redirect("/")
+
+    if request.is_json:
+        log_ids = (request.get_json(silent=True) or {}).get("log_ids") or []
+    else:
+        log_ids = request.form.getlist("log_ids")
+    if not isinstance(log_ids, list) or len(log_ids) > REVERSAL_MAX_BATCH:
+        return jsonify(error=f"log_ids must be a list of at most {REVERSAL_MAX_BATCH} ids"), 400
+
+    try:
+        results = reverse_logs(get_db(), log_ids, session["user"])
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+    failed = [r for r in results if not r["ok"]]
+    if request.is_json:
+        return jsonify(reversed=len(results) - len(failed), failed=len(failed), results=results)
+    if failed:
+        return "<br>".join(f"{r['log_id']}: {r['error']}" for r in failed)
+    return redirect(url_for("dashboard"))
+
+# ---------------- MARK NOTIFICATIONS AS READ ----------------
+def _mark_read(db, user, ids=None):
+    """Mark the user's unread notifications (all, or just `ids`) read with one update_many."""
+    query = {"user_id": user, "read": False}
+    if ids is not None:
+        from bson.objectid import ObjectId
+        query["_id"] = {"$in": [ObjectId(i) for i in ids]}
+    # read_at drives the TTL index that expires read notifications
+    result = db.notifications.update_many(query, {"$set": {"read": True, "read_at": datetime.utcnow()}})
+    cache.invalidate_user(user, kinds=("unread",))
+    return result.modified_count
+
+
+def _mark_read_response(updated):
+    if request.is_json:
+        return jsonify(updated=updated)
+    return redirect(url_for("dashboard"))
+
+
 @app.route("/mark_notification_read/<notification_id>", methods=["POST"])
 def mark_notification_read(notification_id):
     if "user" not in session:
         return redirect("/")
-        
-    db = get_db()
+
     try:
-        from bson.objectid import ObjectId
-        db.notifications.update_one(
-            {
-                "_id": ObjectId(notification_id),
-                "user_id": session["user"]
-            },
-            {"$set": {"read": True}}
-        )
-        return redirect(url_for("dashboard"))
+        return _mark_read_response(_mark_read(get_db(), session["user"], [notification_id]))
     except Exception as e:
         return str(e)
 
+
+@app.route("/notifications/mark_read", methods=["POST"])
+def mark_notifications_read():
+    """Mark several notifications read: JSON {"ids": [...]} or form field `ids` (repeated)."""
+    if "user" not in session:
+        return redirect("/")
+
+    if request.is_json:
+        ids = (request.get_json(silent=True) or {}).get("ids") or []
+    else:
+        ids = request.form.getlist("ids")
+    if not isinstance(ids, list) or len(ids) > MAX_PAGE_SIZE:
+        return jsonify(error=f"ids must be a list of at most {MAX_PAGE_SIZE} ids"), 400
+    try:
+        return _mark_read_response(_mark_read(get_db(), session["user"], ids))
+    except Exception as e:
+        return jsonify(error=str(e)), 400
+
+
+@app.route("/notifications/mark_all_read", methods=["POST"])
+def mark_all_notifications_read():
+    if "user" not in session:
+        return redirect("/")
+
+    return _mark_read_response(_mark_read(get_db(), session["user"]))
+
+# ---------------- STATS ROLLUPS ----------------
+@app.route("/admin/stats/<kind>")
+def admin_stats(kind):
+    if "user" not in session or session["role"] != "admin":
+        return redirect("/")
+    if kind not in ("day", "merchant", "card"):
+        return jsonify(error="kind must be day, merchant or card"), 400
+
+    db = get_db()
+    buckets = rollups.get_buckets(db, kind, limit=request.args.get("limit", 30, type=int))
+    return jsonify(
+        totals=rollups.get_stats(db),
+        buckets=[{k: b.get(k, 0) for k in ("key",) + rollups.COUNTERS} for b in buckets],
+    )
+
+# ---------------- CACHE STATS ----------------
+@app.route("/admin/cache_stats")
+def cache_stats():
+    if "user" not in session or session["role"] != "admin":
+        return redirect("/")
+    # Counters are per worker process
+    return jsonify(pid=os.getpid(), **cache.stats())
+
+@app.route("/admin/login_stats")
+def login_stats():
+    if "user" not in session or session["role"] != "admin":
+        return redirect("/")
+    # Counters are per worker process
+    return jsonify(pid=os.getpid(), **login_guard.stats())
+
+# ---------------- ENCRYPTED TOTALS ----------------
+@app.route("/admin/encrypted_totals/<username>")
+def encrypted_totals(username):
+    if "user" not in session or session["role"] != "admin":
+        return redirect("/")
+
+    db = get_db()
+    totals = {}
+    for direction in ("sent", "received"):
+        ciphertext = aggregation.running_total(db, username, direction)
+        totals[direction] = aggregation.decrypt_total(ciphertext) if ciphertext is not None else 0.0
+    return jsonify(username=username, **totals)
+
 # ---------------- LOGOUT ----------------
 @app.route("/logout")
 def logout():
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Offline integrity audit for stored transactions.
+
+Streams `transactions` and `transaction_logs`, decrypts `enc_data`, recomputes
+the SHA-256 hash and verifies the signature of every document across a
+process pool, and reports mismatches.
+
+Usage:
+  python3 audit.py [--collections transactions transaction_logs]
+                   [--workers N] [--chunk-size 500] [--output mismatches.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+AUDIT_FIELDS = {"_id": 1, "enc_data": 1, "hash": 1, "signature": 1, "signature_hex": 1, "signature_scheme": 1}
+
+# Logs written since the binary layout carry no payload of their own; they
+# reference their transaction, which is audited instead.
+QUERIES = {"transaction_logs": {"enc_data": {"$exists": True}}}
+
+
+def _check(doc):
+    """Return None if the document checks out, else a short reason."""
+    from encryption import decrypt_data
+    from hashing import generate_hash
+    from digital_signature import verify_signature, MissingSigningKey, SCHEMES
+    from storage_codec import decode_security_fields
+
+    try:
+        fields = decode_security_fields(doc)
+    except ValueError:
+        return "bad enc_data encoding"
+    if not fields["enc_data"]:
+        return "missing enc_data"
+    try:
+        data_str = decrypt_data(fields["enc_data"])
+    except Exception:
+        return "decrypt failed"
+    if generate_hash(data_str) != fields["hash"]:
+        return "hash mismatch"
+    scheme = doc.get("signature_scheme")
+    if not scheme:
+        # Signed with a per-process key before keys were persisted
+        return "legacy signature"
+    if scheme not in SCHEMES:
+        return "unknown signature scheme"
+    try:
+        signature = bytes.fromhex(fields["signature_hex"] or "")
+    except ValueError:
+        return "bad signature encoding"
+    try:
+        if not verify_signature(fields["hash"], signature, scheme):
+            return "signature mismatch"
+    except MissingSigningKey:
+        # Never create a key here: it would not match and web workers would adopt it
+        return f"missing {scheme} signing key"
+    return None
+
+
+def audit_chunk(collection, docs):
+    """Worker entry point: returns (collection, checked, [(id, reason), ...])."""
+    problems = []
+    for doc in docs:
+        reason = _check(doc)
+        if reason:
+            problems.append((doc["_id"], reason))
+    return collection, len(docs), problems
+
+
+def _chunks(cursor, size):
+    chunk = []
+    for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_audit(db, collections, workers, chunk_size, batch_size, output=None, limit=0):
+    """Audit `collections` and return {collection: {"checked": n, reason: count}}."""
+    stats = {name: {"checked": 0} for name in collections}
+    max_in_flight = workers * 2
+    start = time.perf_counter()
+    last_report = start
+
+    def collect(done):
+        nonlocal last_report
+        for future in done:
+            name, checked, problems = future.result()
+            stats[name]["checked"] += checked
+            for doc_id, reason in problems:
+                stats[name][reason] = stats[name].get(reason, 0) + 1
+                if output:
+                    output.write(json.dumps({"collection": name, "_id": doc_id, "reason": reason}) + "\n")
+        now = time.perf_counter()
+        if now - last_report >= 5:
+            total = sum(s["checked"] for s in stats.values())
+            print(f"  ... {total:,} docs ({total / (now - start):,.0f} docs/s)")
+            last_report = now
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for name in collections:
+            cursor = db[name].find(QUERIES.get(name, {}), AUDIT_FIELDS).sort("_id", 1).batch_size(batch_size)
+            if limit:
+                cursor = cursor.limit(limit)
+            for chunk in _chunks(cursor, chunk_size):
+                # Bounded queue: never hold more than max_in_flight chunks in memory
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(audit_chunk, name, chunk))
+        done, _ = wait(in_flight)
+        collect(done)
+
+    elapsed = time.perf_counter() - start
+    return stats, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit stored transaction hashes and signatures")
+    parser.add_argument("--collections", nargs="+", default=["transactions", "transaction_logs"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500, help="documents per worker task")
+    parser.add_argument("--batch-size", type=int, default=1000, help="MongoDB cursor batch size")
+    parser.add_argument("--limit", type=int, default=0, help="audit at most N docs per collection")
+    parser.add_argument("--output", help="write mismatches as JSON lines to this file")
+    args = parser.parse_args(argv)
+
+    from mongo_client import get_db
+
+    print("=" * 60)
+    print("SafePay Integrity Audit")
+    print("=" * 60)
+    output = open(args.output, "w") if args.output else None
+    try:
+        stats, elapsed = run_audit(get_db(), args.collections, args.workers, args.chunk_size,
+                                   args.batch_size, output, args.limit)
+    finally:
+        if output:
+            output.close()
+
+    failed = False
+    total = 0
+    for name, counts in stats.items():
+        checked = counts.pop("checked")
+        total += checked
+        print(f"\n{name}: {checked:,} checked")
+        if not counts:
+            print("  ✓ all documents verified")
+        for reason, count in sorted(counts.items()):
+            print(f"  {'⚠' if reason == 'legacy signature' else '✗'} {reason}: {count:,}")
+            failed = failed or reason != "legacy signature"
+    print(f"\n{total:,} documents in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} docs/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
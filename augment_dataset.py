@@ -1,87 +1,207 @@
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Add synthetic Expiry_Date and Card_Type columns to transactions.csv.
+
+  python3 augment_dataset.py                                   # transactions_augmented.csv
+  python3 augment_dataset.py --chunk-size 200000               # stream the input in chunks
+  python3 augment_dataset.py --rows 5000000 --output big.parquet
+
+All draws are vectorised numpy on a seeded Generator; the same --seed,
+--chunk-size and --reference-date reproduce the same file. --chunk-size
+streams the input with one chunk in memory at a time; --rows N instead
+resamples N rows from the input, chunk by chunk, to build large synthetic
+datasets (memory: the input plus one chunk). Output is written to a
+temporary file and renamed when complete. Parquet output (by file extension)
+needs pyarrow.
+
+Generated distributions:
+  - 60% of fraudulent transactions have late expiry dates (half expired up to
+    2 years ago, half expiring within 3 months), 40% normal ones
+  - non-fraudulent transactions expire 1-5 years ahead
+  - 70% of frauds use Student or Merchant cards; other transactions are
+    spread over all five types, slightly favouring Standard
+"""
+
+import os
+import sys
+import argparse
+from datetime import date
+
 import numpy as np
-from datetime import datetime, timedelta
-
-print("Loading transactions.csv...")
-df = pd.read_csv("transactions.csv")
-
-print(f"Original dataset shape: {df.shape}")
-print(f"Columns: {df.columns.tolist()}")
-
-# Generate expiry dates
-# 60% of fraudulent transactions have late expiry dates (past or near expiry)
-# 40% of fraudulent transactions have normal expiry dates
-# Non-fraudulent transactions mostly have normal expiry dates
-
-np.random.seed(42)
-
-def generate_expiry_date(is_fraud):
-    """Generate credit card expiry date based on fraud status"""
-    current_date = datetime.now()
-    
-    if is_fraud == 1:
-        # 60% chance of late/expired card for fraud
-        if np.random.random() < 0.6:
-            # Generate expired or soon-to-expire date (within last 2 years or next 3 months)
-            if np.random.random() < 0.5:
-                # Expired card (past date)
-                months_ago = np.random.randint(1, 24)
-                expiry = current_date - timedelta(days=months_ago * 30)
-            else:
-                # Soon to expire (within 3 months)
-                days_ahead = np.random.randint(1, 90)
-                expiry = current_date + timedelta(days=days_ahead)
-        else:
-            # 40% normal expiry date
-            months_ahead = np.random.randint(12, 60)
-            expiry = current_date + timedelta(days=months_ahead * 30)
+import pandas as pd
+
+INPUT_PATH = "transactions.csv"
+OUTPUT_PATH = "transactions_augmented.csv"
+SEED = 42
+
+CARD_TYPES = np.array(["Student", "Merchant", "Premium", "Standard", "Corporate"])
+# P(card type | Is_Fraud), rows indexed by Is_Fraud
+CARD_TYPE_PROBS = np.array([
+    [0.15, 0.15, 0.25, 0.30, 0.15],
+    [0.35, 0.35, 0.10, 0.10, 0.10],
+])
+_CARD_TYPE_CDF = np.cumsum(CARD_TYPE_PROBS, axis=1)
+
+
+# ---------------- GENERATORS ----------------
+def generate_expiry_dates(is_fraud, rng, today):
+    """MM/YY expiry dates for an array of Is_Fraud flags."""
+    n = len(is_fraud)
+    fraud = np.asarray(is_fraud) == 1
+    late = fraud & (rng.random(n) < 0.6)
+    expired = late & (rng.random(n) < 0.5)
+    months_ago = rng.integers(1, 24, n)
+    days_ahead = rng.integers(1, 90, n)
+    months_ahead = rng.integers(12, 60, n)
+    offset_days = np.where(expired, -30 * months_ago, np.where(late, days_ahead, 30 * months_ahead))
+
+    # Months since 1970-01; format each distinct month once
+    months = (np.datetime64(today, "D") + offset_days).astype("datetime64[M]").astype(np.int64)
+    uniques, inverse = np.unique(months, return_inverse=True)
+    labels = np.array([f"{m % 12 + 1:02d}/{(m // 12 + 1970) % 100:02d}" for m in uniques.tolist()])
+    return labels[inverse.reshape(-1)]
+
+
+def generate_card_types(is_fraud, rng):
+    """Card types for an array of Is_Fraud flags, one uniform draw per row."""
+    cdf = _CARD_TYPE_CDF[(np.asarray(is_fraud) == 1).astype(np.intp)]
+    index = (rng.random(len(cdf))[:, np.newaxis] >= cdf[:, :-1]).sum(axis=1)
+    return CARD_TYPES[index]
+
+
+def augment(df, rng, today):
+    """Return `df` with Expiry_Date and Card_Type added."""
+    is_fraud = df["Is_Fraud"].to_numpy()
+    df = df.copy()
+    df["Expiry_Date"] = generate_expiry_dates(is_fraud, rng, today)
+    df["Card_Type"] = generate_card_types(is_fraud, rng)
+    return df
+
+
+# ---------------- STREAMING ----------------
+def _chunk_rngs(seed):
+    """One independent Generator per chunk, derived from `seed`."""
+    sequence = np.random.SeedSequence(seed)
+    while True:
+        yield np.random.default_rng(sequence.spawn(1)[0])
+
+
+def _input_chunks(path, chunk_size):
+    if chunk_size is None:
+        yield pd.read_csv(path)
     else:
-        # Non-fraud: mostly valid expiry dates (1-5 years ahead)
-        months_ahead = np.random.randint(12, 60)
-        expiry = current_date + timedelta(days=months_ahead * 30)
-    
-    # Format as MM/YY
-    return expiry.strftime("%m/%y")
-
-# Generate card types
-# 5 unique values: Student, Merchant, Premium, Standard, Corporate
-# 70% of frauds are done by Student or Merchant type
-
-card_types = ["Student", "Merchant", "Premium", "Standard", "Corporate"]
-
-def generate_card_type(is_fraud):
-    """Generate card type based on fraud status"""
-    if is_fraud == 1:
-        # 70% chance of Student or Merchant for fraud
-        if np.random.random() < 0.7:
-            return np.random.choice(["Student", "Merchant"])
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _resampled_chunks(path, rows, chunk_size, rng):
+    """`rows` rows drawn with replacement from the input, `chunk_size` at a time."""
+    base = pd.read_csv(path)
+    for start in range(0, rows, chunk_size):
+        picks = rng.integers(0, len(base), min(chunk_size, rows - start))
+        yield base.take(picks).reset_index(drop=True)
+
+
+class _Writer:
+    """Append DataFrame chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith((".parquet", ".pq"))
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._parquet_writer = None
+        self._first = True
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
         else:
-            return np.random.choice(["Premium", "Standard", "Corporate"])
+            df.to_csv(self.tmp_path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if not self._first:
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def augment_file(input_path=INPUT_PATH, output_path=OUTPUT_PATH, seed=SEED, chunk_size=None, rows=None, today=None,
+                 verbose=False):
+    """Augment `input_path` into `output_path` chunk by chunk; return summary counts."""
+    today = today or date.today()
+    rngs = _chunk_rngs(seed)
+    if rows is not None:
+        chunks = _resampled_chunks(input_path, rows, chunk_size or 500_000, next(rngs))
     else:
-        # Non-fraud: more evenly distributed
-        weights = [0.15, 0.15, 0.25, 0.30, 0.15]  # Slightly favor Standard
-        return np.random.choice(card_types, p=weights)
-
-print("Generating expiry dates and card types...")
-df["Expiry_Date"] = df["Is_Fraud"].apply(generate_expiry_date)
-df["Card_Type"] = df["Is_Fraud"].apply(generate_card_type)
-
-print(f"Augmented dataset shape: {df.shape}")
-print("\nNew columns added:")
-print(f"- Expiry_Date: {df['Expiry_Date'].nunique()} unique values")
-print(f"- Card_Type: {df['Card_Type'].unique()}")
-
-# Verify the distribution
-fraud_data = df[df["Is_Fraud"] == 1]
-non_fraud_data = df[df["Is_Fraud"] == 0]
-
-print(f"\n--- Fraud Analysis ---")
-print(f"Total fraudulent transactions: {len(fraud_data)}")
-print(f"Card Type distribution in frauds:")
-print(fraud_data["Card_Type"].value_counts())
-fraud_student_merchant = fraud_data[fraud_data["Card_Type"].isin(["Student", "Merchant"])].shape[0]
-print(f"Student/Merchant in frauds: {fraud_student_merchant} ({fraud_student_merchant/len(fraud_data)*100:.1f}%)")
-
-print("\nSaving augmented dataset...")
-df.to_csv("transactions_augmented.csv", index=False)
-print("Augmented dataset saved as 'transactions_augmented.csv'")
+        chunks = _input_chunks(input_path, chunk_size)
+
+    summary = {"rows": 0, "fraud": 0, "fraud_student_merchant": 0, "expiry_dates": set(), "columns": None}
+    writer = _Writer(output_path)
+    try:
+        for chunk in chunks:
+            chunk = augment(chunk, next(rngs), today)
+            writer.write(chunk)
+            fraud = chunk["Is_Fraud"].to_numpy() == 1
+            summary["rows"] += len(chunk)
+            summary["fraud"] += int(fraud.sum())
+            summary["fraud_student_merchant"] += int(np.isin(chunk["Card_Type"].to_numpy()[fraud], ["Student", "Merchant"]).sum())
+            summary["expiry_dates"].update(np.unique(chunk["Expiry_Date"].to_numpy()).tolist())
+            summary["columns"] = chunk.shape[1]
+            if verbose and (chunk_size is not None or rows is not None):
+                print(f"  {summary['rows']:,} rows written")
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add Expiry_Date and Card_Type to the transactions dataset")
+    parser.add_argument("--input", default=INPUT_PATH, help="source CSV")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="output .csv or .parquet")
+    parser.add_argument("--seed", type=int, default=SEED, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=None, help="rows per chunk (default: whole input at once)")
+    parser.add_argument("--rows", type=int, default=None, help="resample this many rows from the input")
+    parser.add_argument("--reference-date", type=date.fromisoformat, default=None,
+                        help="date expiry offsets count from, YYYY-MM-DD (default: today)")
+    args = parser.parse_args(argv)
+
+    print(f"Augmenting {args.input} -> {args.output}...")
+    summary = augment_file(args.input, args.output, args.seed, args.chunk_size, args.rows, args.reference_date,
+                           verbose=True)
+
+    print(f"Augmented dataset shape: ({summary['rows']}, {summary['columns']})")
+    print("\nNew columns added:")
+    print(f"- Expiry_Date: {len(summary['expiry_dates'])} unique values")
+    print(f"- Card_Type: {CARD_TYPES.tolist()}")
+
+    print(f"\n--- Fraud Analysis ---")
+    print(f"Total fraudulent transactions: {summary['fraud']}")
+    if summary["fraud"]:
+        share = summary["fraud_student_merchant"] / summary["fraud"] * 100
+        print(f"Student/Merchant in frauds: {summary['fraud_student_merchant']} ({share:.1f}%)")
+    print(f"\nAugmented dataset saved as '{args.output}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+SafePay micro-benchmarks.
+
+Usage:
+  python3 bench.py <benchmark> [options]
+  python3 bench.py --help
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _run_for(fn, seconds, threads):
+    """Call fn() from `threads` threads for `seconds`; return calls/sec."""
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+
+    def worker(i):
+        while time.perf_counter() < deadline:
+            fn()
+            counts[i] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def _report(label, value, unit):
+    if isinstance(value, int):
+        print(f"  {label:<40} {value:>12,d} {unit}")
+    else:
+        print(f"  {label:<40} {value:>12,.1f} {unit}")
+
+
+def _scratch_db(args):
+    """A throwaway database: mongomock, or `safepay_bench` on MONGODB_URI."""
+    if args.mongomock:
+        import mongomock
+        return mongomock.MongoClient()["safepay_bench"]
+    import mongo_client
+    return mongo_client.get_client()["safepay_bench"]
+
+
+# ---------------- MONGODB CLIENT ----------------
+def bench_db(args):
+    from pymongo import MongoClient
+    import mongo_client
+
+    uri = os.environ.get("MONGODB_URI", mongo_client.DEFAULT_URI)
+    print(f"MongoDB request simulation ({args.threads} threads, {args.seconds}s each)")
+
+    def per_request_client():
+        client = MongoClient(uri)
+        db = client.get_default_database(default="safepay")
+        db.users.find_one({"username": "user1"})
+        client.close()
+
+    def pooled_client():
+        db = mongo_client.get_db()
+        db.users.find_one({"username": "user1"})
+
+    _report("new MongoClient per request", _run_for(per_request_client, args.seconds, args.threads), "req/s")
+    _report("shared pooled client", _run_for(pooled_client, args.seconds, args.threads), "req/s")
+
+
+# ---------------- TRANSFER ENGINE ----------------
+def bench_transfer(args):
+    """Stress test: parallel transfers between a few hot accounts.
+
+    Fails (exit code 1) if money is created or destroyed or a balance goes
+    negative. Needs a real mongod for more than one thread: mongomock's
+    find_one_and_update is not atomic under threads, so it can create money
+    by itself and the conservation check would be meaningless.
+    """
+    import random
+    from transfer import transfer_funds
+
+    if args.mongomock and args.threads > 1:
+        print("transfer: --mongomock is not thread-safe; use --threads 1 or a real MONGODB_URI")
+        return 2
+
+    db = _scratch_db(args)
+    db.users.drop()
+    db.transactions.drop()
+    db.transaction_logs.drop()
+    accounts = [f"bench{i}" for i in range(args.accounts)]
+    db.users.insert_many([{"username": a, "role": "user", "balance": 1000.0} for a in accounts])
+    initial_total = 1000.0 * len(accounts)
+
+    def build_documents(sender_balance):
+        return {"sender_balance": sender_balance}, {}
+
+    def one_transfer(_):
+        sender, receiver = random.sample(accounts, 2)
+        try:
+            transfer_funds(db, sender, receiver, random.randint(1, 300), build_documents)
+            return True
+        except ValueError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        completed = sum(pool.map(one_transfer, range(args.transfers)))
+    elapsed = time.perf_counter() - start
+
+    balances = [u["balance"] for u in db.users.find({"username": {"$in": accounts}})]
+    total = sum(balances)
+    print(f"Transfer stress test ({args.transfers} transfers, {args.accounts} accounts, {args.threads} threads)")
+    _report("completed", completed, "transfers")
+    _report("rejected (insufficient balance)", args.transfers - completed, "transfers")
+    _report("throughput", args.transfers / elapsed, "transfers/s")
+    _report("transactions recorded", db.transactions.count_documents({}), "docs")
+    _report("logs recorded", db.transaction_logs.count_documents({}), "docs")
+
+    failures = []
+    if abs(total - initial_total) > 1e-6:
+        failures.append(f"money not conserved: {total} != {initial_total}")
+    if min(balances) < 0:
+        failures.append(f"negative balance: {min(balances)}")
+    if db.transactions.count_documents({}) != completed or db.transaction_logs.count_documents({}) != completed:
+        failures.append("transaction/log count does not match completed transfers")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    if not failures:
+        print("  OK: total balance conserved")
+    return 1 if failures else 0
+
+
+# ---------------- FRAUD SCORING ----------------
+def _sample_transaction(i=0):
+    card_types = ["Student", "Merchant", "Premium", "Standard", "Corporate"]
+    return {
+        "Age": 20 + i % 50,
+        "Transaction_Amount": float(100 + (i * 37) % 40000),
+        "Account_Balance": float(5000 + (i * 91) % 90000),
+        "Card_Type": card_types[i % len(card_types)],
+        "Expiry_Date": f"{1 + i % 12:02d}/{24 + i % 6:02d}",
+    }
+
+
+def _latency_run(fn, concurrency, requests):
+    """Issue `requests` calls from `concurrency` threads; return (req/s, p50 ms, p99 ms)."""
+    latencies = []
+
+    def call(i):
+        t0 = time.perf_counter()
+        fn(_sample_transaction(i))
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return requests / elapsed, p50, p99
+
+
+def bench_scoring(args):
+    """Per-request predict vs the micro-batching scorer (needs the model files in cwd)."""
+    from model_predict import predict_fraud_augmented, predict_fraud_batch
+    from scoring import MicroBatcher
+
+    batcher = MicroBatcher(predict_fraud_batch, max_batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    print(f"Fraud scoring ({args.requests} requests per run; batch<={args.batch_size}, wait<={args.max_wait_ms}ms)")
+    print(f"  {'concurrency':>11} {'mode':<12} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in (1, 4, 16, 64):
+        for mode, fn in (("direct", predict_fraud_augmented), ("micro-batch", batcher.score)):
+            rate, p50, p99 = _latency_run(fn, concurrency, args.requests)
+            print(f"  {concurrency:>11} {mode:<12} {rate:>10,.1f} {p50:>9.2f} {p99:>9.2f}")
+
+    rows = [_sample_transaction(i) for i in range(args.requests)]
+    t0 = time.perf_counter()
+    predict_fraud_batch(rows)
+    _report("offline predict_fraud_batch", len(rows) / (time.perf_counter() - t0), "rows/s")
+
+
+# ---------------- COMPILED FOREST ----------------
+def bench_forest(args):
+    """sklearn forest vs the compiled numpy forest (needs .pkl and .npz in cwd)."""
+    import pickle
+    import numpy as np
+    from forest import load_forest
+    import model_predict
+
+    with open("fraud_model_augmented.pkl", "rb") as f:
+        sk_model = pickle.load(f)
+    compiled = load_forest()
+    X = model_predict._feature_matrix([_sample_transaction(i) for i in range(1000)])
+    if not np.array_equal(sk_model.predict(X), compiled.predict(X)):
+        print("  FAIL: compiled predictions differ from sklearn")
+        return 1
+
+    print("Forest inference (mean per call)")
+    for batch in (1, 32, 1000):
+        rows = X[:batch]
+        for label, model in (("sklearn", sk_model), ("compiled", compiled)):
+            calls = max(5, 2000 // batch)
+            t0 = time.perf_counter()
+            for _ in range(calls):
+                model.predict(rows)
+            per_call = (time.perf_counter() - t0) / calls * 1000
+            _report(f"{label} batch={batch}", per_call, f"ms  ({per_call * 1000 / batch:,.1f} us/row)")
+
+
+# ---------------- IMPORT TIME ----------------
+def bench_import(args):
+    """`python -X importtime -c "import app"` as a regression check.
+
+    Fails if importing the app exceeds --budget-ms or pulls in a module that
+    should only load lazily (sklearn, the model, key generation).
+    """
+    import subprocess
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return 1
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total_ms = max(cumulative for cumulative, _, _ in rows) / 1000
+    print(f"Import time for 'app' (top {args.top} by cumulative time)")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {name:<40} {cumulative / 1000:>9.1f} ms  (self {self_us / 1000:.1f} ms)")
+
+    failures = []
+    eager = sorted({name.strip().split(".")[0] for _, _, name in rows} & {"sklearn", "scipy"})
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    import app
+    t0 = time.perf_counter()
+    app.warm_up()
+    _report("app.warm_up()", (time.perf_counter() - t0) * 1000, "ms")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    return 1 if failures else 0
+
+
+# ---------------- SIGNATURES ----------------
+def bench_signature(args):
+    """Sign and verify throughput for every scheme in digital_signature."""
+    from digital_signature import SCHEMES
+    from hashing import generate_hash
+
+    message = generate_hash("bench|transaction|payload").encode()
+    print(f"Signature schemes ({args.seconds}s per run, single thread)")
+    for name, scheme in sorted(SCHEMES.items()):
+        private_key = scheme.generate()
+        public_key = private_key.public_key()
+        signature = scheme.sign(private_key, message)
+        _report(f"{name} sign", _run_for(lambda: scheme.sign(private_key, message), args.seconds, 1), "ops/s")
+        _report(f"{name} verify", _run_for(lambda: scheme.verify(public_key, signature, message), args.seconds, 1), "ops/s")
+        _report(f"{name} signature size", len(signature), "bytes")
+
+
+# ---------------- PAILLIER ----------------
+def bench_paillier(args):
+    """Encrypt/decrypt ops/sec for the textbook and accelerated Paillier paths."""
+    import secrets
+    from homomorphic import Paillier, _L
+
+    m = 1234567  # ₹12,345.67 in cents
+    print(f"Paillier ({args.seconds}s per run, single thread)")
+    for bits in (512, 1024, 2048):
+        t0 = time.perf_counter()
+        key = Paillier(keysize=bits, persist=False)
+        _report(f"{bits}-bit key generation", (time.perf_counter() - t0) * 1000, "ms")
+        n, nsquare, g = key.n, key.nsquare, key.g
+
+        def textbook_encrypt():
+            r = secrets.randbelow(n)
+            return (pow(g, m, nsquare) * pow(r, n, nsquare)) % nsquare
+
+        def textbook_decrypt():
+            return (_L(pow(c, key.lambda_param, nsquare), n) * key.mu) % n
+
+        def fast_encrypt_no_pool():
+            return (key._g_pow(m) * key._random_rn()) % nsquare
+
+        def pooled_encrypt():
+            # Request-path cost with a warm pool: the r^n is already computed
+            key._rn_pool.append(rn)
+            return key.encrypt(m)
+
+        c = (key._g_pow(m) * key._random_rn()) % nsquare
+        rn = key._random_rn()
+        key._rn_worker.pid = os.getpid()  # keep the refill thread out of the timings
+        _report(f"{bits} encrypt (textbook)", _run_for(textbook_encrypt, args.seconds, 1), "ops/s")
+        _report(f"{bits} encrypt (g=n+1, CRT r^n)", _run_for(fast_encrypt_no_pool, args.seconds, 1), "ops/s")
+        _report(f"{bits} encrypt (warm r^n pool)", _run_for(pooled_encrypt, args.seconds, 1), "ops/s")
+        _report(f"{bits} decrypt (textbook)", _run_for(textbook_decrypt, args.seconds, 1), "ops/s")
+        _report(f"{bits} decrypt (CRT)", _run_for(lambda: key.decrypt(c), args.seconds, 1), "ops/s")
+
+
+# ---------------- CIPHERTEXT STORAGE ----------------
+def bench_codec(args):
+    """Decimal-string vs binary amount_enc: BSON size and encode/decode speed."""
+    import secrets
+    import bson
+    from storage_codec import encode_ciphertext, decode_ciphertext, ciphertext_width
+
+    print(f"amount_enc storage ({args.seconds}s per run, single thread)")
+    for bits in (512, 1024, 2048):
+        nsquare = (1 << (2 * bits)) - 1
+        width = ciphertext_width(nsquare)
+        c = secrets.randbelow(nsquare)
+        as_string, as_binary = str(c), encode_ciphertext(c, width)
+        string_doc = len(bson.encode({"amount_enc": as_string}))
+        binary_doc = len(bson.encode({"amount_enc": as_binary}))
+        _report(f"{bits} BSON bytes decimal string", string_doc, "bytes")
+        _report(f"{bits} BSON bytes binary", binary_doc, f"bytes ({1 - binary_doc / string_doc:.0%} smaller)")
+        _report(f"{bits} encode decimal string", _run_for(lambda: str(c), args.seconds, 1), "ops/s")
+        _report(f"{bits} encode binary", _run_for(lambda: encode_ciphertext(c, width), args.seconds, 1), "ops/s")
+        _report(f"{bits} decode decimal string", _run_for(lambda: decode_ciphertext(as_string), args.seconds, 1), "ops/s")
+        _report(f"{bits} decode binary", _run_for(lambda: decode_ciphertext(as_binary), args.seconds, 1), "ops/s")
+
+
+# ---------------- ENC_DATA ENCRYPTION ----------------
+def bench_encryption(args):
+    """Legacy AES-CBC+HMAC vs AES-GCM enc_data tokens: ops/s and MB/s."""
+    from encryption import encrypt_data, decrypt_data, encrypt_many, decrypt_many, _encrypt_legacy
+
+    print(f"enc_data encryption ({args.seconds}s per run, single thread)")
+    batch = 1000
+    for size in (64, 256, 4096):
+        data = "x" * size
+        legacy, v2 = _encrypt_legacy(data), encrypt_data(data)
+        many, tokens = [data] * batch, [v2] * batch
+        for label, fn, n in [
+            ("encrypt legacy CBC+HMAC", lambda: _encrypt_legacy(data), 1),
+            ("encrypt v2 GCM", lambda: encrypt_data(data), 1),
+            (f"encrypt_many v2 GCM (x{batch})", lambda: encrypt_many(many), batch),
+            ("decrypt legacy CBC+HMAC", lambda: decrypt_data(legacy), 1),
+            ("decrypt v2 GCM", lambda: decrypt_data(v2), 1),
+            (f"decrypt_many v2 GCM (x{batch})", lambda: decrypt_many(tokens), batch),
+        ]:
+            ops = _run_for(fn, args.seconds, 1) * n
+            _report(f"{size}B {label}", ops, f"ops/s  {ops * size / 1e6:8.1f} MB/s")
+        _report(f"{size}B token length legacy / v2", len(legacy), f"/ {len(v2)} chars")
+
+
+# ---------------- PAYLOAD STORAGE ----------------
+def bench_payload(args):
+    """BSON bytes written per transfer: string payloads on both documents vs binary once."""
+    import bson
+    from datetime import datetime
+    from bson.objectid import ObjectId
+    from encryption import encrypt_data
+    from hashing import generate_hash
+    from digital_signature import sign_data
+    from storage_codec import encode_security_fields
+
+    data_str = "|".join([
+        "user1", "Test User", "M", "34", "Karnataka", "Bengaluru", "Main Branch", "Savings",
+        "1250.0", "Debit", "Groceries", "12/27", "Premium", "saksham", "48750.0",
+    ])
+    enc_data, hash_value = encrypt_data(data_str), generate_hash(data_str)
+    signature = sign_data(hash_value)
+    strings = {"enc_data": enc_data, "hash": hash_value, "signature_hex": signature.hex()}
+    common_txn = {
+        "customer_id": "user1", "receiver_id": "saksham", "amount": 1250.0, "txntype": "Debit",
+        "merchant": "Groceries", "balance": 48750.0, "card_type": "Premium", "verified": True,
+        "fraud_status": "Legit", "signature_scheme": "ed25519",
+    }
+    common_log = {
+        "customer_id": "user1", "receiver_id": "saksham", "amount": 1250.0, "timestamp": datetime.now(),
+        "status": "completed", "can_undo": True, "transaction_id": str(ObjectId()), "verified": True,
+    }
+    old_txn = len(bson.encode(dict(common_txn, **strings)))
+    old_log = len(bson.encode(dict(common_log, signature_scheme="ed25519", **strings)))
+    new_txn = len(bson.encode(dict(common_txn, **encode_security_fields(enc_data, hash_value, signature))))
+    new_log = len(bson.encode(common_log))
+
+    print(f"Per-transfer document bytes ({len(data_str)}-char payload, {len(signature)}-byte signature)")
+    _report("transaction, strings", old_txn, "bytes")
+    _report("transaction, binary", new_txn, f"bytes ({1 - new_txn / old_txn:.0%} smaller)")
+    _report("log, with payload copy", old_log, "bytes")
+    _report("log, referencing the transaction", new_log, f"bytes ({1 - new_log / old_log:.0%} smaller)")
+    _report("written per transfer, before", old_txn + old_log, "bytes")
+    _report("written per transfer, after", new_txn + new_log,
+            f"bytes ({1 - (new_txn + new_log) / (old_txn + old_log):.0%} less)")
+
+
+# ---------------- SEARCH TOKENS ----------------
+def bench_tokens(args):
+    """token_for with and without its LRU cache; user lookups by token vs plaintext id."""
+    from searchable_encryption import token_for
+    from indexes import ensure_indexes
+
+    print(f"Search tokens ({args.seconds}s per run, single thread)")
+    names = [f"user{i}" for i in range(50)]
+    counter = iter(range(10 ** 12))
+    _report("token_for, uncached", _run_for(lambda: token_for.__wrapped__(names[next(counter) % 50]), args.seconds, 1), "ops/s")
+    _report("token_for, LRU cached", _run_for(lambda: token_for(names[next(counter) % 50]), args.seconds, 1), "ops/s")
+
+    db = _scratch_db(args)
+    db.transactions.drop()
+    ensure_indexes(db)
+    docs = [
+        {"customer_id": names[i % 50], "receiver_id": names[(i + 1) % 50],
+         "customer_token": token_for(names[i % 50]), "receiver_token": token_for(names[(i + 1) % 50]),
+         "amount": float(i % 500)}
+        for i in range(args.transfers)
+    ]
+    db.transactions.insert_many(docs)
+    projection = {"receiver_id": 1, "amount": 1}
+
+    def by_id():
+        list(db.transactions.find({"customer_id": names[next(counter) % 50]}, projection).sort("_id", -1).limit(20))
+
+    def by_token():
+        list(db.transactions.find({"customer_token": token_for(names[next(counter) % 50])}, projection)
+             .sort("_id", -1).limit(20))
+
+    print(f"First page of a user's transactions ({args.transfers:,} docs, {args.threads} threads)")
+    _report("by plaintext customer_id", _run_for(by_id, args.seconds, args.threads), "queries/s")
+    _report("by customer_token", _run_for(by_token, args.seconds, args.threads), "queries/s")
+    db.transactions.drop()
+
+
+# ---------------- FEATURE EXTRACTION ----------------
+def _feature_matrix_strptime(rows, encoder):
+    """Per-row feature extraction as model_predict did before features.py."""
+    import numpy as np
+    from datetime import datetime
+
+    card_types_encoded = encoder.transform([row["Card_Type"] for row in rows])
+    features = np.empty((len(rows), 7), dtype=np.float64)
+    for i, row in enumerate(rows):
+        try:
+            expiry, now = datetime.strptime(row["Expiry_Date"], "%m/%y"), datetime.now()
+            months = (expiry.year - now.year) * 12 + (expiry.month - now.month)
+        except ValueError:
+            months = 0
+        features[i] = (row["Age"], row["Transaction_Amount"], row["Account_Balance"], card_types_encoded[i],
+                       months, 1 if months < 0 else 0, 1 if 0 <= months <= 3 else 0)
+    return features
+
+
+def bench_features(args):
+    """Feature extraction per row: strptime + now() per row vs the shared lookup table."""
+    import numpy as np
+    from forest import CardTypeEncoder
+    from features import rows_feature_matrix, month_index
+
+    encoder = CardTypeEncoder(np.array(sorted(["Student", "Merchant", "Premium", "Standard", "Corporate"])))
+    rows = [_sample_transaction(i) for i in range(1000)]
+    reference = month_index()
+    if not np.array_equal(_feature_matrix_strptime(rows, encoder), rows_feature_matrix(rows, encoder, reference)):
+        print("  FAIL: features differ from the strptime implementation")
+        return 1
+
+    print("Feature extraction (mean per row)")
+    for batch in (1, 32, 1000):
+        sample = rows[:batch]
+        for label, fn in (("strptime", lambda: _feature_matrix_strptime(sample, encoder)),
+                          ("lookup table", lambda: rows_feature_matrix(sample, encoder, reference))):
+            calls = max(5, 20000 // batch)
+            t0 = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            _report(f"{label} batch={batch}", (time.perf_counter() - t0) / calls / batch * 1e6, "us/row")
+
+    # Training-sized columns: the per-element list path vs whole-column numpy
+    import features
+    rng = np.random.default_rng(0)
+    n = args.rows
+    expiry = np.array([row["Expiry_Date"] for row in rows], dtype=object)[rng.integers(0, len(rows), n)]
+    columns = (rng.integers(18, 80, n), rng.random(n) * 1e4, rng.random(n) * 1e5, rng.integers(0, 5, n), expiry)
+    print(f"Feature matrix for {n:,} rows (best of 3)")
+    threshold = features.COLUMN_PATH_MIN_ROWS
+    matrices = {}
+    try:
+        for label, min_rows in (("python lists", n + 1), ("numpy columns", threshold)):
+            features.COLUMN_PATH_MIN_ROWS = min_rows
+            runs = []
+            for _ in range(3):
+                t0 = time.perf_counter()
+                matrices[label] = features.feature_matrix(*columns, reference)
+                runs.append(time.perf_counter() - t0)
+            _report(label, min(runs), "s")
+    finally:
+        features.COLUMN_PATH_MIN_ROWS = threshold
+    if not np.array_equal(*matrices.values()):
+        print("  FAIL: column path differs from the list path")
+        return 1
+
+
+# ---------------- DATASET AUGMENTATION ----------------
+def _augment_rowwise(is_fraud, today):
+    """The per-row generators augment_dataset.py used before vectorising."""
+    import numpy as np
+    from datetime import datetime, timedelta
+
+    now = datetime.combine(today, datetime.min.time())
+    card_types = ["Student", "Merchant", "Premium", "Standard", "Corporate"]
+
+    def expiry(fraud):
+        if fraud == 1 and np.random.random() < 0.6:
+            if np.random.random() < 0.5:
+                return (now - timedelta(days=np.random.randint(1, 24) * 30)).strftime("%m/%y")
+            return (now + timedelta(days=np.random.randint(1, 90))).strftime("%m/%y")
+        return (now + timedelta(days=np.random.randint(12, 60) * 30)).strftime("%m/%y")
+
+    def card(fraud):
+        if fraud == 1:
+            if np.random.random() < 0.7:
+                return np.random.choice(["Student", "Merchant"])
+            return np.random.choice(["Premium", "Standard", "Corporate"])
+        return np.random.choice(card_types, p=[0.15, 0.15, 0.25, 0.30, 0.15])
+
+    return [expiry(f) for f in is_fraud], [card(f) for f in is_fraud]
+
+
+def bench_augment(args):
+    """Row-wise vs vectorised dataset augmentation; streamed CSV output rate and memory."""
+    import tempfile
+    import tracemalloc
+    from datetime import date
+    import numpy as np
+    import pandas as pd
+    from augment_dataset import augment, augment_file
+
+    today = date.today()
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({
+        "Age": rng.integers(18, 80, args.rows),
+        "Transaction_Amount": rng.random(args.rows) * 50000,
+        "Account_Balance": rng.random(args.rows) * 100000,
+        "Is_Fraud": (rng.random(args.rows) < 0.05).astype(int),
+    })
+    sample = base["Is_Fraud"].to_numpy()[:min(args.rows, 20000)]
+
+    print(f"Dataset augmentation ({args.rows:,} rows)")
+    t0 = time.perf_counter()
+    _augment_rowwise(sample, today)
+    rowwise = len(sample) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    augment(base, np.random.default_rng(42), today)
+    vectorised = args.rows / (time.perf_counter() - t0)
+    _report(f"row-wise ({len(sample):,}-row sample)", rowwise, "rows/s")
+    _report("vectorised Generator", vectorised, f"rows/s ({vectorised / rowwise:,.0f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "transactions.csv")
+        base.to_csv(source, index=False)
+        total = args.rows * 10
+        chunk_size = max(1, args.rows // 2)
+        t0 = time.perf_counter()
+        augment_file(source, os.path.join(tmp, "out.csv"), chunk_size=chunk_size, rows=total, today=today)
+        elapsed = time.perf_counter() - t0
+        # Separate run: tracemalloc slows allocation-heavy code down
+        tracemalloc.start()
+        augment_file(source, os.path.join(tmp, "out.csv"), chunk_size=chunk_size, rows=total // 10, today=today)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    _report(f"streamed CSV, {total:,} rows", total / elapsed, "rows/s")
+    _report(f"peak traced memory, {chunk_size:,}-row chunks", peak / 2 ** 20, "MiB")
+
+
+BENCHMARKS = {
+    "db": (bench_db, "per-request MongoClient vs shared pool"),
+    "transfer": (bench_transfer, "concurrent transfer stress test"),
+    "scoring": (bench_scoring, "per-request vs micro-batched fraud scoring"),
+    "forest": (bench_forest, "sklearn vs compiled numpy forest"),
+    "import": (bench_import, "import-time regression check for app"),
+    "signature": (bench_signature, "sign/verify throughput per signature scheme"),
+    "paillier": (bench_paillier, "Paillier encrypt/decrypt at 512/1024/2048 bits"),
+    "codec": (bench_codec, "decimal-string vs binary ciphertext storage"),
+    "encryption": (bench_encryption, "legacy CBC+HMAC vs AES-GCM enc_data tokens"),
+    "tokens": (bench_tokens, "cached token_for; token vs plaintext user lookups"),
+    "payload": (bench_payload, "per-transfer document bytes, string vs binary payload fields"),
+    "features": (bench_features, "feature extraction: strptime vs lookup table, list vs column path"),
+    "augment": (bench_augment, "row-wise vs vectorised dataset augmentation, streamed output"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SafePay micro-benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help="; ".join(f"{k}: {v[1]}" for k, v in sorted(BENCHMARKS.items())))
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each timed run")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent callers")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory mongomock database")
+    parser.add_argument("--accounts", type=int, default=4, help="accounts for the transfer test")
+    parser.add_argument("--transfers", type=int, default=2000, help="transfers (transfer) or documents (tokens) to generate")
+    parser.add_argument("--rows", type=int, default=200_000, help="dataset rows for the augment and features benchmarks")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scoring run")
+    parser.add_argument("--batch-size", type=int, default=32, help="micro-batch size for scoring")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="micro-batch wait for scoring")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="import-time budget for 'import app'")
+    parser.add_argument("--top", type=int, default=15, help="modules listed by the import benchmark")
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.benchmark][0](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
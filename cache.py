@@ -0,0 +1,214 @@
+"""
+Short-TTL read cache for the user dashboard.
+
+Caches, per user, the balance, the first page of transaction history and the
+unread notification count. Entries expire after SAFEPAY_CACHE_TTL seconds
+(default 30) and are invalidated explicitly by every write that changes them
+(transfer, undo, marking notifications read).
+
+Set SAFEPAY_CACHE_URL (or REDIS_URL, as most hosts provide it) to share one
+Redis (or Redis-compatible) cache between workers; this needs the `redis`
+package. Otherwise the cache is an in-process LRU of SAFEPAY_CACHE_SIZE
+entries (default 10000). Each gunicorn worker then has its own copy and a
+write handled by one worker is only seen by the others after the TTL, so
+this backend keeps entries for at most SAFEPAY_CACHE_LOCAL_TTL seconds
+(default 5). Hit/miss counters are per process (see /admin/cache_stats).
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from runtime import env_int, ProcessLocal
+
+# Everything cached per user; invalidate_user() drops all of them
+KINDS = ("balance", "history", "unread")
+
+
+class LocalCache:
+    """Thread-safe LRU with a per-entry expiry time.
+
+    Each invalidation stamps the user with the next value of a global clock
+    (`_generations`, itself an LRU of at most `maxsize` users). A user whose
+    stamp was evicted reads as the newest evicted stamp, so a load that
+    raced with an invalidation is still never stored.
+    """
+
+    def __init__(self, maxsize=10000, ttl=30):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data = OrderedDict()
+        self._generations = OrderedDict()
+        self._clock = 0
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def generation(self, user):
+        with self._lock:
+            return self._generations.get(user, self._evicted)
+
+    def set(self, key, value, user=None, generation=None):
+        with self._lock:
+            # A load that raced with an invalidation must not be stored
+            if user is not None and self._generations.get(user, self._evicted) != generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, keys, user=None):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+            if user is not None:
+                self._clock += 1
+                self._generations[user] = self._clock
+                self._generations.move_to_end(user)
+                while len(self._generations) > self.maxsize:
+                    _, stamp = self._generations.popitem(last=False)
+                    self._evicted = max(self._evicted, stamp)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """Same interface backed by Redis; values are stored as JSON."""
+
+    def __init__(self, url, ttl=30, prefix="safepay:cache:"):
+        import redis  # optional dependency, only needed for this backend
+        self._redis = redis
+        self.url = url
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+        self._client = ProcessLocal(lambda: self._redis.Redis.from_url(self.url, socket_timeout=0.5))
+
+    def _conn(self):
+        return self._client.get()
+
+    def get(self, key):
+        raw = self._conn().get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def generation(self, user):
+        return None
+
+    def set(self, key, value, user=None, generation=None):
+        self._conn().set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, keys, user=None):
+        if keys:
+            self._conn().delete(*(self.prefix + key for key in keys))
+
+    def __len__(self):
+        return sum(1 for _ in self._conn().scan_iter(self.prefix + "*"))
+
+
+_lock = threading.Lock()
+_cache = None
+_counters = {kind: {"hits": 0, "misses": 0, "errors": 0} for kind in KINDS}
+# Upper bound on an entry's age with the per-process backend, where another
+# worker's write cannot invalidate it
+LOCAL_TTL = env_int("SAFEPAY_CACHE_LOCAL_TTL", 5)
+
+
+def get_cache():
+    """Process-wide cache backend, built from the environment on first use."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                ttl = env_int("SAFEPAY_CACHE_TTL", 30)
+                url = os.environ.get("SAFEPAY_CACHE_URL") or os.environ.get("REDIS_URL")
+                if url:
+                    _cache = RedisCache(url, ttl)
+                else:
+                    _cache = LocalCache(env_int("SAFEPAY_CACHE_SIZE", 10000), min(ttl, LOCAL_TTL))
+    return _cache
+
+
+def _key(kind, user):
+    return f"{kind}:{user}"
+
+
+def _count(kind, name):
+    with _lock:
+        _counters[kind][name] += 1
+
+
+def cached(kind, user, load):
+    """Return the cached `kind` value for `user`, calling load() on a miss.
+
+    Cache failures (e.g. Redis down) fall through to load() so the page is
+    still served from MongoDB.
+    """
+    cache = get_cache()
+    key = _key(kind, user)
+    try:
+        generation = cache.generation(user)
+        value = cache.get(key)
+    except Exception:
+        _count(kind, "errors")
+        return load()
+    if value is not None:
+        _count(kind, "hits")
+        return value
+
+    _count(kind, "misses")
+    value = load()
+    try:
+        cache.set(key, value, user=user, generation=generation)
+    except Exception:
+        _count(kind, "errors")
+    return value
+
+
+def invalidate_user(*users, kinds=KINDS):
+    """Drop cached entries for each user (call after every write that affects them)."""
+    cache = get_cache()
+    for user in users:
+        try:
+            cache.delete([_key(kind, user) for kind in kinds], user=user)
+        except Exception:
+            # Entries still expire after the TTL
+            pass
+
+
+def stats():
+    """Hit/miss counters for this process, per kind and overall."""
+    with _lock:
+        kinds = {kind: dict(counts) for kind, counts in _counters.items()}
+    for counts in kinds.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+    hits = sum(c["hits"] for c in kinds.values())
+    misses = sum(c["misses"] for c in kinds.values())
+    cache = get_cache()
+    try:
+        entries = len(cache)
+    except Exception:
+        entries = None
+    return {
+        "backend": type(cache).__name__,
+        "ttl": cache.ttl,
+        "entries": entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "kinds": kinds,
+    }
+
@@ -1,21 +1,13 @@
-import os
-from pymongo import MongoClient, ASCENDING
 from hashing import hash_password
+from mongo_client import get_db
+import rollups
+from indexes import ensure_indexes
 
-uri = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/safepay")
-client = MongoClient(uri)
-db = client.get_default_database()
-if db is None:
-    db = client["safepay"]
+db = get_db()
 
 
-# Indexes
-db.users.create_index([("username", ASCENDING)], unique=True)
-db.transactions.create_index([("customer_id", ASCENDING)])
-db.transactions.create_index([("receiver_id", ASCENDING)])
-db.transactions.create_index([("fraud_status", ASCENDING)])
-db.notifications.create_index([("user_id", ASCENDING)])
-db.notifications.create_index([("read", ASCENDING)])
+# Indexes (see indexes.py for the query shapes they serve)
+ensure_indexes(db)
 
 # Seed users if not present
 seed_users = [
@@ -27,6 +19,9 @@ for u in seed_users:
     if not db.users.find_one({"username": u["username"]}):
         db.users.insert_one(u)
 
+# Admin dashboard counters (see rollups.py)
+rollups.reconcile(db)
+
 print("MongoDB initialized and seeded!")
 
 '''
@@ -1,15 +1,150 @@
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import hashes
+import os
+import threading
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa, padding
 
-private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-public_key = private_key.public_key()
 
-def sign_data(data):
-    return private_key.sign(data.encode(), padding.PKCS1v15(), hashes.SHA256())
+# Signature scheme: "ed25519" (default, fast) or "rsa" (RSA-2048 PKCS1v15/SHA-256)
+SCHEME = os.environ.get("SAFEPAY_SIGNATURE_SCHEME", "ed25519").lower()
+
+
+class Ed25519Scheme:
+    name = "ed25519"
+
+    def generate(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature: bytes, data: bytes):
+        public_key.verify(signature, data)
+
+
+class RSAScheme:
+    name = "rsa"
+
+    def generate(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+
+    def verify(self, public_key, signature: bytes, data: bytes):
+        public_key.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
+
+
+SCHEMES = {s.name: s for s in (Ed25519Scheme(), RSAScheme())}
+
+
+def key_path(scheme_name: str) -> str:
+    return os.path.join(os.path.dirname(__file__), f"signing_key_{scheme_name}.pem")
+
+
+class MissingSigningKey(Exception):
+    """Verification was asked for a scheme whose key file does not exist."""
+
+
+def _load_key(scheme):
+    path = key_path(scheme.name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
 
-def verify_signature(data, signature):
+
+def _load_or_create_key(scheme):
+    key = _load_key(scheme)
+    if key is not None:
+        return key
+    path = key_path(scheme.name)
+    key = scheme.generate()
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    # Write then link into place, so concurrent workers on a cold directory
+    # agree on one fully written key.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
     try:
-        public_key.verify(signature, data.encode(), padding.PKCS1v15(), hashes.SHA256())
-        return True
-    except:
-        return False
+        os.link(tmp_path, path)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            key = serialization.load_pem_private_key(f.read(), password=None)
+    finally:
+        os.unlink(tmp_path)
+    return key
+
+
+class Signer:
+    """A signature scheme bound to its persistent key pair.
+
+    With create=False the key must already exist (MissingSigningKey
+    otherwise), so verifying never mints a key other processes would adopt.
+    """
+
+    def __init__(self, scheme_name: str, create: bool = True):
+        if scheme_name not in SCHEMES:
+            raise ValueError(f"Unknown signature scheme: {scheme_name}")
+        self.scheme = SCHEMES[scheme_name]
+        if create:
+            self.private_key = _load_or_create_key(self.scheme)
+        else:
+            self.private_key = _load_key(self.scheme)
+            if self.private_key is None:
+                raise MissingSigningKey(f"No signing key at {key_path(scheme_name)}")
+        self.public_key = self.private_key.public_key()
+
+    def sign(self, data: str) -> bytes:
+        return self.scheme.sign(self.private_key, data.encode())
+
+    def verify(self, data: str, signature: bytes) -> bool:
+        try:
+            self.scheme.verify(self.public_key, signature, data.encode())
+            return True
+        except Exception:
+            return False
+
+
+# Loaded on first use rather than at import (see load_keys)
+_signers = {}
+_lock = threading.Lock()
+
+
+def get_signer(scheme_name: str = None) -> Signer:
+    """Signer for `scheme_name` (default: the configured SCHEME)."""
+    scheme_name = scheme_name or SCHEME
+    signer = _signers.get(scheme_name)
+    if signer is None:
+        with _lock:
+            signer = _signers.get(scheme_name)
+            if signer is None:
+                signer = _signers[scheme_name] = Signer(scheme_name)
+    return signer
+
+
+def get_verifier(scheme_name: str = None) -> Signer:
+    """Like get_signer, but only loads an existing key (see Signer)."""
+    scheme_name = scheme_name or SCHEME
+    signer = _signers.get(scheme_name)
+    if signer is None:
+        with _lock:
+            signer = _signers.get(scheme_name)
+            if signer is None:
+                signer = _signers[scheme_name] = Signer(scheme_name, create=False)
+    return signer
+
+
+def load_keys():
+    signer = get_signer()
+    return signer.private_key, signer.public_key
+
+def sign_data(data):
+    return get_signer().sign(data)
+
+def verify_signature(data, signature, scheme=None):
+    return get_verifier(scheme).verify(data, signature)
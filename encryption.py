@@ -1,11 +1,18 @@
 import os
 import base64
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import padding, hashes, hmac
 
 
 KEY_PATH = os.path.join(os.path.dirname(__file__), "aes_key.bin")
 
+# Tokens are "v2:" + base64(nonce || AES-256-GCM ciphertext+tag). Tokens
+# without a prefix are the legacy base64(iv || AES-CBC ciphertext || HMAC).
+V2_PREFIX = "v2:"
+NONCE_SIZE = 12
+
 
 def _load_or_create_key() -> bytes:
     if os.path.exists(KEY_PATH):
@@ -21,8 +28,45 @@ def _load_or_create_key() -> bytes:
 
 _KEY = _load_or_create_key()
 
+# GCM gets its own subkey so the legacy CBC/HMAC key is never reused by another algorithm.
+# AESGCM objects hold no per-message state and are safe to share between threads.
+_AEAD = AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"safepay aes-gcm v2").derive(_KEY))
+
 
 def encrypt_data(data: str) -> str:
+    nonce = os.urandom(NONCE_SIZE)
+    ct = _AEAD.encrypt(nonce, data.encode("utf-8"), None)
+    return V2_PREFIX + base64.b64encode(nonce + ct).decode("ascii")
+
+
+def decrypt_data(token: str) -> str:
+    if token.startswith(V2_PREFIX):
+        raw = base64.b64decode(token[len(V2_PREFIX):].encode("ascii"))
+        return _AEAD.decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], None).decode("utf-8")
+    return _decrypt_legacy(token)
+
+
+def encrypt_many(items):
+    """encrypt_data() for a list of strings, with one urandom call for all nonces."""
+    nonces = os.urandom(NONCE_SIZE * len(items))
+    encrypt = _AEAD.encrypt
+    return [
+        V2_PREFIX + base64.b64encode(
+            nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+            + encrypt(nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE], data.encode("utf-8"), None)
+        ).decode("ascii")
+        for i, data in enumerate(items)
+    ]
+
+
+def decrypt_many(tokens):
+    """decrypt_data() for a list of tokens (any mix of formats)."""
+    return [decrypt_data(token) for token in tokens]
+
+
+# ---------------- LEGACY CBC + HMAC ----------------
+def _encrypt_legacy(data: str) -> str:
+    # Only kept to produce legacy tokens for benchmarks and compatibility checks
     iv = os.urandom(16)
     cipher = Cipher(algorithms.AES(_KEY), modes.CBC(iv))
     encryptor = cipher.encryptor()
@@ -36,7 +80,7 @@ def encrypt_data(data: str) -> str:
     return base64.b64encode(iv + ct + tag).decode("ascii")
 
 
-def decrypt_data(token: str) -> str:
+def _decrypt_legacy(token: str) -> str:
     raw = base64.b64decode(token.encode("ascii"))
     iv, rest = raw[:16], raw[16:]
     ct, tag = rest[:-32], rest[-32:]
@@ -0,0 +1,142 @@
+"""
+Fraud model features, shared by training (model_train_augmented.py), batch
+re-scoring and online serving (model_predict.py) so all three compute them
+the same way.
+
+Expiry features count months from an explicit reference month instead of
+"now": train with the month the dataset was generated for, serve with the
+month of the transaction (the current month by default). MM/YY strings are
+resolved through a precomputed table rather than strptime.
+"""
+
+from datetime import date
+
+import numpy as np
+
+FEATURE_COLUMNS = [
+    "Age",
+    "Transaction_Amount",
+    "Account_Balance",
+    "Card_Type_Encoded",
+    "Months_Until_Expiry",
+    "Is_Expired",
+    "Is_Soon_Expiry",
+]
+# Bump when the feature definitions change (invalidates cached feature matrices)
+FEATURE_VERSION = 1
+SOON_EXPIRY_MONTHS = 3
+# From this many rows feature_matrix() works on whole columns (training,
+# batch re-scoring); smaller online batches use plain Python lists
+COLUMN_PATH_MIN_ROWS = 256
+
+
+def _expiry_table():
+    """Every string datetime.strptime(s, "%m/%y") accepts -> absolute month index.
+
+    Months may have one or two digits; years 69-99 are 19xx, 00-68 are 20xx.
+    """
+    table = {}
+    for yy in range(100):
+        year = 1900 + yy if yy >= 69 else 2000 + yy
+        for month in range(1, 13):
+            index = year * 12 + month - 1
+            table[f"{month:02d}/{yy:02d}"] = index
+            if month < 10:
+                table[f"{month}/{yy:02d}"] = index
+    return table
+
+
+EXPIRY_MONTHS = _expiry_table()
+
+
+def month_index(reference=None):
+    """Absolute month index (year * 12 + month - 1) of a date, datetime or "YYYY-MM".
+
+    None means the current month; ints are returned unchanged.
+    """
+    if reference is None:
+        reference = date.today()
+    if isinstance(reference, (int, np.integer)):
+        return int(reference)
+    if isinstance(reference, str):
+        year, month = (int(part) for part in reference.split("-")[:2])
+        if not 1 <= month <= 12:
+            raise ValueError(f"invalid month: {reference!r}")
+        return year * 12 + month - 1
+    return reference.year * 12 + reference.month - 1
+
+
+def format_month(index):
+    """Inverse of month_index: "YYYY-MM"."""
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _months(expiry, ref):
+    lookup = EXPIRY_MONTHS.get
+    # Unknown values resolve to the reference month itself, i.e. 0 months
+    return [lookup(value, ref) - ref for value in expiry]
+
+
+def _months_column(expiry, ref):
+    import pandas as pd
+
+    # Only the distinct strings (a few hundred at most) go through the table
+    codes, uniques = pd.factorize(np.asarray(expiry, dtype=object))
+    lookup = EXPIRY_MONTHS.get
+    # Code -1 (missing values) picks the trailing 0
+    months = np.array([lookup(value, ref) - ref for value in uniques] + [0], dtype=np.int64)
+    return months[codes]
+
+
+def months_until_expiry(expiry, reference=None):
+    """Months from the reference month to each MM/YY expiry; 0 if unparseable."""
+    ref = month_index(reference)
+    if len(expiry) >= COLUMN_PATH_MIN_ROWS:
+        return _months_column(expiry, ref)
+    return np.array(_months(expiry, ref), dtype=np.int64)
+
+
+def feature_matrix(age, amount, balance, card_codes, expiry, reference=None):
+    """The (n, 7) float64 matrix in FEATURE_COLUMNS order from column arrays.
+
+    Large inputs are built column by column with numpy. Small ones use
+    plain Python per element and a single array conversion: numpy calls
+    cost microseconds each, which dominates for the single-row batches
+    online scoring sends.
+    """
+    ref = month_index(reference)
+    if len(expiry) >= COLUMN_PATH_MIN_ROWS:
+        months = _months_column(expiry, ref)
+        # All float64 up front: mixed dtypes make column_stack several times slower
+        return np.column_stack([
+            np.asarray(age, dtype=np.float64),
+            np.asarray(amount, dtype=np.float64),
+            np.asarray(balance, dtype=np.float64),
+            np.asarray(card_codes, dtype=np.float64),
+            months.astype(np.float64),
+            (months < 0).astype(np.float64),
+            ((months >= 0) & (months <= SOON_EXPIRY_MONTHS)).astype(np.float64),
+        ])
+
+    months = _months(expiry, ref)
+    return np.array([
+        age,
+        amount,
+        balance,
+        card_codes,
+        months,
+        [m < 0 for m in months],
+        [0 <= m <= SOON_EXPIRY_MONTHS for m in months],
+    ], dtype=np.float64).T
+
+
+def rows_feature_matrix(rows, card_type_encoder, reference=None):
+    """feature_matrix() for a list of transaction dicts."""
+    return feature_matrix(
+        [row["Age"] for row in rows],
+        [row["Transaction_Amount"] for row in rows],
+        [row["Account_Balance"] for row in rows],
+        card_type_encoder.transform([row["Card_Type"] for row in rows]),
+        [row["Expiry_Date"] for row in rows],
+        reference,
+    )
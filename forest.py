@@ -0,0 +1,140 @@
+"""
+Compiled random forest: the fitted sklearn trees flattened into contiguous
+numpy arrays, evaluated for all trees and rows at once.
+
+Export (needs sklearn):   python3 forest.py [model.pkl] [encoder.pkl] [out.npz]
+Inference (numpy only):   forest = load_forest("fraud_model_augmented.npz")
+"""
+
+import numpy as np
+
+COMPILED_MODEL_PATH = "fraud_model_augmented.npz"
+
+
+def export_forest(model, card_type_encoder, path=COMPILED_MODEL_PATH):
+    """Flatten a fitted RandomForestClassifier (and its LabelEncoder) to `path`.
+
+    Nodes of every tree are concatenated; child indices are rewritten to
+    global offsets and leaves point to themselves so traversal can run a
+    fixed number of steps. Leaf values are stored already normalised, the
+    same way DecisionTreeClassifier.predict_proba normalises them.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        idx = np.arange(n, dtype=np.int64)
+        is_leaf = tree.children_left == -1
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer[:, np.newaxis]
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+        lefts.append(np.where(is_leaf, idx, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, idx, tree.children_right) + offset)
+        values.append(value)
+        roots.append(offset)
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += n
+
+    np.savez(
+        path,
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int64),
+        max_depth=np.int64(max_depth),
+        classes=np.asarray(model.classes_),
+        card_types=np.asarray(card_type_encoder.classes_, dtype=str),
+    )
+
+
+class CardTypeEncoder:
+    """LabelEncoder.transform without sklearn."""
+
+    def __init__(self, classes):
+        self.classes_ = classes
+        self._index = {str(c): i for i, c in enumerate(classes)}
+
+    def transform(self, labels):
+        try:
+            return np.array([self._index[str(label)] for label in labels], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e.args[0]!r}")
+
+
+class CompiledForest:
+    """Vectorised evaluator matching RandomForestClassifier.predict exactly."""
+
+    def __init__(self, arrays, chunk_rows=4096):
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        # children[node, 1] is the left child, children[node, 0] the right one
+        self.children = np.stack([arrays["right"], arrays["left"]], axis=1).astype(np.intp)
+        self.value = arrays["value"]
+        self.roots = arrays["roots"].astype(np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        self.classes_ = arrays["classes"]
+        self.card_type_encoder = CardTypeEncoder(arrays["card_types"])
+        self.chunk_rows = chunk_rows
+
+    def _proba_chunk(self, X):
+        # sklearn evaluates splits on float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = self.children[nodes, go_left.view(np.int8)]
+            if np.array_equal(next_nodes, nodes):
+                break  # every row has reached a leaf in every tree
+            nodes = next_nodes
+
+        # Accumulate tree by tree, in order, like RandomForestClassifier
+        leaf_values = self.value[nodes]
+        proba = np.zeros((n_rows, self.value.shape[1]), dtype=np.float64)
+        for tree_values in leaf_values:
+            proba += tree_values
+        proba /= len(self.roots)
+        return proba
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(X)
+        if X.shape[0] <= self.chunk_rows:
+            return self._proba_chunk(X)
+        return np.concatenate([
+            self._proba_chunk(X[i:i + self.chunk_rows])
+            for i in range(0, X.shape[0], self.chunk_rows)
+        ])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def load_forest(path=COMPILED_MODEL_PATH):
+    with np.load(path, allow_pickle=False) as arrays:
+        return CompiledForest({k: arrays[k] for k in arrays.files})
+
+
+if __name__ == "__main__":
+    import sys
+    import pickle
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "fraud_model_augmented.pkl"
+    encoder_path = sys.argv[2] if len(sys.argv) > 2 else "card_type_encoder.pkl"
+    out_path = sys.argv[3] if len(sys.argv) > 3 else COMPILED_MODEL_PATH
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    with open(encoder_path, "rb") as f:
+        encoder = pickle.load(f)
+    export_forest(model, encoder, out_path)
+    print(f"✓ Compiled {len(model.estimators_)} trees to '{out_path}'")
@@ -0,0 +1,24 @@
+# Gunicorn picks this file up automatically from the working directory.
+import mongo_client
+
+# Import the app once in the master so workers inherit it copy-on-write.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before workers fork.
+    if server.cfg.preload_app:
+        from app import warm_up
+        warm_up()
+
+
+def post_fork(server, worker):
+    # Each worker opens its own MongoDB pool after the fork.
+    mongo_client.close_client()
+
+
+def worker_exit(server, worker):
+    # Write any queued notifications before the pool goes away.
+    from notifications import dispatcher
+    dispatcher.flush(5)
+    mongo_client.close_client()
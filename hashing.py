@@ -4,13 +4,22 @@ import hmac
 from typing import Tuple
 
 
+# Current password hashing policy. Stored hashes that differ are upgraded
+# on the next successful login (see needs_rehash).
+ALGORITHM = "pbkdf2_sha256"
+try:
+    ITERATIONS = int(os.environ.get("SAFEPAY_PBKDF2_ITERATIONS", 200_000))
+except ValueError:
+    ITERATIONS = 200_000
+
+
 def _pbkdf2(password: str, salt: bytes, iterations: int = 200_000, dklen: int = 32) -> bytes:
     return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=dklen)
 
 
 def hash_password(password: str) -> str:
     """Return a string "pbkdf2_sha256$iterations$salt_hex$hash_hex"."""
-    iterations = 200_000
+    iterations = ITERATIONS
     salt = os.urandom(16)
     dk = _pbkdf2(password, salt, iterations)
     return f"pbkdf2_sha256${iterations}${salt.hex()}${dk.hex()}"
@@ -19,7 +28,7 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, stored: str) -> bool:
     try:
         algorithm, iter_s, salt_hex, hash_hex = stored.split("$")
-        if algorithm != "pbkdf2_sha256":
+        if algorithm != ALGORITHM:
             return False
         iterations = int(iter_s)
         salt = bytes.fromhex(salt_hex)
@@ -30,6 +39,15 @@ def verify_password(password: str, stored: str) -> bool:
         return False
 
 
+def needs_rehash(stored: str) -> bool:
+    """True if `stored` was hashed with a different algorithm or iteration count."""
+    try:
+        algorithm, iter_s, _, _ = stored.split("$")
+        return algorithm != ALGORITHM or int(iter_s) != ITERATIONS
+    except ValueError:
+        return True
+
+
 def generate_hash(data: str) -> str:
     """Simple SHA-256 hash for transaction integrity and signatures."""
     return hashlib.sha256(data.encode("utf-8")).hexdigest()
@@ -2,6 +2,9 @@ import os
 import json
 import secrets
 import math
+import threading
+import collections
+from runtime import env_int, ProcessLocal
 
 KEY_PATH_PRIV = os.path.join(os.path.dirname(__file__), "paillier_priv.json")
 KEY_PATH_PUB = os.path.join(os.path.dirname(__file__), "paillier_pub.json")
@@ -50,22 +53,54 @@ def _L(u, n):
     return (u - 1) // n
 
 
+def _factor_from_lambda(n, lambda_param, attempts=64):
+    """Recover (p, q) from n and a multiple of the group exponent.
+
+    Used for keys saved before p and q were stored. Any nontrivial square
+    root of 1 mod n found along a^(t*2^i) reveals a factor via gcd.
+    """
+    t = lambda_param
+    while t % 2 == 0:
+        t //= 2
+    for _ in range(attempts):
+        a = secrets.randbelow(n - 3) + 2
+        d = math.gcd(a, n)
+        if d != 1:
+            return d, n // d
+        x = pow(a, t, n)
+        while x not in (1, n - 1):
+            y = pow(x, 2, n)
+            if y == 1:
+                p = math.gcd(x - 1, n)
+                return p, n // p
+            x = y
+    return None
+
+
 class Paillier:
-    def __init__(self, keysize=512):
+    def __init__(self, keysize=512, persist=True):
         self.n = None
         self.nsquare = None
         self.g = None
         self.lambda_param = None
         self.mu = None
-        if os.path.exists(KEY_PATH_PRIV) and os.path.exists(KEY_PATH_PUB):
+        # Private primes (None for keys saved before they were stored)
+        self.p = None
+        self.q = None
+        self._rn_pool = collections.deque()
+        self._rn_pool_size = env_int("SAFEPAY_PAILLIER_POOL", 64)
+        self._rn_event = threading.Event()
+        self._rn_thread = None
+        self._rn_worker = ProcessLocal(self._start_rn_pool)
+        if persist and os.path.exists(KEY_PATH_PRIV) and os.path.exists(KEY_PATH_PUB):
             try:
                 self._load_keys()
                 return
             except Exception:
                 pass
-        self._generate_keys(keysize)
+        self._generate_keys(keysize, save=persist)
 
-    def _generate_keys(self, keysize=512):
+    def _generate_keys(self, keysize=512, save=True):
         # Generate two primes
         p = _generate_prime(keysize // 2)
         q = _generate_prime(keysize // 2)
@@ -87,11 +122,16 @@ class Paillier:
         self.g = g
         self.lambda_param = lambda_param
         self.mu = mu
-        self._save_keys()
+        self.p = p
+        self.q = q
+        self._precompute()
+        if save:
+            self._save_keys()
 
     def _save_keys(self):
         pub = {"n": hex(self.n), "g": hex(self.g)}
-        priv = {"lambda": hex(self.lambda_param), "mu": hex(self.mu), "n": hex(self.n)}
+        priv = {"lambda": hex(self.lambda_param), "mu": hex(self.mu), "n": hex(self.n),
+                "p": hex(self.p), "q": hex(self.q)}
         with open(KEY_PATH_PUB, "w") as f:
             json.dump(pub, f)
         with open(KEY_PATH_PRIV, "w") as f:
@@ -107,18 +147,86 @@ class Paillier:
         self.nsquare = self.n * self.n
         self.lambda_param = int(priv["lambda"], 16)
         self.mu = int(priv["mu"], 16)
+        if "p" in priv and "q" in priv:
+            self.p = int(priv["p"], 16)
+            self.q = int(priv["q"], 16)
+        else:
+            self.p, self.q = _factor_from_lambda(self.n, self.lambda_param) or (None, None)
+        self._precompute()
+
+    def _precompute(self):
+        """Derive the constants used by the fast encrypt/decrypt paths."""
+        self._g_is_n_plus_1 = self.g == self.n + 1
+        self._crt = self.p is not None and self.q is not None and self.p * self.q == self.n
+        if not self._crt:
+            return
+        p, q = self.p, self.q
+        self._psquare = p * p
+        self._qsquare = q * q
+        # Decryption mod p and q (Paillier 1999, section 7)
+        self._hp = pow(_L(pow(self.g, p - 1, self._psquare), p), -1, p)
+        self._hq = pow(_L(pow(self.g, q - 1, self._qsquare), q), -1, q)
+        self._q_inv_p = pow(q, -1, p)
+        # r^n mod p^2 / q^2 with the exponent reduced by phi(p^2) / phi(q^2)
+        self._n_mod_phi_psquare = self.n % (p * (p - 1))
+        self._n_mod_phi_qsquare = self.n % (q * (q - 1))
+        self._qsquare_inv_psquare = pow(self._qsquare, -1, self._psquare)
+
+    def _random_rn(self) -> int:
+        """Draw r in Z*_n and return the blinding factor r^n mod n^2."""
+        r = secrets.randbelow(self.n)
+        while r == 0 or math.gcd(r, self.n) != 1:
+            r = secrets.randbelow(self.n)
+        if not self._crt:
+            return pow(r, self.n, self.nsquare)
+        rp = pow(r, self._n_mod_phi_psquare, self._psquare)
+        rq = pow(r, self._n_mod_phi_qsquare, self._qsquare)
+        return rq + self._qsquare * (((rp - rq) * self._qsquare_inv_psquare) % self._psquare)
+
+    def _fill_rn_pool(self):
+        while True:
+            while len(self._rn_pool) < self._rn_pool_size:
+                self._rn_pool.append(self._random_rn())
+            self._rn_event.clear()
+            self._rn_event.wait()
+
+    def _start_rn_pool(self):
+        self._rn_pool = collections.deque()
+        self._rn_event = threading.Event()
+        self._rn_thread = threading.Thread(target=self._fill_rn_pool, name="paillier-rn-pool", daemon=True)
+        self._rn_thread.start()
+        return self._rn_thread
+
+    def _next_rn(self) -> int:
+        if self._rn_pool_size <= 0:
+            return self._random_rn()
+        self._rn_worker.get()
+        try:
+            rn = self._rn_pool.popleft()
+        except IndexError:
+            rn = self._random_rn()
+        self._rn_event.set()
+        return rn
+
+    def _g_pow(self, m: int) -> int:
+        if self._g_is_n_plus_1:
+            # (n + 1)^m = 1 + m*n (mod n^2)
+            return (1 + m * self.n) % self.nsquare
+        return pow(self.g, m, self.nsquare)
 
     def encrypt(self, m: int) -> int:
         """Encrypt an integer m (>=0). Returns ciphertext as integer."""
         if m < 0:
             raise ValueError("Paillier implementation expects non-negative integers for m")
-        r = secrets.randbelow(self.n)
-        while math.gcd(r, self.n) != 1:
-            r = secrets.randbelow(self.n)
-        c = (pow(self.g, m, self.nsquare) * pow(r, self.n, self.nsquare)) % self.nsquare
+        c = (self._g_pow(m) * self._next_rn()) % self.nsquare
         return c
 
     def decrypt(self, c: int) -> int:
+        if self._crt:
+            p, q = self.p, self.q
+            mp = (_L(pow(c, p - 1, self._psquare), p) * self._hp) % p
+            mq = (_L(pow(c, q - 1, self._qsquare), q) * self._hq) % q
+            return mq + q * (((mp - mq) * self._q_inv_p) % p)
         x = pow(c, self.lambda_param, self.nsquare)
         l = _L(x, self.n)
         m = (l * self.mu) % self.n
@@ -129,15 +237,20 @@ class Paillier:
 
     def add_ciphertext_plain(self, c: int, m: int) -> int:
         # c * g^m mod nsquare
-        return (c * pow(self.g, m, self.nsquare)) % self.nsquare
+        return (c * self._g_pow(m)) % self.nsquare
 
 
 # Module-level instance (lazy)
 _instance = None
+_instance_lock = threading.Lock()
 
 
-def get_paillier(keysize=512):
+def get_paillier(keysize=None):
     global _instance
     if _instance is None:
-        _instance = Paillier(keysize=keysize)
+        with _instance_lock:
+            if _instance is None:
+                if keysize is None:
+                    keysize = env_int("SAFEPAY_PAILLIER_BITS", 512)
+                _instance = Paillier(keysize=keysize)
     return _instance
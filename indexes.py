@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Index plan for every query the web app issues, and a checker for it.
+
+ensure_indexes() creates the indexes idempotently (db.py and the app call it
+at startup) and drops the obsolete ones they replace. `check` runs explain() on each entry in QUERY_SHAPES and fails
+if any winning plan contains a COLLSCAN or an in-memory SORT.
+
+Usage:
+  python3 indexes.py ensure
+  python3 indexes.py check
+"""
+
+import sys
+import argparse
+from pymongo import ASCENDING, DESCENDING
+
+# Read notifications are deleted this long after read_at (TTL index)
+READ_NOTIFICATION_TTL_SECONDS = 30 * 24 * 3600
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        # Also serves the login lookup on username + role: username is unique.
+        ([("username", ASCENDING)], {"unique": True}),
+    ],
+    "transactions": [
+        # User lookups go through the searchable tokens (ledger.py); the
+        # plaintext-id indexes stay until every query has moved over
+        ([("customer_token", ASCENDING), ("_id", DESCENDING)], {}),
+        ([("receiver_token", ASCENDING), ("_id", DESCENDING)], {}),
+        ([("customer_id", ASCENDING), ("_id", DESCENDING)], {}),
+        ([("receiver_id", ASCENDING)], {}),
+        ([("fraud_status", ASCENDING)], {}),
+    ],
+    "transaction_logs": [
+        ([("timestamp", DESCENDING)], {}),
+        ([("undo_batch", ASCENDING)], {"sparse": True}),
+    ],
+    "notifications": [
+        ([("user_id", ASCENDING), ("read", ASCENDING), ("timestamp", DESCENDING)], {}),
+        # Only read notifications have read_at, so unread ones never expire
+        ([("read_at", ASCENDING)], {"expireAfterSeconds": READ_NOTIFICATION_TTL_SECONDS}),
+    ],
+    "encrypted_total_pending": [
+        ([("doc_id", ASCENDING), ("field", ASCENDING)], {}),
+    ],
+}
+
+# Indexes created by earlier releases that a compound index above now covers.
+# ensure_indexes() drops them so writes stop paying to maintain them.
+OBSOLETE_INDEXES = {
+    "transactions": ["customer_id_1"],
+    "notifications": ["user_id_1", "read_1"],
+}
+
+# Representative instance of every query shape issued by the request path:
+# (name, collection, filter, sort, limit). Keep in sync with app.py.
+QUERY_SHAPES = [
+    ("login", "users", {"username": "user1", "role": "user"}, None, 1),
+    ("user by name", "users", {"username": "user1"}, None, 1),
+    ("admin user list", "users", {}, [("username", ASCENDING)], 0),
+    ("admin transactions page", "transactions", {}, [("_id", DESCENDING)], 51),
+    ("admin transactions next page", "transactions",
+     {"_id": {"$lt": "000000000000000000000000"}}, [("_id", DESCENDING)], 51),
+    ("admin recent logs", "transaction_logs", {}, [("timestamp", DESCENDING)], 100),
+    ("log by id", "transaction_logs", {"_id": "000000000000000000000000"}, None, 1),
+    ("logs claimed by an undo batch", "transaction_logs", {"undo_batch": "000000000000000000000000"}, None, 0),
+    ("users in an undo batch", "users", {"username": {"$in": ["user1", "saksham"]}}, None, 0),
+    ("user transactions page", "transactions", {"customer_token": "tok"}, [("_id", DESCENDING)], 21),
+    ("user transactions next page", "transactions",
+     {"customer_token": "tok", "_id": {"$lt": "000000000000000000000000"}}, [("_id", DESCENDING)], 21),
+    ("user received transactions page", "transactions", {"receiver_token": "tok"}, [("_id", DESCENDING)], 21),
+    ("user ledger page", "transactions",
+     {"$or": [{"customer_token": "tok"}, {"receiver_token": "tok"}]}, [("_id", DESCENDING)], 21),
+    ("user ledger next page", "transactions",
+     {"$or": [{"customer_token": "tok", "_id": {"$lt": "000000000000000000000000"}},
+              {"receiver_token": "tok", "_id": {"$lt": "000000000000000000000000"}}]},
+     [("_id", DESCENDING)], 21),
+    ("unread notifications", "notifications", {"user_id": "user1", "read": False},
+     [("timestamp", DESCENDING)], 20),
+    ("unread count / mark all read", "notifications", {"user_id": "user1", "read": False}, None, 0),
+    ("mark read by ids", "notifications",
+     {"user_id": "user1", "read": False, "_id": {"$in": ["000000000000000000000000"]}}, None, 0),
+    ("encrypted running total", "encrypted_totals", {"_id": {"$in": ["global", "global:0"]}}, None, 0),
+    ("queued running total updates", "encrypted_total_pending",
+     {"doc_id": {"$in": ["global", "global:0"]}, "field": "sent_enc"}, None, 0),
+    ("rollup global", "stats_rollups", {"_id": "global"}, None, 1),
+    ("rollup user", "stats_rollups", {"_id": "user:user1"}, None, 1),
+    ("rollup buckets", "stats_rollups", {"_id": {"$regex": "^day:"}}, [("_id", DESCENDING)], 30),
+]
+
+
+def drop_obsolete_indexes(db):
+    """Drop the OBSOLETE_INDEXES that exist; returns their "collection.name"s."""
+    dropped = []
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = db[collection].index_information()
+        for name in names:
+            if name in existing:
+                db[collection].drop_index(name)
+                dropped.append(f"{collection}.{name}")
+    return dropped
+
+
+def ensure_indexes(db):
+    """Create every index in INDEXES and drop the OBSOLETE_INDEXES.
+
+    Creating an index that already exists is a no-op. Returns the dropped
+    "collection.name"s.
+    """
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            db[collection].create_index(keys, **options)
+    return drop_obsolete_indexes(db)
+
+
+def _oid_placeholders(value):
+    """Swap the 24-zero placeholder strings for real ObjectIds."""
+    from bson.objectid import ObjectId
+    if isinstance(value, dict):
+        return {k: _oid_placeholders(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_oid_placeholders(v) for v in value]
+    if value == "000000000000000000000000":
+        return ObjectId(value)
+    return value
+
+
+def _stages(plan):
+    """Every stage name in an explain plan tree (classic and SBE formats)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans(db):
+    """Return [(name, problem)] for every query shape with a bad plan."""
+    problems = []
+    for name, collection, query, sort, limit in QUERY_SHAPES:
+        command = {"find": collection, "filter": _oid_placeholders(query)}
+        if sort:
+            command["sort"] = dict(sort)
+        if limit:
+            command["limit"] = limit
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        planner = explain.get("queryPlanner", {})
+        stages = set(_stages(planner.get("winningPlan", {})))
+        if "EOF" in stages and not stages - {"EOF"}:
+            # Collection does not exist yet: nothing to judge
+            problems.append((name, "collection missing (plan not checked)"))
+            continue
+        if "COLLSCAN" in stages:
+            problems.append((name, "COLLSCAN"))
+        if "SORT" in stages:
+            problems.append((name, "in-memory SORT"))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and check MongoDB indexes")
+    parser.add_argument("command", choices=["ensure", "check"])
+    args = parser.parse_args(argv)
+
+    from mongo_client import get_db
+    db = get_db()
+    dropped = ensure_indexes(db)
+    if args.command == "ensure":
+        for name in dropped:
+            print(f"  dropped obsolete index {name}")
+        print("✓ Indexes ensured")
+        return 0
+
+    problems = check_query_plans(db)
+    failed = False
+    bad = {name for name, _ in problems}
+    for name, *_ in QUERY_SHAPES:
+        if name not in bad:
+            print(f"  ✓ {name}")
+    for name, problem in problems:
+        failed = failed or not problem.startswith("collection missing")
+        print(f"  {'⚠' if problem.startswith('collection missing') else '✗'} {name}: {problem}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
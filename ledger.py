@@ -0,0 +1,51 @@
+from searchable_encryption import token_for
+from pagination import keyset_page
+
+# Which token field holds the user for each direction
+DIRECTION_FIELDS = {"sent": "customer_token", "received": "receiver_token"}
+DIRECTIONS = ("all",) + tuple(DIRECTION_FIELDS)
+
+# Fields a ledger row may show. The sender's balance is only shown on the
+# sender's own rows (see ledger_row).
+LEDGER_FIELDS = {
+    "customer_id": 1, "receiver_id": 1, "customer_token": 1, "amount": 1, "txntype": 1,
+    "merchant": 1, "balance": 1, "fraud_status": 1, "verified": 1, "reversed": 1,
+}
+
+
+def user_filter(username, direction="sent"):
+    """Transactions filter for one user, by searchable token instead of plaintext id.
+
+    "all" is an $or of both directions. Each direction is served by the
+    {customer_token: 1, _id: -1} / {receiver_token: 1, _id: -1} indexes
+    (see indexes.py), so "all" sorted by _id is a SORT_MERGE of two index
+    scans, with no in-memory sort.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+    token = token_for(username)
+    if direction == "all":
+        return {"$or": [{field: token} for field in DIRECTION_FIELDS.values()]}
+    return {DIRECTION_FIELDS[direction]: token}
+
+
+def user_transactions(db, username, direction, projection, limit, cursor=None):
+    """One keyset page of a user's transactions in `direction`, newest first."""
+    return keyset_page(db.transactions, user_filter(username, direction), projection, limit, cursor)
+
+
+def ledger_row(txn, username):
+    """A JSON-safe ledger row as seen by `username`."""
+    sent = txn.get("customer_token") == token_for(username)
+    row = {
+        "direction": "sent" if sent else "received",
+        "counterparty": txn.get("receiver_id") if sent else txn.get("customer_id"),
+        "timestamp": txn["_id"].generation_time.isoformat(),
+        "amount": txn.get("amount"),
+        "txntype": txn.get("txntype"),
+        "merchant": txn.get("merchant"),
+        "reversed": bool(txn.get("reversed")),
+    }
+    if sent:
+        row.update(balance=txn.get("balance"), fraud_status=txn.get("fraud_status"), verified=txn.get("verified"))
+    return row
@@ -0,0 +1,194 @@
+"""
+Login protection: bounded password verification and rate limiting.
+
+PBKDF2 costs ~100 ms of CPU per attempt, so verification runs on a small
+per-process thread pool (hashlib releases the GIL while hashing) with a cap
+on queued work, and attempts are rate limited per username and per client IP
+before any hashing happens. Limits and counters are per worker process.
+
+  SAFEPAY_LOGIN_WORKERS        threads verifying passwords (default 2)
+  SAFEPAY_LOGIN_MAX_PENDING    queued + running verifications before 503 (default 16)
+  SAFEPAY_LOGIN_USER_FAILURES  failed logins per username per window (default 5)
+  SAFEPAY_LOGIN_IP_ATTEMPTS    login attempts per IP per window (default 30)
+  SAFEPAY_LOGIN_WINDOW         window length in seconds (default 300)
+"""
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hashing import verify_password, hash_password, needs_rehash
+from runtime import env_int, ProcessLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoginBusy(Exception):
+    """Too many verifications already queued; the caller should retry later."""
+
+
+class RateLimited(Exception):
+    pass
+
+
+class WindowCounter:
+    """Fixed-window counters per key, e.g. failed logins per username.
+
+    At most `max_keys` keys are tracked. To make room, expired windows go
+    first, then the oldest keys still under the limit. Keys over the limit
+    are never evicted: if every tracked key is locked out, new keys are not
+    counted until a window expires.
+    """
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        # Every window has the same length, so insertion order is expiry order
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _current(self, key, now):
+        entry = self._counts.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        return entry
+
+    def exceeded(self, key):
+        with self._lock:
+            entry = self._current(key, time.monotonic())
+            return entry is not None and entry[1] >= self.limit
+
+    def _make_room(self, now):
+        """Evict one key if the table is full; False if only lockouts are left."""
+        while self._counts and next(iter(self._counts.values()))[0] <= now:
+            self._counts.popitem(last=False)
+        if len(self._counts) < self.max_keys:
+            return True
+        for old_key, (_, count) in self._counts.items():
+            if count < self.limit:
+                del self._counts[old_key]
+                return True
+        return False
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(key, now)
+            if entry is None:
+                # A new window goes to the back of the expiry order
+                self._counts.pop(key, None)
+                if len(self._counts) >= self.max_keys and not self._make_room(now):
+                    logger.warning("login counter full of locked-out keys (%d); not counting new keys",
+                                   len(self._counts))
+                    return
+                entry = [now + self.window, 0]
+                self._counts[key] = entry
+            entry[1] += 1
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+class PasswordVerifier:
+    """Run verify_password on a bounded thread pool and record its latency."""
+
+    def __init__(self, workers=2, max_pending=16, samples=1000):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(self.workers, int(max_pending))
+        self._latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+        self._pool = ProcessLocal(self._build_pool)
+
+    def _build_pool(self):
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="login")
+        return executor, threading.BoundedSemaphore(self.max_pending)
+
+    def _run(self, fn, *args):
+        executor, slots = self._pool.get()
+        if not slots.acquire(blocking=False):
+            raise LoginBusy("Too many logins in progress")
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def verify(self, password, stored):
+        start = time.perf_counter()
+        result = self._run(verify_password, password, stored)
+        # Queueing + hashing time of verifications that ran (not rejections)
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def latency(self):
+        samples = sorted(self._latencies)
+        if not samples:
+            return {"samples": 0}
+        pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 1)
+        return {"samples": len(samples), "p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": round(samples[-1] * 1000, 1)}
+
+
+_window = env_int("SAFEPAY_LOGIN_WINDOW", 300)
+verifier = PasswordVerifier(env_int("SAFEPAY_LOGIN_WORKERS", 2), env_int("SAFEPAY_LOGIN_MAX_PENDING", 16))
+user_failures = WindowCounter(env_int("SAFEPAY_LOGIN_USER_FAILURES", 5), _window)
+ip_attempts = WindowCounter(env_int("SAFEPAY_LOGIN_IP_ATTEMPTS", 30), _window)
+_counters = {"attempts": 0, "succeeded": 0, "failed": 0, "rate_limited": 0, "busy": 0, "rehashed": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def check_login(db, username, password, role, ip):
+    """Return the user document if the credentials are valid, else None.
+
+    Raises RateLimited or LoginBusy before any hashing if the username or IP
+    is over its limit or the verification pool is full. A successful login
+    with a hash from an older policy rewrites the stored hash.
+    """
+    _count("attempts")
+    if user_failures.exceeded(username) or ip_attempts.exceeded(ip):
+        _count("rate_limited")
+        raise RateLimited("Too many login attempts. Try again later.")
+    ip_attempts.hit(ip)
+
+    user = db.users.find_one({"username": username, "role": role})
+    try:
+        ok = bool(user) and verifier.verify(password, user.get("password", ""))
+    except LoginBusy:
+        _count("busy")
+        raise
+    if not ok:
+        _count("failed")
+        user_failures.hit(username)
+        return None
+
+    _count("succeeded")
+    user_failures.reset(username)
+    if needs_rehash(user.get("password", "")):
+        try:
+            # Only replace the hash we verified, in case it changed meanwhile
+            db.users.update_one(
+                {"_id": user["_id"], "password": user["password"]},
+                {"$set": {"password": verifier.hash(password)}},
+            )
+            _count("rehashed")
+        except Exception:
+            # Retried on the next login
+            pass
+    return user
+
+
+def stats():
+    """Counters and verify latency for this process."""
+    with _counters_lock:
+        counters = dict(_counters)
+    return dict(counters, verify_latency=verifier.latency())
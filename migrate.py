@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Batched data migrations.
+
+Usage:
+  python3 migrate.py <migration> [--batch-size 1000] [--dry-run]
+  python3 migrate.py --help
+"""
+
+import sys
+import argparse
+from pymongo import UpdateOne
+
+
+def _collection_sizes(db, name):
+    """(data size, storage size, index size) in bytes, or None if unavailable."""
+    try:
+        stats = db.command("collStats", name)
+    except Exception:
+        return None
+    return stats.get("size", 0), stats.get("storageSize", 0), stats.get("totalIndexSize", 0)
+
+
+def _print_sizes(label, sizes):
+    if sizes is None:
+        print(f"  {label}: collStats unavailable")
+        return
+    size, storage, index = sizes
+    print(f"  {label}: data {size / 1024:,.1f} KiB, storage {storage / 1024:,.1f} KiB, indexes {index / 1024:,.1f} KiB")
+
+
+def _run_batched(collection, query, projection, convert, batch_size, dry_run, convert_many=None, unset=(),
+                 skip=None):
+    """Rewrite every document matching `query` with `convert(doc) -> $set dict`.
+
+    Documents are read in _id order and written back with one unordered
+    bulk_write per batch. `convert_many(docs) -> [$set dict]` can be given
+    instead of `convert` to convert a whole batch in one call, and `unset`
+    fields are removed from every document. Documents for which `skip(doc)`
+    is true are left untouched (also in a dry run). Returns the number of
+    documents converted.
+    """
+    if convert_many is None:
+        def convert_many(docs):
+            return [convert(doc) for doc in docs]
+
+    converted = 0
+    batch = []
+
+    def flush():
+        if not dry_run:
+            ops = []
+            for doc, fields in zip(batch, convert_many(batch)):
+                update = {"$set": fields} if fields else {}
+                if unset:
+                    update["$unset"] = dict.fromkeys(unset, "")
+                ops.append(UpdateOne({"_id": doc["_id"]}, update))
+            collection.bulk_write(ops, ordered=False)
+        return len(batch)
+
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    for doc in cursor:
+        if skip is not None and skip(doc):
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            converted += flush()
+            batch = []
+            print(f"  ... {converted:,} documents")
+    if batch:
+        converted += flush()
+    return converted
+
+
+# ---------------- AMOUNT_ENC ----------------
+def migrate_amount_enc(db, args):
+    """Decimal-string Paillier ciphertexts -> versioned fixed-width BSON Binary."""
+    from homomorphic import get_paillier
+    from storage_codec import encode_ciphertext, ciphertext_width
+
+    width = ciphertext_width(get_paillier().nsquare)
+    targets = [
+        ("transactions", ["amount_enc"]),
+        ("encrypted_totals", ["sent_enc", "received_enc"]),
+        ("encrypted_total_pending", ["c"]),
+    ]
+    for name, fields in targets:
+        before = _collection_sizes(db, name)
+        total = 0
+        for field in fields:
+            def convert(doc, field=field):
+                return {field: encode_ciphertext(int(doc[field]), width)}
+
+            query = {field: {"$type": "string", "$ne": ""}}
+            total += _run_batched(db[name], query, {field: 1}, convert, args.batch_size, args.dry_run)
+        print(f"{name}: {total:,} values {'to convert' if args.dry_run else 'converted'}")
+        _print_sizes("before", before)
+        if not args.dry_run:
+            # Sizes shrink as WiredTiger rewrites pages; run `compact` to reclaim space
+            _print_sizes("after ", _collection_sizes(db, name))
+
+
+# ---------------- ENC_DATA V2 ----------------
+def migrate_enc_data_v2(db, args):
+    """Re-encrypt legacy AES-CBC+HMAC enc_data tokens as AES-GCM ("v2:")."""
+    from encryption import decrypt_many, encrypt_many, V2_PREFIX
+
+    def convert_many(docs):
+        tokens = encrypt_many(decrypt_many([doc["enc_data"] for doc in docs]))
+        return [{"enc_data": token} for token in tokens]
+
+    # hash and signature cover the plaintext, so they stay valid
+    query = {"enc_data": {"$type": "string", "$ne": "", "$not": {"$regex": f"^{V2_PREFIX}"}}}
+    for name in ("transactions", "transaction_logs", "notifications"):
+        total = _run_batched(db[name], query, {"enc_data": 1}, None, args.batch_size, args.dry_run,
+                             convert_many=convert_many)
+        print(f"{name}: {total:,} tokens {'to re-encrypt' if args.dry_run else 're-encrypted'}")
+
+
+# ---------------- BINARY SECURITY FIELDS ----------------
+SECURITY_FIELDS = {"enc_data": 1, "hash": 1, "signature": 1, "signature_hex": 1}
+
+
+def _missing_security_fields(doc):
+    """True if the hash or signature is missing or not hex, so cannot be stored as Binary."""
+    from storage_codec import decode_security_fields
+
+    fields = decode_security_fields(doc)
+    try:
+        bytes.fromhex(fields["hash"])
+        bytes.fromhex(fields["signature_hex"])
+    except (TypeError, ValueError):
+        return True
+    return False
+
+
+def _binary_security_fields(docs):
+    """Legacy string enc_data/hash/signature_hex -> Binary; legacy CBC tokens become v2."""
+    from encryption import decrypt_many, encrypt_many, V2_PREFIX
+    from storage_codec import decode_security_fields, encode_security_fields
+
+    fields = [decode_security_fields(doc) for doc in docs]
+    legacy = [i for i, f in enumerate(fields) if not f["enc_data"].startswith(V2_PREFIX)]
+    if legacy:
+        tokens = encrypt_many(decrypt_many([fields[i]["enc_data"] for i in legacy]))
+        for i, token in zip(legacy, tokens):
+            fields[i]["enc_data"] = token
+    return [encode_security_fields(f["enc_data"], f["hash"], bytes.fromhex(f["signature_hex"]))
+            for f in fields]
+
+
+def _avg_doc_size(db, name):
+    try:
+        return db.command("collStats", name).get("avgObjSize", 0)
+    except Exception:
+        return None
+
+
+def migrate_binary_security(db, args):
+    """Store enc_data/hash/signature as Binary on transactions only; logs reference them."""
+    legacy_strings = {"enc_data": {"$type": "string", "$ne": ""}}
+    steps = [
+        ("transactions", "to binary", legacy_strings, ("signature_hex",)),
+        # Logs of a transaction: the payload already lives on the transaction
+        ("transaction_logs", "dropped (kept on the transaction)",
+         {"transaction_id": {"$exists": True}, "enc_data": {"$exists": True}},
+         ("enc_data", "hash", "signature_hex", "signature_scheme")),
+        # Logs from before transaction_id existed keep their own payload
+        ("transaction_logs", "to binary (no transaction)",
+         dict(legacy_strings, transaction_id={"$exists": False}), ("signature_hex",)),
+    ]
+    before = {name: (_collection_sizes(db, name), _avg_doc_size(db, name)) for name in ("transactions", "transaction_logs")}
+    skipped = {}
+    for name, label, query, unset in steps:
+        dropping = "enc_data" in unset
+
+        def skip(doc, name=name):
+            if _missing_security_fields(doc):
+                skipped.setdefault(name, []).append(doc["_id"])
+                return True
+            return False
+
+        total = _run_batched(
+            db[name], query, SECURITY_FIELDS, None, args.batch_size, args.dry_run,
+            convert_many=(lambda docs: [{}] * len(docs)) if dropping else _binary_security_fields,
+            unset=unset, skip=None if dropping else skip,
+        )
+        print(f"{name}: {total:,} payloads {label}{' (dry run)' if args.dry_run else ''}")
+
+    for name, ids in skipped.items():
+        # Left as they are; `audit.py` reports them as failing verification
+        print(f"{name}: {len(ids):,} skipped (missing or malformed hash/signature_hex): "
+              f"{', '.join(map(str, ids[:10]))}{' ...' if len(ids) > 10 else ''}")
+
+    for name, (sizes, avg) in before.items():
+        print(f"\n{name}")
+        _print_sizes("before", sizes)
+        if not args.dry_run:
+            # Sizes shrink as WiredTiger rewrites pages; run `compact` to reclaim space
+            _print_sizes("after ", _collection_sizes(db, name))
+            after = _avg_doc_size(db, name)
+            if avg and after:
+                print(f"  average document: {avg:,} -> {after:,} bytes ({1 - after / avg:.0%} smaller)")
+
+
+# ---------------- SEARCH TOKENS ----------------
+def migrate_search_tokens(db, args):
+    """Fill in customer_token / receiver_token where they are missing or empty."""
+    from searchable_encryption import token_for
+
+    def convert(doc):
+        return {
+            "customer_token": token_for(doc.get("customer_id")),
+            "receiver_token": token_for(doc.get("receiver_id")),
+        }
+
+    query = {"$or": [{"customer_token": {"$in": [None, ""]}}, {"receiver_token": {"$in": [None, ""]}}]}
+    total = _run_batched(db.transactions, query, {"customer_id": 1, "receiver_id": 1}, convert,
+                         args.batch_size, args.dry_run)
+    print(f"transactions: {total:,} {'to tokenize' if args.dry_run else 'tokenized'}")
+
+
+MIGRATIONS = {
+    "amount-enc": (migrate_amount_enc, "store amount_enc as binary instead of decimal strings"),
+    "enc-data-v2": (migrate_enc_data_v2, "re-encrypt legacy CBC+HMAC enc_data with AES-GCM"),
+    "search-tokens": (migrate_search_tokens, "backfill missing customer/receiver search tokens"),
+    "binary-security": (migrate_binary_security,
+                        "store enc_data/hash/signature as binary, once per transaction"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SafePay data migrations")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS),
+                        help="; ".join(f"{k}: {v[1]}" for k, v in sorted(MIGRATIONS.items())))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count documents without writing")
+    args = parser.parse_args(argv)
+
+    from mongo_client import get_db
+    MIGRATIONS[args.migration][0](get_db(), args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
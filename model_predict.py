@@ -1,50 +1,69 @@
+import os
 import pickle
-import numpy as np
-from datetime import datetime
+import threading
+from forest import COMPILED_MODEL_PATH, load_forest
+from features import rows_feature_matrix
 
 # Original model removed from runtime to keep repo lightweight.
 # We proxy predict_fraud to the augmented model below for compatibility.
 
-# Load augmented model and encoder
-with open("fraud_model_augmented.pkl", "rb") as f:
-    model_augmented = pickle.load(f)
+# Augmented model and encoder, loaded on first use (or by load_model() from a
+# warm-up hook so forked workers share them copy-on-write).
+model_augmented = None
+card_type_encoder = None
+_load_lock = threading.Lock()
+
+
+def load_model():
+    """Load the augmented model and card type encoder once per process.
+
+    The compiled forest (see forest.py) gives identical predictions without
+    importing sklearn; the pickles are the fallback.
+    """
+    global model_augmented, card_type_encoder
+    if model_augmented is not None:
+        return model_augmented, card_type_encoder
+    with _load_lock:
+        if model_augmented is None:
+            if os.path.exists(COMPILED_MODEL_PATH):
+                model = load_forest(COMPILED_MODEL_PATH)
+                encoder = model.card_type_encoder
+            else:
+                with open("fraud_model_augmented.pkl", "rb") as f:
+                    model = pickle.load(f)
+
+                with open("card_type_encoder.pkl", "rb") as f:
+                    encoder = pickle.load(f)
+            card_type_encoder = encoder
+            model_augmented = model
+    return model_augmented, card_type_encoder
 
-with open("card_type_encoder.pkl", "rb") as f:
-    card_type_encoder = pickle.load(f)
 
 def predict_fraud(data):
     """Backward compatibility: route to augmented model."""
     return predict_fraud_augmented(data)
 
+def _feature_matrix(rows, reference=None):
+    """Build the (n, 7) feature matrix for a list of transaction dicts."""
+    _, encoder = load_model()
+    return rows_feature_matrix(rows, encoder, reference)
+
+
+def predict_fraud_batch(rows, reference=None):
+    """Score many transactions with a single model call.
+
+    `reference` is the month expiry features count from (see features.py):
+    the current month by default; pass the transactions' month when
+    re-scoring history. Returns a list of "Fraudulent"/"Legit" labels in
+    input order.
+    """
+    if not rows:
+        return []
+    model, _ = load_model()
+    preds = model.predict(_feature_matrix(rows, reference))
+    return ["Fraudulent" if pred == 1 else "Legit" for pred in preds]
+
+
 def predict_fraud_augmented(data):
     """New prediction function using augmented model with expiry date and card type"""
-    # Parse expiry date to get months until expiry
-    def parse_expiry_date(expiry_str):
-        try:
-            expiry_date = datetime.strptime(expiry_str, "%m/%y")
-            current_date = datetime.now()
-            months_diff = (expiry_date.year - current_date.year) * 12 + (expiry_date.month - current_date.month)
-            return months_diff
-        except:
-            return 0
-    
-    months_until_expiry = parse_expiry_date(data["Expiry_Date"])
-    is_expired = 1 if months_until_expiry < 0 else 0
-    is_soon_expiry = 1 if (months_until_expiry >= 0 and months_until_expiry <= 3) else 0
-    
-    # Encode card type
-    card_type_encoded = card_type_encoder.transform([data["Card_Type"]])[0]
-    
-    # Create feature array
-    features = np.array([[
-        data["Age"],
-        data["Transaction_Amount"],
-        data["Account_Balance"],
-        card_type_encoded,
-        months_until_expiry,
-        is_expired,
-        is_soon_expiry
-    ]])
-    
-    pred = model_augmented.predict(features)[0]
-    return "Fraudulent" if pred == 1 else "Legit"
+    return predict_fraud_batch([data])[0]
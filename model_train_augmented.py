@@ -1,122 +1,234 @@
+#!/usr/bin/env python3
+"""
+Train the augmented fraud model.
+
+  python3 model_train_augmented.py [--data transactions_augmented.csv] [--reference-month YYYY-MM] [--no-cache]
+
+Features come from features.py, the same code serving uses, and are cached
+as <cache-dir>/<key>.npz, keyed by the dataset's SHA-256, FEATURE_VERSION and
+the reference month expiry features count from (--reference-month, default
+the current month; use the month the dataset was augmented for), so re-runs
+on the same data skip feature engineering. The forest trains on all
+cores; with a fixed random_state the trees are the same as a single-threaded
+fit. Besides the pickles and the compiled forest, the run writes
+fraud_model_augmented.json with the feature list, training date, metrics and
+stage timings.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, precision_score, recall_score, f1_score
-import pickle
-from datetime import datetime
-
-print("Loading augmented dataset...")
-df = pd.read_csv("transactions_augmented.csv")
-
-print(f"Dataset shape: {df.shape}")
-print(f"Fraud distribution: {df['Is_Fraud'].value_counts()}")
-
-# Encode Card_Type
-label_encoder_card = LabelEncoder()
-df["Card_Type_Encoded"] = label_encoder_card.fit_transform(df["Card_Type"])
-
-# Process Expiry_Date to extract features
-def parse_expiry_date(expiry_str):
-    """Parse MM/YY format and return months until expiry"""
-    try:
-        expiry_date = datetime.strptime(expiry_str, "%m/%y")
-        current_date = datetime.now()
-        months_diff = (expiry_date.year - current_date.year) * 12 + (expiry_date.month - current_date.month)
-        return months_diff
-    except:
-        return 0
-
-df["Months_Until_Expiry"] = df["Expiry_Date"].apply(parse_expiry_date)
-
-# Create binary feature for expired cards
-df["Is_Expired"] = (df["Months_Until_Expiry"] < 0).astype(int)
-
-# Create binary feature for soon-to-expire cards (within 3 months)
-df["Is_Soon_Expiry"] = ((df["Months_Until_Expiry"] >= 0) & (df["Months_Until_Expiry"] <= 3)).astype(int)
-
-# Select features for the model
-feature_columns = [
-    "Age", 
-    "Transaction_Amount", 
-    "Account_Balance",
-    "Card_Type_Encoded",
-    "Months_Until_Expiry",
-    "Is_Expired",
-    "Is_Soon_Expiry"
-]
-
-X = df[feature_columns]
-y = df["Is_Fraud"]
-
-print(f"\nFeatures used: {feature_columns}")
-print(f"Feature matrix shape: {X.shape}")
-
-# Train-test split with 80/20 ratio
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-print(f"\nTraining set size: {X_train.shape[0]}")
-print(f"Test set size: {X_test.shape[0]}")
-
-# Train the model
-print("\nTraining Random Forest model...")
-model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=20, min_samples_split=10)
-model.fit(X_train, y_train)
-
-# Make predictions
-y_pred = model.predict(X_test)
-
-# Calculate evaluation metrics
-print("\n" + "="*60)
-print("MODEL EVALUATION METRICS")
-print("="*60)
-
-accuracy = accuracy_score(y_test, y_pred)
-precision = precision_score(y_test, y_pred)
-recall = recall_score(y_test, y_pred)
-f1 = f1_score(y_test, y_pred)
-
-print(f"\nAccuracy:  {accuracy:.4f}")
-print(f"Precision: {precision:.4f}")
-print(f"Recall:    {recall:.4f}")
-print(f"F1-Score:  {f1:.4f}")
-
-print("\n" + "-"*60)
-print("CLASSIFICATION REPORT")
-print("-"*60)
-print(classification_report(y_test, y_pred, target_names=["Legit", "Fraudulent"]))
-
-print("-"*60)
-print("CONFUSION MATRIX")
-print("-"*60)
-cm = confusion_matrix(y_test, y_pred)
-print(f"True Negatives:  {cm[0][0]}")
-print(f"False Positives: {cm[0][1]}")
-print(f"False Negatives: {cm[1][0]}")
-print(f"True Positives:  {cm[1][1]}")
-print()
-print(cm)
-
-# Feature importance
-print("\n" + "-"*60)
-print("FEATURE IMPORTANCE")
-print("-"*60)
-feature_importance = pd.DataFrame({
-    'feature': feature_columns,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
-print(feature_importance.to_string(index=False))
-
-# Save the trained model and encoders
-print("\n" + "="*60)
-print("Saving model and encoders...")
-with open("fraud_model_augmented.pkl", "wb") as f:
-    pickle.dump(model, f)
-
-with open("card_type_encoder.pkl", "wb") as f:
-    pickle.dump(label_encoder_card, f)
-
-print("✓ Model saved as 'fraud_model_augmented.pkl'")
-print("✓ Card type encoder saved as 'card_type_encoder.pkl'")
-print("\nModel training completed successfully!")
-print("="*60)
+from forest import COMPILED_MODEL_PATH, export_forest, load_forest
+from features import FEATURE_COLUMNS, FEATURE_VERSION, feature_matrix, month_index, format_month
+
+DATA_PATH = "transactions_augmented.csv"
+FEATURE_CACHE_DIR = ".feature_cache"
+MODEL_PATH = "fraud_model_augmented.pkl"
+ENCODER_PATH = "card_type_encoder.pkl"
+METADATA_PATH = "fraud_model_augmented.json"
+RAW_COLUMNS = ["Age", "Transaction_Amount", "Account_Balance", "Card_Type", "Expiry_Date", "Is_Fraud"]
+MODEL_PARAMS = {"n_estimators": 100, "random_state": 42, "max_depth": 20, "min_samples_split": 10}
+
+
+# ---------------- FEATURES ----------------
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_features(df, reference):
+    """Return (X, y, card_types) for the raw columns in `df`."""
+    card_types, card_codes = np.unique(df["Card_Type"].to_numpy(dtype=str), return_inverse=True)
+    X = feature_matrix(
+        df["Age"].to_numpy(dtype=np.float64),
+        df["Transaction_Amount"].to_numpy(dtype=np.float64),
+        df["Account_Balance"].to_numpy(dtype=np.float64),
+        card_codes,
+        df["Expiry_Date"].to_numpy(),
+        reference,
+    )
+    return X, df["Is_Fraud"].to_numpy(dtype=np.int64), card_types
+
+
+def load_features(path, reference, cache_dir=FEATURE_CACHE_DIR, use_cache=True):
+    """Features for the CSV at `path`, from the on-disk cache when possible.
+
+    Returns (X, y, card_types, info) where info has the dataset hash, the
+    cache file and whether it was a hit.
+    """
+    sha = file_sha256(path)
+    reference = month_index(reference)
+    cache_path = os.path.join(cache_dir, f"{sha[:20]}-v{FEATURE_VERSION}-{format_month(reference)}.npz")
+    info = {"sha256": sha, "reference_month": format_month(reference), "cache_path": cache_path, "cache_hit": False}
+
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cached:
+            info["cache_hit"] = True
+            return cached["X"], cached["y"], cached["card_types"], info
+
+    df = pd.read_csv(path, usecols=RAW_COLUMNS)
+    X, y, card_types = build_features(df, reference)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, X=X, y=y, card_types=card_types)
+        os.replace(tmp_path, cache_path)
+    return X, y, card_types, info
+
+
+# ---------------- TRAINING ----------------
+def train(data_path=DATA_PATH, cache_dir=FEATURE_CACHE_DIR, use_cache=True, n_jobs=-1, reference=None):
+    timings = {}
+    started = time.perf_counter()
+
+    print(f"Loading features for {data_path}...")
+    t0 = time.perf_counter()
+    X, y, card_types, dataset = load_features(data_path, reference, cache_dir, use_cache)
+    timings["features"] = time.perf_counter() - t0
+    print(f"  {'cache hit' if dataset['cache_hit'] else 'computed'} ({timings['features']:.2f}s): {dataset['cache_path']}")
+
+    print(f"Dataset shape: {X.shape}")
+    print(f"Fraud distribution: {np.bincount(y).tolist()}")
+    print(f"\nFeatures used: {FEATURE_COLUMNS} (expiry relative to {dataset['reference_month']})")
+
+    # Train-test split with 80/20 ratio
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    print(f"\nTraining set size: {X_train.shape[0]}")
+    print(f"Test set size: {X_test.shape[0]}")
+
+    print(f"\nTraining Random Forest model (n_jobs={n_jobs})...")
+    t0 = time.perf_counter()
+    model = RandomForestClassifier(n_jobs=n_jobs, **MODEL_PARAMS)
+    model.fit(X_train, y_train)
+    timings["fit"] = time.perf_counter() - t0
+    print(f"  fitted in {timings['fit']:.2f}s")
+
+    t0 = time.perf_counter()
+    y_pred = model.predict(X_test)
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred, zero_division=0),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+    }
+    cm = confusion_matrix(y_test, y_pred, labels=[0, 1])
+    timings["evaluate"] = time.perf_counter() - t0
+
+    print("\n" + "="*60)
+    print("MODEL EVALUATION METRICS")
+    print("="*60)
+    print(f"\nAccuracy:  {metrics['accuracy']:.4f}")
+    print(f"Precision: {metrics['precision']:.4f}")
+    print(f"Recall:    {metrics['recall']:.4f}")
+    print(f"F1-Score:  {metrics['f1']:.4f}")
+
+    print("\n" + "-"*60)
+    print("CLASSIFICATION REPORT")
+    print("-"*60)
+    print(classification_report(y_test, y_pred, labels=[0, 1], target_names=["Legit", "Fraudulent"], zero_division=0))
+
+    print("-"*60)
+    print("CONFUSION MATRIX")
+    print("-"*60)
+    print(f"True Negatives:  {cm[0][0]}")
+    print(f"False Positives: {cm[0][1]}")
+    print(f"False Negatives: {cm[1][0]}")
+    print(f"True Positives:  {cm[1][1]}")
+    print()
+    print(cm)
+
+    print("\n" + "-"*60)
+    print("FEATURE IMPORTANCE")
+    print("-"*60)
+    feature_importance = pd.DataFrame({
+        'feature': FEATURE_COLUMNS,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+    print(feature_importance.to_string(index=False))
+
+    print("\n" + "="*60)
+    print("Saving model and encoders...")
+    t0 = time.perf_counter()
+    label_encoder_card = LabelEncoder()
+    label_encoder_card.classes_ = card_types
+
+    with open(MODEL_PATH, "wb") as f:
+        pickle.dump(model, f)
+
+    with open(ENCODER_PATH, "wb") as f:
+        pickle.dump(label_encoder_card, f)
+
+    # Compiled copy for sklearn-free serving; must agree with the forest exactly
+    export_forest(model, label_encoder_card, COMPILED_MODEL_PATH)
+    compiled = load_forest(COMPILED_MODEL_PATH)
+    if not np.array_equal(compiled.predict(X_test), y_pred):
+        raise RuntimeError("Compiled forest predictions differ from sklearn")
+    timings["export"] = time.perf_counter() - t0
+    timings["total"] = time.perf_counter() - started
+
+    metadata = {
+        "model": "RandomForestClassifier",
+        "params": dict(MODEL_PARAMS, n_jobs=n_jobs),
+        "features": FEATURE_COLUMNS,
+        "feature_version": FEATURE_VERSION,
+        "card_types": card_types.tolist(),
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "reference_month": dataset["reference_month"],
+        "dataset": {
+            "path": data_path,
+            "sha256": dataset["sha256"],
+            "rows": int(X.shape[0]),
+            "fraud_rows": int(y.sum()),
+            "train_rows": int(X_train.shape[0]),
+            "test_rows": int(X_test.shape[0]),
+        },
+        "metrics": dict({k: round(float(v), 6) for k, v in metrics.items()}, confusion_matrix=cm.tolist()),
+        "feature_importance": dict(zip(FEATURE_COLUMNS, (round(float(v), 6) for v in model.feature_importances_))),
+        "feature_cache_hit": dataset["cache_hit"],
+        "timings_s": {k: round(v, 3) for k, v in timings.items()},
+    }
+    with open(METADATA_PATH, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"✓ Model saved as '{MODEL_PATH}'")
+    print(f"✓ Card type encoder saved as '{ENCODER_PATH}'")
+    print(f"✓ Compiled forest saved as '{COMPILED_MODEL_PATH}'")
+    print(f"✓ Metadata saved as '{METADATA_PATH}'")
+    print("\nWall time: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    print("\nModel training completed successfully!")
+    print("="*60)
+    return metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the augmented fraud model")
+    parser.add_argument("--data", default=DATA_PATH, help="augmented dataset CSV")
+    parser.add_argument("--cache-dir", default=FEATURE_CACHE_DIR, help="directory for cached feature matrices")
+    parser.add_argument("--no-cache", action="store_true", help="recompute features and do not write the cache")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used to fit the forest (-1 = all)")
+    parser.add_argument("--reference-month", type=month_index, default=None,
+                        help="YYYY-MM expiry features count from (default: current month)")
+    args = parser.parse_args(argv)
+    train(args.data, args.cache_dir, not args.no_cache, args.n_jobs, args.reference_month)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import atexit
+import threading
+from pymongo import MongoClient
+from runtime import env_int
+
+DEFAULT_URI = "mongodb://localhost:27017/safepay"
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _client_options() -> dict:
+    """Pool size and timeouts, overridable through the environment."""
+    return {
+        "maxPoolSize": env_int("MONGODB_MAX_POOL_SIZE", 20),
+        "minPoolSize": env_int("MONGODB_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": env_int("MONGODB_MAX_IDLE_TIME_MS", 60_000),
+        "connectTimeoutMS": env_int("MONGODB_CONNECT_TIMEOUT_MS", 10_000),
+        "serverSelectionTimeoutMS": env_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 10_000),
+        "socketTimeoutMS": env_int("MONGODB_SOCKET_TIMEOUT_MS", 30_000),
+        "waitQueueTimeoutMS": env_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5_000),
+    }
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide MongoClient, creating it on first use.
+
+    The client is keyed on the current pid so a process forked after the
+    client was created (e.g. a gunicorn worker with preload_app) builds its
+    own pool instead of sharing sockets with the parent.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            uri = os.environ.get("MONGODB_URI", DEFAULT_URI)
+            _client = MongoClient(uri, connect=False, **_client_options())
+            _client_pid = pid
+    return _client
+
+
+def get_db(client: MongoClient = None):
+    if client is None:
+        client = get_client()
+    return client.get_default_database(default="safepay")
+
+
+def close_client():
+    """Close the pool owned by this process (no-op after a fork)."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _reset_after_fork():
+    # Drop the inherited reference without closing it: the sockets belong to
+    # the parent process.
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(close_client)
@@ -0,0 +1,179 @@
+import queue
+import atexit
+import threading
+import time
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+from runtime import env_int, ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+
+def build_notifications(recipients, kind, payload, timestamp):
+    """Notification documents for one event.
+
+    `recipients` is [(user_id, message)]. The payload is encrypted, hashed and
+    signed once and the security fields are shared by every recipient.
+    """
+    from encryption import encrypt_data
+    from hashing import generate_hash
+    from digital_signature import sign_data, verify_signature, SCHEME
+
+    enc_data = encrypt_data(payload)
+    hash_value = generate_hash(payload)
+    signature = sign_data(hash_value)
+    verified = verify_signature(hash_value, signature)
+    return [
+        {
+            "user_id": user_id,
+            "message": message,
+            "timestamp": timestamp,
+            "read": False,
+            "type": kind,
+            "enc_data": enc_data,
+            "verified": bool(verified),
+            "hash": hash_value,
+            "signature_hex": signature.hex() if hasattr(signature, "hex") else str(signature),
+            "signature_scheme": SCHEME,
+        }
+        for user_id, message in recipients
+    ]
+
+
+class NotificationDispatcher:
+    """Build and insert notifications off the request thread.
+
+    `submit()` queues an event and returns immediately. A small pool of
+    worker threads drains the queue: each collects up to `max_batch_size`
+    events (waiting at most `max_wait_ms` after the first), builds their
+    documents and writes the whole batch with one insert_many. With
+    `workers=0` events are written synchronously in the caller.
+
+    A failed insert is retried `retries` times with exponential backoff
+    starting at `retry_delay_ms`; batches that still fail are logged and
+    counted in `failed`.
+    """
+
+    def __init__(self, workers=2, max_batch_size=100, max_wait_ms=20, retries=3, retry_delay_ms=100):
+        self.workers = max(0, int(workers))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.retries = max(0, int(retries))
+        self.retry_delay = max(0.0, float(retry_delay_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._pool = ProcessLocal(self._start_workers, lock=self._lock)
+        self.failed = 0
+
+    def _start_workers(self):
+        # Called by self._pool with self._lock held
+        self._queue = queue.Queue()
+        self._pending = 0
+        threads = [threading.Thread(target=self._run, name=f"notify-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def submit(self, recipients, kind, payload, timestamp=None):
+        """Queue one event for `recipients` ([(user_id, message)])."""
+        event = (list(recipients), kind, payload, timestamp or datetime.now())
+        if not self.workers:
+            self._write([event])
+            return
+        self._pool.get()
+        with self._lock:
+            self._pending += 1
+        self._queue.put(event)
+
+    def flush(self, timeout=None):
+        """Wait until every queued event is written; False on timeout."""
+        if not self.workers or not self._pool.started():
+            return True
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, docs):
+        """insert_many with retries.
+
+        _ids are fixed before the first attempt, so documents that landed
+        before a failure come back as duplicate-key errors, not duplicates.
+        """
+        from mongo_client import get_db
+
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        for attempt in range(self.retries + 1):
+            try:
+                get_db().notifications.insert_many(docs, ordered=False)
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if errors and all(err.get("code") == 11000 for err in errors) \
+                        and not e.details.get("writeConcernErrors"):
+                    return
+                error = e
+            except PyMongoError as e:
+                error = e
+            if attempt < self.retries:
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning("notification insert failed (%s); retry %d/%d in %.2fs",
+                               error, attempt + 1, self.retries, delay)
+                time.sleep(delay)
+        raise error
+
+    def _write(self, events):
+        import cache
+
+        docs = []
+        for recipients, kind, payload, timestamp in events:
+            docs.extend(build_notifications(recipients, kind, payload, timestamp))
+        if docs:
+            self._insert(docs)
+            cache.invalidate_user(*{doc["user_id"] for doc in docs}, kinds=("unread",))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._write(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("notification dispatch failed (%d events dropped)", len(batch))
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+
+# Process-wide dispatcher for the web app
+dispatcher = NotificationDispatcher(
+    workers=env_int("SAFEPAY_NOTIFY_WORKERS", 2),
+    max_batch_size=env_int("SAFEPAY_NOTIFY_MAX_BATCH", 100),
+    max_wait_ms=env_int("SAFEPAY_NOTIFY_MAX_WAIT_MS", 20),
+    retries=env_int("SAFEPAY_NOTIFY_RETRIES", 3),
+)
+
+
+def notify(recipients, kind, payload, timestamp=None):
+    dispatcher.submit(recipients, kind, payload, timestamp)
+
+
+# Give queued notifications a chance to land on a clean shutdown
+atexit.register(dispatcher.flush, 5)
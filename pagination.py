@@ -0,0 +1,41 @@
+import base64
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+
+def encode_cursor(oid: ObjectId) -> str:
+    """Opaque, URL-safe page cursor for a document _id."""
+    return base64.urlsafe_b64encode(oid.binary).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return ObjectId(raw)
+    except (ValueError, TypeError, InvalidId):
+        raise ValueError("Invalid page cursor")
+
+
+def keyset_page(collection, query, projection, limit, cursor=None):
+    """One page of documents, newest first, using `_id` as the keyset.
+
+    Returns (docs, next_cursor); next_cursor is None on the last page. The
+    projection must include `_id`. One extra document is fetched to know
+    whether another page exists, so no count query is needed.
+
+    For an `$or` query the `_id` bound is added to every branch, so each
+    branch can range-scan its own {field: 1, _id: -1} index and the results
+    are merged in order (SORT_MERGE) instead of sorted in memory.
+    """
+    query = dict(query)
+    if cursor:
+        bound = {"_id": {"$lt": decode_cursor(cursor)}}
+        if "$or" in query:
+            query["$or"] = [dict(branch, **bound) for branch in query["$or"]]
+        else:
+            query.update(bound)
+    docs = list(collection.find(query, projection).sort("_id", -1).limit(limit + 1))
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1]["_id"])
+    return docs, None
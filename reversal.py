@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Reverse (undo) logged transactions, one or many at a time.
+
+The logs are claimed with one update_many, the balance changes are netted per
+account and applied with one bulk_write, and the reversed transactions are
+flagged with one update_many. With SAFEPAY_TRANSFER_TRANSACTIONS (replica
+set) these writes run in one multi-document transaction and each debited
+account is guarded by `balance >= debit`; otherwise the guard is a check
+against balances read just before the write.
+
+Usage:
+  python3 reversal.py <log_id> [<log_id> ...] [--file IDS.txt] [--admin NAME]
+"""
+
+import sys
+import logging
+import argparse
+from datetime import datetime
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from transfer import _use_transactions
+
+logger = logging.getLogger(__name__)
+
+# Largest batch accepted by reverse_logs()
+MAX_BATCH = 1000
+
+ROLLUP_FIELDS = {"customer_id": 1, "merchant": 1, "card_type": 1, "fraud_status": 1, "verified": 1, "amount": 1}
+
+
+class ConcurrentBalanceChange(Exception):
+    pass
+
+
+def _result(log_id, log=None, error=None):
+    return {
+        "log_id": str(log_id),
+        "ok": error is None,
+        "error": error,
+        "customer_id": log.get("customer_id") if log else None,
+        "receiver_id": log.get("receiver_id") if log else None,
+        "amount": log.get("amount") if log else None,
+    }
+
+
+def _plan(db, logs, results, session=None):
+    """Pick the logs whose receivers can cover the reversal, in the given order.
+
+    Returns (accepted logs, net balance change per user, balance after each
+    accepted reversal for its sender and receiver).
+    """
+    users = {u for log in logs for u in (log["customer_id"], log["receiver_id"])}
+    balances = {
+        u["username"]: float(u.get("balance", 0.0))
+        for u in db.users.find({"username": {"$in": list(users)}}, {"_id": 0, "username": 1, "balance": 1},
+                               session=session)
+    }
+    accepted, net, after = [], {}, {}
+    for log in logs:
+        sender_id, receiver_id, amount = log["customer_id"], log["receiver_id"], float(log["amount"])
+        if sender_id not in balances or receiver_id not in balances:
+            results[str(log["_id"])] = _result(log["_id"], log, "User not found")
+            continue
+        if balances[receiver_id] - amount < 0:
+            results[str(log["_id"])] = _result(log["_id"], log, "Cannot undo: Receiver has insufficient balance")
+            continue
+        balances[sender_id] += amount
+        balances[receiver_id] -= amount
+        net[sender_id] = net.get(sender_id, 0.0) + amount
+        net[receiver_id] = net.get(receiver_id, 0.0) - amount
+        after[log["_id"]] = (balances[sender_id], balances[receiver_id])
+        accepted.append(log)
+    return accepted, net, after
+
+
+def _apply(db, logs, admin, timestamp, results, guard, session=None):
+    claim = {
+        "_id": {"$in": [log["_id"] for log in logs]},
+        "can_undo": True,
+        "status": {"$ne": "undone"},
+    }
+    batch_id = ObjectId()
+    db.transaction_logs.update_many(claim, {"$set": {
+        "status": "undone",
+        "can_undo": False,
+        "undone_at": timestamp,
+        "undone_by": admin,
+        "undo_batch": batch_id,
+    }}, session=session)
+    # Only the logs this call claimed; a concurrent undo may have won others
+    claimed = {doc["_id"] for doc in db.transaction_logs.find({"undo_batch": batch_id}, {"_id": 1}, session=session)}
+    for log in logs:
+        if log["_id"] not in claimed:
+            results[str(log["_id"])] = _result(log["_id"], log, "Transaction already undone")
+    logs = [log for log in logs if log["_id"] in claimed]
+
+    moved = False
+    try:
+        accepted, net, after = _plan(db, logs, results, session)
+        accepted_ids = {log["_id"] for log in accepted}
+        rejected = [log["_id"] for log in logs if log["_id"] not in accepted_ids]
+        if rejected:
+            db.transaction_logs.update_many(
+                {"_id": {"$in": rejected}},
+                {"$set": {"status": "completed", "can_undo": True},
+                 "$unset": {"undone_at": "", "undone_by": "", "undo_batch": ""}},
+                session=session,
+            )
+
+        ops = []
+        for user, delta in net.items():
+            if not delta:
+                continue
+            query = {"username": user}
+            if guard and delta < 0:
+                query["balance"] = {"$gte": -delta}
+            ops.append(UpdateOne(query, {"$inc": {"balance": delta}}))
+        if ops:
+            result = db.users.bulk_write(ops, ordered=False, session=session)
+            if result.matched_count != len(ops):
+                # Only reachable with the guard, i.e. inside a transaction
+                raise ConcurrentBalanceChange("Balances changed during the undo; nothing was reversed")
+            moved = True
+
+        txn_ids = [ObjectId(log["transaction_id"]) for log in accepted if log.get("transaction_id")]
+        txns = []
+        if txn_ids:
+            txns = list(db.transactions.find(
+                {"_id": {"$in": txn_ids}, "reversed": {"$ne": True}}, ROLLUP_FIELDS, session=session
+            ))
+            db.transactions.update_many(
+                {"_id": {"$in": [t["_id"] for t in txns]}}, {"$set": {"reversed": True}}, session=session
+            )
+    except Exception:
+        if session is None and moved:
+            # The balances are reversed: releasing the logs would let them be
+            # undone a second time, so they stay claimed by this batch
+            logger.exception("undo batch %s: balances reversed but transactions not flagged; "
+                             "logs left undone", batch_id)
+        elif session is None:
+            # Nothing moved yet: release the claimed logs so they can be retried
+            db.transaction_logs.update_many(
+                {"undo_batch": batch_id},
+                {"$set": {"status": "completed", "can_undo": True},
+                 "$unset": {"undone_at": "", "undone_by": "", "undo_batch": ""}},
+            )
+        raise
+    return accepted, after, txns
+
+
+def reverse_logs(db, log_ids, admin, use_transaction=None):
+    """Undo every transaction log in `log_ids`.
+
+    Returns one result dict per id, in order: log_id, ok, error, customer_id,
+    receiver_id and amount. A reversal is rejected if its log is missing,
+    not undoable or already undone, or if the receiver's balance (after the
+    earlier reversals in the batch) would go negative.
+    """
+    import aggregation
+    import rollups
+    import cache
+    from notifications import notify
+    from searchable_encryption import token_for
+
+    log_ids = [str(i) for i in log_ids]
+    if len(log_ids) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} logs per batch")
+
+    results = {}
+    oids = []
+    for log_id in log_ids:
+        try:
+            oids.append(ObjectId(log_id))
+        except (InvalidId, TypeError):
+            results[log_id] = _result(log_id, error="Invalid log id")
+
+    logs = {log["_id"]: log for log in db.transaction_logs.find({"_id": {"$in": oids}})}
+    candidates = []
+    for oid in dict.fromkeys(oids):
+        log = logs.get(oid)
+        if log is None:
+            results[str(oid)] = _result(oid, error="Transaction log not found")
+        elif log.get("status") == "undone":
+            results[str(oid)] = _result(oid, log, "Transaction already undone")
+        elif not log.get("can_undo", False):
+            results[str(oid)] = _result(oid, log, "Transaction cannot be undone")
+        else:
+            candidates.append(log)
+
+    timestamp = datetime.now()
+    accepted, after, txns = [], {}, []
+    if candidates:
+        if use_transaction is None:
+            use_transaction = _use_transactions()
+        try:
+            if use_transaction:
+                with db.client.start_session() as session:
+                    accepted, after, txns = session.with_transaction(
+                        lambda s: _apply(db, candidates, admin, timestamp, results, True, session=s)
+                    )
+            else:
+                accepted, after, txns = _apply(db, candidates, admin, timestamp, results, False)
+        except ConcurrentBalanceChange as e:
+            for log in candidates:
+                results[str(log["_id"])] = _result(log["_id"], log, str(e))
+            accepted = []
+
+    for log in accepted:
+        results[str(log["_id"])] = _result(log["_id"], log)
+    users = {u for log in accepted for u in (log["customer_id"], log["receiver_id"])}
+    cache.invalidate_user(*users)
+
+    for log in accepted:
+        sender_id, receiver_id, amount = log["customer_id"], log["receiver_id"], float(log["amount"])
+        sender_balance, receiver_balance = after[log["_id"]]
+        notify(
+            [
+                (sender_id, f"Transaction of ₹{amount:.2f} has been reversed by admin. Your new balance is ₹{sender_balance:.2f}"),
+                (receiver_id, f"Transaction of ₹{amount:.2f} has been reversed by admin. Your new balance is ₹{receiver_balance:.2f}"),
+            ],
+            "transaction_reversal",
+            f"{sender_id}|{receiver_id}|{amount}|{timestamp}|reversal",
+            timestamp,
+        )
+    try:
+        aggregation.record_reversals(db, [
+            (token_for(log["customer_id"]), token_for(log["receiver_id"]), float(log["amount"]))
+            for log in accepted
+        ])
+        rollups.record_reversals(db, txns)
+    except Exception:
+        # The money has moved; both can be rebuilt with `aggregation.py rebuild`
+        # and `rollups.py reconcile`
+        logger.exception("running totals / rollups not updated")
+    return [results[log_id] if log_id in results else results[str(ObjectId(log_id))] for log_id in log_ids]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Undo transaction logs in one batch")
+    parser.add_argument("log_ids", nargs="*")
+    parser.add_argument("--file", help="read log ids from this file, one per line")
+    parser.add_argument("--admin", default="cli", help="recorded as undone_by")
+    args = parser.parse_args(argv)
+
+    log_ids = list(args.log_ids)
+    if args.file:
+        with open(args.file) as f:
+            log_ids.extend(line.strip() for line in f if line.strip())
+    if not log_ids:
+        parser.error("no log ids given")
+
+    from mongo_client import get_db
+    from notifications import dispatcher
+    db = get_db()
+    failed = 0
+    for start in range(0, len(log_ids), MAX_BATCH):
+        for r in reverse_logs(db, log_ids[start:start + MAX_BATCH], args.admin):
+            if r["ok"]:
+                print(f"  ✓ {r['log_id']}  {r['customer_id']} -> {r['receiver_id']}  ₹{r['amount']:.2f}")
+            else:
+                failed += 1
+                print(f"  ✗ {r['log_id']}  {r['error']}")
+    dispatcher.flush(30)
+    print(f"{len(log_ids) - failed} reversed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Precomputed statistics for the admin dashboard.
+
+The `stats_rollups` collection holds one document per bucket:
+
+  {"_id": "global"}            users, transactions, fraudulent, verified, volume, reversed
+  {"_id": "day:2025-11-03"}    per UTC day of the transaction _id
+  {"_id": "merchant:<name>"}   per merchant category
+  {"_id": "card:<type>"}       per card type
+  {"_id": "user:<username>"}   per sender (the user dashboard header)
+
+Buckets are updated with $inc when a transaction is created or undone and
+when a user signs up. `reconcile` recomputes everything from the raw
+collections and fixes any drift.
+
+Usage:
+  python3 rollups.py show
+  python3 rollups.py reconcile [--every SECONDS]
+"""
+
+import sys
+import time
+import argparse
+from pymongo import UpdateOne, DeleteOne
+
+GLOBAL_ID = "global"
+COUNTERS = ("transactions", "fraudulent", "verified", "volume")
+# UTC day of the transaction's ObjectId, as _bucket_ids() computes it
+DAY_KEY = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$_id"}}}
+
+
+def _bucket_ids(txn):
+    day = txn["_id"].generation_time.strftime("%Y-%m-%d")
+    return [
+        GLOBAL_ID,
+        f"day:{day}",
+        f"merchant:{txn.get('merchant') or 'Unknown'}",
+        f"card:{txn.get('card_type') or 'Unknown'}",
+        f"user:{txn.get('customer_id')}",
+    ]
+
+
+def _increments(txn, sign):
+    return {
+        "transactions": sign,
+        "fraudulent": sign if txn.get("fraud_status") == "Fraudulent" else 0,
+        "verified": sign if txn.get("verified") else 0,
+        "volume": sign * float(txn.get("amount", 0.0)),
+    }
+
+
+def _apply(db, txn, increments):
+    db.stats_rollups.bulk_write(
+        [UpdateOne({"_id": bucket}, {"$inc": increments}, upsert=True) for bucket in _bucket_ids(txn)],
+        ordered=False,
+    )
+
+
+def record_transaction(db, txn):
+    """Count a newly inserted transaction (needs _id, merchant, card_type, ...)."""
+    _apply(db, txn, _increments(txn, 1))
+
+
+def record_reversal(db, txn):
+    """Remove an undone transaction from every bucket it was counted in."""
+    increments = _increments(txn, -1)
+    increments["reversed"] = 1
+    _apply(db, txn, increments)
+
+
+def record_reversals(db, txns):
+    """record_reversal() for many transactions with one bulk_write."""
+    totals = {}
+    for txn in txns:
+        increments = _increments(txn, -1)
+        increments["reversed"] = 1
+        for bucket in _bucket_ids(txn):
+            entry = totals.setdefault(bucket, dict.fromkeys(increments, 0))
+            for name, value in increments.items():
+                entry[name] += value
+    if totals:
+        db.stats_rollups.bulk_write(
+            [UpdateOne({"_id": bucket}, {"$inc": inc}, upsert=True) for bucket, inc in totals.items()],
+            ordered=False,
+        )
+
+
+def record_user(db):
+    db.stats_rollups.update_one({"_id": GLOBAL_ID}, {"$inc": {"users": 1}}, upsert=True)
+
+
+def get_stats(db):
+    """Global counters (constant time)."""
+    doc = db.stats_rollups.find_one({"_id": GLOBAL_ID}) or {}
+    stats = {name: doc.get(name, 0) for name in COUNTERS + ("users", "reversed")}
+    return stats
+
+
+def get_user_stats(db, username):
+    """Counters for the transactions a user has sent (constant time)."""
+    doc = db.stats_rollups.find_one({"_id": f"user:{username}"}) or {}
+    return {name: doc.get(name, 0) for name in COUNTERS}
+
+
+def get_buckets(db, kind, limit=30):
+    """Buckets of one kind ("day", "merchant", "card" or "user"), newest/largest key last."""
+    docs = db.stats_rollups.find({"_id": {"$regex": f"^{kind}:"}}).sort("_id", -1).limit(limit)
+    return [dict(doc, key=doc["_id"].split(":", 1)[1]) for doc in reversed(list(docs))]
+
+
+# ---------------- RECONCILIATION ----------------
+def _group(db, key_expr):
+    """Recompute the counters grouped by `key_expr` over live transactions."""
+    return db.transactions.aggregate([
+        {"$match": {"reversed": {"$ne": True}}},
+        {"$group": {
+            "_id": key_expr,
+            "transactions": {"$sum": 1},
+            "fraudulent": {"$sum": {"$cond": [{"$eq": ["$fraud_status", "Fraudulent"]}, 1, 0]}},
+            "verified": {"$sum": {"$cond": [{"$eq": ["$verified", True]}, 1, 0]}},
+            "volume": {"$sum": "$amount"},
+        }},
+    ], allowDiskUse=True)
+
+
+def compute_rollups(db):
+    """All rollup documents, recomputed from the raw collections."""
+    docs = {}
+    groupings = [
+        ("day", DAY_KEY),
+        ("merchant", {"$ifNull": ["$merchant", "Unknown"]}),
+        ("card", {"$ifNull": ["$card_type", "Unknown"]}),
+        ("user", "$customer_id"),
+    ]
+    for kind, key_expr in groupings:
+        for row in _group(db, key_expr):
+            key = row.pop("_id")
+            docs[f"{kind}:{key}"] = dict(row, _id=f"{kind}:{key}")
+
+    totals = dict.fromkeys(COUNTERS, 0)
+    for doc_id, doc in docs.items():
+        if doc_id.startswith("day:"):
+            for name in COUNTERS:
+                totals[name] += doc[name]
+    totals["users"] = db.users.count_documents({})
+    totals["reversed"] = db.transactions.count_documents({"reversed": True})
+    docs[GLOBAL_ID] = dict(totals, _id=GLOBAL_ID)
+    return docs
+
+
+def reconcile(db):
+    """Correct rollups against a recomputation; returns {bucket: (old, new)} for drifted buckets.
+
+    Drift is fixed with a corrective $inc of (expected - current) rather than
+    a replace, so increments that land while this runs are kept. A
+    transaction committed during the scan can still be counted one pass
+    early or late; the next reconcile corrects it. Stale buckets are deleted
+    only if unchanged since they were read.
+    """
+    expected = compute_rollups(db)
+    current = {doc["_id"]: doc for doc in db.stats_rollups.find({})}
+    drift = {}
+    ops = []
+    for doc_id, doc in expected.items():
+        old = current.get(doc_id, {})
+        delta = {k: v - old.get(k, 0) for k, v in doc.items() if k != "_id"}
+        delta = {k: v for k, v in delta.items() if abs(v) > 1e-6}
+        if delta:
+            drift[doc_id] = (old, doc)
+            ops.append(UpdateOne({"_id": doc_id}, {"$inc": delta}, upsert=True))
+    for doc_id, old in current.items():
+        if doc_id not in expected:
+            drift[doc_id] = (old, {})
+            ops.append(DeleteOne(old))
+    if ops:
+        db.stats_rollups.bulk_write(ops, ordered=False)
+    return drift
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Admin statistics rollups")
+    parser.add_argument("command", choices=["show", "reconcile"])
+    parser.add_argument("--every", type=float, default=0, help="reconcile repeatedly every N seconds")
+    args = parser.parse_args(argv)
+
+    from mongo_client import get_db
+    db = get_db()
+    if args.command == "show":
+        for name, value in get_stats(db).items():
+            print(f"  {name:<14} {value:,}")
+        return 0
+
+    while True:
+        drift = reconcile(db)
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] reconciled: {len(drift)} bucket(s) fixed")
+        for doc_id, (old, new) in sorted(drift.items()):
+            changes = {k: (old.get(k, 0), new.get(k, 0)) for k in set(old) | set(new)
+                       if k != "_id" and old.get(k, 0) != new.get(k, 0)}
+            print(f"  {doc_id}: {changes}")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Process helpers shared by the modules that read integer settings from the
+environment or run background threads.
+"""
+
+import os
+import threading
+
+
+def env_int(name: str, default: int) -> int:
+    """Integer environment variable `name`, or `default` if unset or malformed."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class ProcessLocal:
+    """A value built by `build()` on first use in each process.
+
+    Threads, thread pools and sockets do not survive fork: a gunicorn worker
+    forked after they were created inherits the objects but not the threads,
+    and would share the sockets with its parent. `get()` builds the value once
+    per process, under `lock` if one is given, and returns the same value
+    until the next fork.
+    """
+
+    def __init__(self, build, lock=None):
+        self._build = build
+        self._lock = lock if lock is not None else threading.Lock()
+        self._value = None
+        self.pid = None
+
+    def get(self):
+        if self.pid != os.getpid():
+            with self._lock:
+                if self.pid != os.getpid():
+                    self._value = self._build()
+                    self.pid = os.getpid()
+        return self._value
+
+    def started(self) -> bool:
+        """True if the value has been built in this process."""
+        return self.pid == os.getpid()
@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from model_predict import predict_fraud_batch
+from runtime import env_int, ProcessLocal
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches for a vectorised scorer.
+
+    Callers block in `score()` while a single background thread drains the
+    queue: it waits for the first item, then keeps collecting until either
+    `max_batch_size` items are queued or `max_wait_ms` has passed, and scores
+    the whole batch with one `score_batch(items)` call. If that call raises,
+    each item is re-scored alone so only the failing requests see the error.
+    """
+
+    def __init__(self, score_batch, max_batch_size=32, max_wait_ms=2.0):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._worker = ProcessLocal(self._start_worker)
+
+    def _start_worker(self):
+        self._queue = queue.Queue()
+        thread = threading.Thread(target=self._run, name="fraud-scoring", daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, item) -> Future:
+        self._worker.get()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def score(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.score_batch(items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # One bad item (e.g. an unknown Card_Type) must not fail the
+                # others: fall back to scoring each item on its own.
+                for item, future in batch:
+                    try:
+                        future.set_result(self.score_batch([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+# Process-wide scorer for the web app
+_scorer = MicroBatcher(
+    predict_fraud_batch,
+    max_batch_size=env_int("SAFEPAY_SCORING_MAX_BATCH", 32),
+    max_wait_ms=env_int("SAFEPAY_SCORING_MAX_WAIT_MS", 2),
+)
+
+
+def score_transaction(data, timeout=30):
+    """Score one transaction through the shared micro-batcher."""
+    return _scorer.score(data, timeout)
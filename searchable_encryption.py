@@ -1,6 +1,7 @@
 import os
 import hmac
 import hashlib
+from functools import lru_cache
 
 KEY_PATH = os.path.join(os.path.dirname(__file__), "search_key.bin")
 
@@ -20,6 +21,14 @@ def _load_or_create_key() -> bytes:
 _KEY = _load_or_create_key()
 
 
+try:
+    _CACHE_SIZE = int(os.environ.get("SAFEPAY_TOKEN_CACHE_SIZE", 4096))
+except ValueError:
+    _CACHE_SIZE = 4096
+
+
+# Tokens are deterministic, so the same few usernames per request are cached
+@lru_cache(maxsize=_CACHE_SIZE)
 def token_for(value: str) -> str:
     """Return a deterministic token (hex) for searchable equality lookup."""
     if value is None:
@@ -0,0 +1,87 @@
+import base64
+from bson.binary import Binary
+
+# Stored ciphertexts are BSON Binary: one version byte followed by the
+# ciphertext as fixed-width big-endian bytes (the width of n^2 for the key).
+CIPHERTEXT_V1 = 1
+
+
+def ciphertext_width(nsquare: int) -> int:
+    return (nsquare.bit_length() + 7) // 8
+
+
+def encode_ciphertext(c: int, width: int) -> Binary:
+    return Binary(bytes([CIPHERTEXT_V1]) + c.to_bytes(width, "big"))
+
+
+def decode_ciphertext(value):
+    """Stored ciphertext -> int (None if missing).
+
+    Also accepts the legacy decimal strings written before the binary format.
+    """
+    if value is None or value == "" or value == b"":
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value)
+    raw = bytes(value)
+    if raw[0] != CIPHERTEXT_V1:
+        raise ValueError(f"Unknown ciphertext format version: {raw[0]}")
+    return int.from_bytes(raw[1:], "big")
+
+
+# ---------------- SECURITY FIELDS ----------------
+# enc_data is stored as Binary: one format byte then the raw token bytes
+# (ENC_LEGACY: iv || CBC ciphertext || HMAC, ENC_V2: nonce || GCM ciphertext+tag).
+# hash and signature are stored as the raw digest / signature bytes.
+ENC_LEGACY = 1
+ENC_V2 = 2
+_V2_PREFIX = "v2:"  # encryption.V2_PREFIX
+
+
+def encode_enc_data(token: str) -> Binary:
+    if token.startswith(_V2_PREFIX):
+        return Binary(bytes([ENC_V2]) + base64.b64decode(token[len(_V2_PREFIX):]))
+    return Binary(bytes([ENC_LEGACY]) + base64.b64decode(token))
+
+
+def decode_enc_data(value):
+    """Stored enc_data -> token string for decrypt_data (None if missing)."""
+    if value is None or value == "" or value == b"":
+        return None
+    if isinstance(value, str):
+        return value
+    raw = bytes(value)
+    body = base64.b64encode(raw[1:]).decode("ascii")
+    if raw[0] == ENC_V2:
+        return _V2_PREFIX + body
+    if raw[0] == ENC_LEGACY:
+        return body
+    raise ValueError(f"Unknown enc_data format: {raw[0]}")
+
+
+def encode_security_fields(enc_data: str, hash_hex: str, signature: bytes) -> dict:
+    """The enc_data / hash / signature fields of a transaction document."""
+    return {
+        "enc_data": encode_enc_data(enc_data),
+        "hash": Binary(bytes.fromhex(hash_hex)),
+        "signature": Binary(bytes(signature)),
+    }
+
+
+def decode_security_fields(doc) -> dict:
+    """{"enc_data": token, "hash": hex, "signature_hex": hex} from either layout.
+
+    Documents written before the binary layout keep base64/hex strings and a
+    `signature_hex` field instead of `signature`.
+    """
+    hash_value = doc.get("hash")
+    if hash_value is not None and not isinstance(hash_value, str):
+        hash_value = bytes(hash_value).hex()
+    signature = doc.get("signature")
+    return {
+        "enc_data": decode_enc_data(doc.get("enc_data")),
+        "hash": hash_value,
+        "signature_hex": bytes(signature).hex() if signature is not None else doc.get("signature_hex"),
+    }
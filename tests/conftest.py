@@ -0,0 +1,86 @@
+"""
+Shared fixtures: every test gets a fresh in-memory MongoDB (mongomock) in
+place of the pooled client, an empty dashboard cache and login counters, and
+synchronous notification writes. Signing keys are created in a temporary
+directory, never next to the code.
+"""
+
+import os
+
+# Cheap password hashes; must be set before hashing.py is imported
+os.environ.setdefault("SAFEPAY_PBKDF2_ITERATIONS", "1000")
+
+import mongomock
+import pytest
+
+import cache
+import digital_signature
+import login_guard
+import mongo_client
+import notifications
+from hashing import hash_password
+
+SEED_BALANCE = 50000.0
+
+TRANSACTION_FORM = {
+    "Receiver_ID": "saksham", "Customer_Name": "User One", "Gender": "M", "Age": "30",
+    "State": "Delhi", "City": "Delhi", "Bank_Branch": "Main", "Account_Type": "Savings",
+    "Transaction_Amount": "100", "Transaction_Type": "Debit", "Merchant_Category": "Groceries",
+    "Expiry_Date": "12/27", "Card_Type": "Student",
+}
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _signing_keys(tmp_path_factory):
+    key_dir = tmp_path_factory.mktemp("keys")
+    original = digital_signature.key_path
+    digital_signature.key_path = lambda scheme: str(key_dir / f"signing_key_{scheme}.pem")
+    yield
+    digital_signature.key_path = original
+    digital_signature._signers.clear()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "_counters", {kind: {"hits": 0, "misses": 0, "errors": 0} for kind in cache.KINDS})
+    monkeypatch.setattr(notifications.dispatcher, "workers", 0)
+    for counter in (login_guard.user_failures, login_guard.ip_attempts):
+        counter._counts.clear()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongo_client, "get_client", lambda: client)
+    db = client["safepay"]
+    db.users.insert_many([
+        {"username": "user1", "password": hash_password("1234"), "role": "user", "balance": SEED_BALANCE},
+        {"username": "saksham", "password": hash_password("hello123"), "role": "user", "balance": SEED_BALANCE},
+        {"username": "admin", "password": hash_password("admin"), "role": "admin", "balance": SEED_BALANCE},
+    ])
+    return db
+
+
+@pytest.fixture
+def app_module(db, monkeypatch):
+    import app
+    monkeypatch.setattr(app, "_indexes_ready", False)
+    monkeypatch.setattr(app, "_indexes_retry_at", 0.0)
+    # The fraud model files are not part of the repo
+    monkeypatch.setattr(app, "score_transaction", lambda data: "Legit")
+    app.app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    def login(username, password, role="user"):
+        client.get("/logout")
+        return client.post("/", data={"username": username, "password": password, "role": role})
+    return login
@@ -0,0 +1,72 @@
+import pytest
+
+import aggregation
+from homomorphic import get_paillier
+from searchable_encryption import token_for
+
+
+def _transfer(db, sender, receiver, amount):
+    """Insert a transaction the way app.py does and fold it into the totals."""
+    paillier = get_paillier()
+    doc = {
+        "customer_token": token_for(sender),
+        "receiver_token": token_for(receiver),
+        "amount_enc": aggregation._encode(paillier.encrypt(int(round(amount * 100)))),
+    }
+    db.transactions.insert_one(doc)
+    aggregation.record_transfer(db, doc["customer_token"], doc["receiver_token"], doc["amount_enc"])
+    return doc
+
+
+def _totals(db):
+    return {
+        (user, direction): aggregation.decrypt_total(aggregation.running_total(db, user, direction))
+        for user in (None, "user1", "saksham")
+        for direction in ("sent", "received")
+        if user or direction == "sent"
+    }
+
+
+def test_rebuild_matches_incremental_totals(db):
+    for sender, receiver, amount in [("user1", "saksham", 10), ("saksham", "user1", 2.5), ("user1", "saksham", 7.25)]:
+        _transfer(db, sender, receiver, amount)
+    reversed_doc = _transfer(db, "saksham", "user1", 4)
+    db.transactions.update_one({"_id": reversed_doc["_id"]}, {"$set": {"reversed": True}})
+    aggregation.record_reversal(db, reversed_doc["customer_token"], reversed_doc["receiver_token"], 4)
+
+    incremental = _totals(db)
+    assert incremental[(None, "sent")] == pytest.approx(19.75)
+    assert incremental[("user1", "sent")] == pytest.approx(17.25)
+    assert incremental[("saksham", "received")] == pytest.approx(17.25)
+
+    aggregation.rebuild_running_totals(db)
+    assert _totals(db) == incremental
+    assert aggregation.decrypt_total(aggregation.encrypted_total(db)) == pytest.approx(19.75)
+
+
+def test_lost_update_is_queued_and_folded(db, monkeypatch, caplog):
+    _transfer(db, "user1", "saksham", 10)
+    monkeypatch.setattr(aggregation, "_try_add", lambda *args: False)
+    _transfer(db, "user1", "saksham", 5)
+    monkeypatch.undo()
+
+    assert db.encrypted_total_pending.count_documents({}) == 3
+    assert "queued for fold" in caplog.text
+    # Reads already include the queued ciphertexts
+    assert aggregation.decrypt_total(aggregation.running_total(db)) == pytest.approx(15)
+
+    assert aggregation.fold_pending(db) == 3
+    assert db.encrypted_total_pending.count_documents({}) == 0
+    assert aggregation.decrypt_total(aggregation.running_total(db, "user1")) == pytest.approx(15)
+    assert aggregation.decrypt_total(aggregation.running_total(db)) == pytest.approx(15)
+
+
+def test_rebuild_replaces_the_collection(db):
+    _transfer(db, "user1", "saksham", 10)
+    db.encrypted_totals.insert_one({"_id": "stale", "sent_enc": aggregation._encode(get_paillier().encrypt(1))})
+
+    aggregation.rebuild_running_totals(db)
+    ids = set(db.encrypted_totals.distinct("_id"))
+    assert "stale" not in ids
+    assert ids == {aggregation.GLOBAL_ID, token_for("user1"), token_for("saksham")}
+    assert "encrypted_totals_rebuild" not in db.list_collection_names()
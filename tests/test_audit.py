@@ -0,0 +1,31 @@
+import os
+
+import audit
+import digital_signature
+from encryption import encrypt_data
+from hashing import generate_hash
+
+
+def _doc(scheme):
+    payload = "user1|saksham|100.0"
+    hash_value = generate_hash(payload)
+    signature = digital_signature.get_signer(scheme).sign(hash_value) if scheme in digital_signature.SCHEMES else b""
+    return {"_id": "1", "enc_data": encrypt_data(payload), "hash": hash_value,
+            "signature_hex": signature.hex(), "signature_scheme": scheme}
+
+
+def test_valid_document_passes():
+    assert audit._check(_doc("ed25519")) is None
+
+
+def test_unknown_scheme_is_reported_not_raised():
+    assert audit._check(_doc("dsa")) == "unknown signature scheme"
+
+
+def test_missing_key_is_reported_and_never_created(monkeypatch, tmp_path):
+    doc = _doc("ed25519")
+    monkeypatch.setattr(digital_signature, "_signers", {})
+    monkeypatch.setattr(digital_signature, "key_path", lambda scheme: str(tmp_path / f"signing_key_{scheme}.pem"))
+
+    assert audit._check(doc) == "missing ed25519 signing key"
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import cache
+from conftest import SEED_BALANCE, TRANSACTION_FORM
+
+
+def test_cached_value_is_reused_until_invalidated():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.cached("history", "user1", load) == 1
+    assert cache.cached("history", "user1", load) == 1
+    cache.invalidate_user("user1")
+    assert cache.cached("history", "user1", load) == 2
+    assert cache.stats()["kinds"]["history"] == {"hits": 1, "misses": 2, "errors": 0, "hit_rate": 0.3333}
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    def load():
+        # A write lands while the value is being read from MongoDB
+        cache.invalidate_user("user1")
+        return "stale"
+
+    assert cache.cached("unread", "user1", load) == "stale"
+    assert cache.cached("unread", "user1", lambda: "fresh") == "fresh"
+
+
+def test_local_ttl_bounds_every_kind(monkeypatch):
+    monkeypatch.setattr(cache, "LOCAL_TTL", 0.05)
+    assert cache.get_cache().ttl == 0.05
+    for kind in ("balance", "history", "unread"):
+        assert cache.cached(kind, "user1", lambda: 1) == 1
+    time.sleep(0.06)
+    for kind in ("balance", "history", "unread"):
+        assert cache.cached(kind, "user1", lambda: 2) == 2
+
+
+def test_generations_are_pruned_with_the_entries():
+    local = cache.LocalCache(maxsize=2)
+    for user in ("a", "b", "c", "d"):
+        local.delete([], user)
+    assert len(local._generations) == 2
+
+    # A load that started before "a" was invalidated and pruned is still refused
+    stale = cache.LocalCache(maxsize=2)
+    generation = stale.generation("a")
+    for user in ("a", "b", "c"):
+        stale.delete([], user)
+    assert "a" not in stale._generations
+    stale.set("balance:a", 1, user="a", generation=generation)
+    assert stale.get("balance:a") is None
+    stale.set("balance:a", 2, user="a", generation=stale.generation("a"))
+    assert stale.get("balance:a") == 2
+
+
+def test_counters_are_exact_under_threads():
+    def hit_many():
+        for _ in range(2000):
+            cache.cached("unread", "user1", lambda: 0)
+
+    threads = [threading.Thread(target=hit_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counts = cache.stats()["kinds"]["unread"]
+    assert counts["hits"] + counts["misses"] == 8000
+
+
+def test_redis_url_selects_redis(monkeypatch):
+    monkeypatch.delenv("SAFEPAY_CACHE_URL", raising=False)
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    assert isinstance(cache.get_cache(), cache.RedisCache)
+
+
+def test_transfer_invalidates_both_dashboards(client, login, db):
+    login("user1", "1234")
+    client.get("/dashboard")
+    login("saksham", "hello123")
+    client.get("/dashboard")
+    assert cache.get_cache().get("balance:saksham") == SEED_BALANCE
+
+    login("user1", "1234")
+    client.post("/transaction", data=dict(TRANSACTION_FORM, Transaction_Amount="100"))
+    assert cache.get_cache().get("balance:user1") is None
+    assert cache.get_cache().get("balance:saksham") is None
+    response = client.get("/dashboard")
+    assert f"₹{SEED_BALANCE - 100:.2f}".encode() in response.data
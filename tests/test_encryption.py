@@ -0,0 +1,73 @@
+import base64
+import os
+
+import pytest
+from cryptography.exceptions import InvalidSignature, InvalidTag
+from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import encryption
+from encryption import V2_PREFIX, decrypt_data, decrypt_many, encrypt_data, encrypt_many
+
+PAYLOADS = ["user1|saksham|100.0|2025-01-01", "", "₹ naïve ünïcode", "x" * 5000]
+
+
+def _legacy_token(data):
+    """base64(iv || AES-CBC(PKCS7(data)) || HMAC-SHA256(iv || ct)), built by hand."""
+    iv = os.urandom(16)
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(encryption._KEY), modes.CBC(iv)).encryptor()
+    ct = encryptor.update(padder.update(data.encode()) + padder.finalize()) + encryptor.finalize()
+    h = hmac.HMAC(encryption._KEY, hashes.SHA256())
+    h.update(iv + ct)
+    return base64.b64encode(iv + ct + h.finalize()).decode("ascii")
+
+
+def _flip(token, index):
+    prefix = V2_PREFIX if token.startswith(V2_PREFIX) else ""
+    raw = bytearray(base64.b64decode(token[len(prefix):]))
+    raw[index] ^= 1
+    return prefix + base64.b64encode(bytes(raw)).decode("ascii")
+
+
+def test_v2_round_trip_with_fresh_nonces():
+    for data in PAYLOADS:
+        token = encrypt_data(data)
+        assert token.startswith(V2_PREFIX)
+        assert decrypt_data(token) == data
+    assert encrypt_data("same") != encrypt_data("same")
+
+
+def test_legacy_tokens_still_decrypt():
+    for data in PAYLOADS:
+        assert decrypt_data(_legacy_token(data)) == data
+    assert decrypt_data(encryption._encrypt_legacy("old")) == "old"
+
+
+@pytest.mark.parametrize("index", [0, 12, -1])
+def test_tampered_v2_token_is_rejected(index):
+    with pytest.raises(InvalidTag):
+        decrypt_data(_flip(encrypt_data("user1|saksham|100.0"), index))
+
+
+@pytest.mark.parametrize("index", [0, 16, -1])
+def test_tampered_legacy_token_is_rejected(index):
+    with pytest.raises(InvalidSignature):
+        decrypt_data(_flip(_legacy_token("user1|saksham|100.0"), index))
+
+
+def test_v2_token_without_prefix_is_rejected():
+    with pytest.raises(InvalidSignature):
+        decrypt_data(encrypt_data("user1|saksham|100.0")[len(V2_PREFIX):])
+
+
+def test_encrypt_many_and_decrypt_many():
+    tokens = encrypt_many(PAYLOADS)
+    assert all(token.startswith(V2_PREFIX) for token in tokens)
+    nonces = {base64.b64decode(token[len(V2_PREFIX):])[:encryption.NONCE_SIZE] for token in tokens}
+    assert len(nonces) == len(PAYLOADS)
+    assert [decrypt_data(token) for token in tokens] == PAYLOADS
+
+    mixed = [tokens[0], _legacy_token(PAYLOADS[1]), encrypt_data(PAYLOADS[2])]
+    assert decrypt_many(mixed) == PAYLOADS[:3]
+    assert encrypt_many([]) == [] and decrypt_many([]) == []
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import features
+from features import feature_matrix, months_until_expiry, month_index
+
+EXPIRY = ["06/25", "6/25", "07/25", "09/25", "10/25", "05/25", "01/24", "12/99", "13/25", "bad", "", None, "6/5"]
+
+
+def _strptime_months(value, reference):
+    try:
+        expiry = datetime.strptime(value, "%m/%y")
+    except (TypeError, ValueError):
+        return 0
+    return expiry.year * 12 + expiry.month - 1 - reference
+
+
+def test_expiry_lookup_matches_strptime():
+    reference = month_index("2025-06")
+    expected = [_strptime_months(value, reference) for value in EXPIRY]
+    assert list(months_until_expiry(EXPIRY, "2025-06")) == expected
+
+
+@pytest.mark.parametrize("rows", [1, 5, features.COLUMN_PATH_MIN_ROWS - 1, features.COLUMN_PATH_MIN_ROWS, 5000])
+def test_column_path_matches_list_path(rows, monkeypatch):
+    rng = np.random.default_rng(rows)
+    expiry = np.array(EXPIRY, dtype=object)[rng.integers(0, len(EXPIRY), rows)]
+    columns = (rng.integers(18, 80, rows), rng.random(rows) * 1e4, rng.random(rows) * 1e5,
+               rng.integers(0, 5, rows), expiry)
+
+    monkeypatch.setattr(features, "COLUMN_PATH_MIN_ROWS", 0)
+    by_column = feature_matrix(*columns, reference="2025-06")
+    monkeypatch.setattr(features, "COLUMN_PATH_MIN_ROWS", rows + 1)
+    by_list = feature_matrix(*columns, reference="2025-06")
+
+    assert by_column.dtype == by_list.dtype == np.float64
+    assert by_column.shape == (rows, len(features.FEATURE_COLUMNS))
+    assert np.array_equal(by_column, by_list)
+
+
+def test_expiry_flags():
+    X = feature_matrix([30] * 4, [1.0] * 4, [2.0] * 4, [0] * 4, ["05/25", "06/25", "09/25", "10/25"], "2025-06")
+    months, expired, soon = X[:, 4], X[:, 5], X[:, 6]
+    assert list(months) == [-1, 0, 3, 4]
+    assert list(expired) == [1, 0, 0, 0]
+    assert list(soon) == [0, 1, 1, 0]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from forest import export_forest, load_forest
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 5, 600), rng.normal(0, 1, 600), rng.uniform(0, 1000, 600)])
+    y = ((X[:, 0] > 2) ^ (X[:, 1] > 0.3) | (X[:, 2] > 900)).astype(int)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+    encoder = LabelEncoder().fit(["Student", "Premium", "Standard"])
+
+    path = tmp_path_factory.mktemp("forest") / "forest.npz"
+    export_forest(model, encoder, str(path))
+    return model, load_forest(str(path))
+
+
+def _threshold_rows(model, rng):
+    """Rows whose features sit exactly on (and just beside) split thresholds."""
+    rows = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1):
+            # sklearn compares float32 inputs against float64 thresholds
+            value = np.float32(tree.threshold[node])
+            for candidate in (value, np.nextafter(value, np.float32(-np.inf)), np.nextafter(value, np.float32(np.inf))):
+                row = rng.uniform(-2, 1000, 3).astype(np.float32)
+                row[tree.feature[node]] = candidate
+                rows.append(row)
+    return np.array(rows)
+
+
+def test_matches_sklearn_on_random_inputs(fitted):
+    model, forest = fitted
+    X = np.random.default_rng(1).uniform(-3, 1000, (5000, 3))
+    np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def test_matches_sklearn_on_split_thresholds(fitted):
+    model, forest = fitted
+    X = _threshold_rows(model, np.random.default_rng(2))
+    np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def test_chunked_and_single_row_inputs(fitted):
+    model, forest = fitted
+    X = np.random.default_rng(3).uniform(-3, 1000, (1000, 3))
+    forest.chunk_rows = 64
+    try:
+        np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+    finally:
+        forest.chunk_rows = 4096
+    np.testing.assert_array_equal(forest.predict_proba(X[0]), model.predict_proba(X[:1]))
+
+
+def test_card_type_encoder_matches_label_encoder(fitted):
+    _, forest = fitted
+    assert list(forest.card_type_encoder.transform(["Standard", "Student"])) == [1, 2]
+    with pytest.raises(ValueError):
+        forest.card_type_encoder.transform(["Gold"])
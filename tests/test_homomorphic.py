@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+import homomorphic
+from homomorphic import Paillier, _factor_from_lambda
+
+
+@pytest.fixture(scope="module")
+def paillier():
+    key = Paillier(keysize=512, persist=False)
+    key._rn_pool_size = 0
+    return key
+
+
+@pytest.fixture
+def key_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(homomorphic, "KEY_PATH_PUB", str(tmp_path / "paillier_pub.json"))
+    monkeypatch.setattr(homomorphic, "KEY_PATH_PRIV", str(tmp_path / "paillier_priv.json"))
+    return tmp_path
+
+
+def _lambda_decrypt(key, c):
+    return (homomorphic._L(pow(c, key.lambda_param, key.nsquare), key.n) * key.mu) % key.n
+
+
+def test_crt_decrypt_matches_the_lambda_formula(paillier):
+    assert paillier._crt
+    for m in (0, 1, 12345, paillier.n - 1):
+        c = paillier.encrypt(m)
+        assert paillier.decrypt(c) == _lambda_decrypt(paillier, c) == m
+
+
+def test_crt_blinding_factor_is_r_to_the_n(paillier, monkeypatch):
+    monkeypatch.setattr(homomorphic.secrets, "randbelow", lambda n: 987654321)
+    assert paillier._random_rn() == pow(987654321, paillier.n, paillier.nsquare)
+
+
+def test_ciphertext_addition_decrypts_to_the_sum(paillier):
+    a, b = paillier.encrypt(1999), paillier.encrypt(501)
+    assert paillier.decrypt(paillier.add_ciphertexts(a, b)) == 2500
+    assert paillier.decrypt(paillier.add_ciphertext_plain(a, 1)) == 2000
+    # Fresh randomness: equal plaintexts give different ciphertexts
+    assert paillier.encrypt(7) != paillier.encrypt(7)
+
+
+def test_rn_pool_fills_and_restarts_after_fork(monkeypatch):
+    monkeypatch.setenv("SAFEPAY_PAILLIER_POOL", "4")
+    key = Paillier(keysize=256, persist=False)
+    assert key.decrypt(key.encrypt(42)) == 42
+    parent_thread = key._rn_thread
+    deadline = time.monotonic() + 10
+    while len(key._rn_pool) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(key._rn_pool) == 4
+
+    # A forked child inherits the pool but not the refill thread
+    monkeypatch.setattr(homomorphic.os, "getpid", lambda: key._rn_worker.pid + 1)
+    assert key.decrypt(key.encrypt(43)) == 43
+    assert key._rn_thread is not parent_thread and key._rn_thread.is_alive()
+    while len(key._rn_pool) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(key._rn_pool) == 4
+
+
+def test_factor_from_lambda_recovers_the_primes(paillier):
+    p, q = _factor_from_lambda(paillier.n, paillier.lambda_param)
+    assert {p, q} == {paillier.p, paillier.q}
+
+
+def test_new_keys_round_trip_through_files(key_files):
+    saved = Paillier(keysize=256)
+    assert set(json.loads((key_files / "paillier_priv.json").read_text())) == {"lambda", "mu", "n", "p", "q"}
+
+    loaded = Paillier(keysize=256)
+    assert (loaded.n, loaded.p, loaded.q) == (saved.n, saved.p, saved.q)
+    assert loaded._crt
+    assert loaded.decrypt(saved.encrypt(31337)) == 31337
+
+
+def test_legacy_key_files_use_crt_after_factoring(key_files):
+    # The key files in the repo predate storing p and q
+    repo = os.path.dirname(homomorphic.__file__)
+    for name in ("paillier_pub.json", "paillier_priv.json"):
+        shutil.copy(os.path.join(repo, name), key_files / name)
+    assert "p" not in json.loads((key_files / "paillier_priv.json").read_text())
+
+    legacy = Paillier()
+    assert legacy._crt and legacy.p * legacy.q == legacy.n
+    c = legacy.encrypt(250000)
+    assert legacy.decrypt(c) == _lambda_decrypt(legacy, c) == 250000
+    assert legacy.decrypt(legacy.add_ciphertexts(c, legacy.encrypt(1))) == 250001
@@ -0,0 +1,34 @@
+import indexes
+
+
+def test_ensure_indexes_drops_obsolete_ones(db):
+    db.transactions.create_index("customer_id")
+    db.notifications.create_index("user_id")
+    db.notifications.create_index("read")
+
+    assert sorted(indexes.ensure_indexes(db)) == [
+        "notifications.read_1", "notifications.user_id_1", "transactions.customer_id_1",
+    ]
+    assert indexes.ensure_indexes(db) == []
+    for collection, names in indexes.OBSOLETE_INDEXES.items():
+        assert not set(names) & set(db[collection].index_information())
+
+
+def test_get_db_logs_index_failures_and_backs_off(app_module, monkeypatch, caplog):
+    calls = []
+
+    def fail(db):
+        calls.append(1)
+        raise RuntimeError("not authorized")
+
+    monkeypatch.setattr(app_module, "ensure_indexes", fail)
+    app_module.get_db()
+    app_module.get_db()
+    assert len(calls) == 1
+    assert "ensure_indexes failed" in caplog.text
+    assert not app_module._indexes_ready
+
+    monkeypatch.setattr(app_module, "_indexes_retry_at", 0.0)
+    monkeypatch.setattr(app_module, "ensure_indexes", lambda db: [])
+    app_module.get_db()
+    assert app_module._indexes_ready
@@ -0,0 +1,98 @@
+import base64
+
+import pytest
+from bson.objectid import ObjectId
+
+from ledger import ledger_row, user_filter, user_transactions
+from pagination import decode_cursor, encode_cursor, keyset_page
+from searchable_encryption import token_for
+
+
+def _insert(db, sender, receiver, amount):
+    return db.transactions.insert_one({
+        "customer_id": sender, "receiver_id": receiver, "amount": amount, "balance": 1000.0 - amount,
+        "customer_token": token_for(sender), "receiver_token": token_for(receiver),
+        "fraud_status": "Legit", "verified": True, "merchant": "Groceries", "txntype": "Debit",
+    }).inserted_id
+
+
+def _all_pages(db, user, direction, limit):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = user_transactions(db, user, direction, {"_id": 1}, limit, cursor)
+        ids.extend(doc["_id"] for doc in docs)
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip_and_malformed_cursor():
+    oid = ObjectId()
+    cursor = encode_cursor(oid)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == oid
+    for bad in ("not a cursor!", "abc", base64.urlsafe_b64encode(b"x" * 11).decode(), ""):
+        with pytest.raises(ValueError, match="Invalid page cursor"):
+            decode_cursor(bad)
+
+
+def test_or_bound_is_added_to_every_branch(db, monkeypatch):
+    queries = []
+    find = db.transactions.find
+    monkeypatch.setattr(db.transactions, "find", lambda query, *a, **kw: queries.append(query) or find(query, *a, **kw))
+    cursor = encode_cursor(ObjectId())
+
+    keyset_page(db.transactions, user_filter("user1", "all"), {"_id": 1}, 10, cursor)
+    bound = {"$lt": decode_cursor(cursor)}
+    assert "_id" not in queries[0]
+    assert queries[0]["$or"] == [{"customer_token": token_for("user1"), "_id": bound},
+                                 {"receiver_token": token_for("user1"), "_id": bound}]
+
+
+@pytest.mark.parametrize("direction", ["all", "sent", "received"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_pages_have_no_duplicates_or_gaps(db, direction, limit):
+    # Inserted within the same second, so every row ties on its timestamp;
+    # the self-transfer matches both $or branches
+    for i in range(7):
+        _insert(db, "user1", "saksham", i)
+        _insert(db, "saksham", "user1", i)
+    _insert(db, "user1", "user1", 99)
+    _insert(db, "admin", "saksham", 5)
+
+    expected = [doc["_id"] for doc in db.transactions.find(user_filter("user1", direction)).sort("_id", -1)]
+    assert len(expected) == {"all": 15, "sent": 8, "received": 8}[direction]
+    assert _all_pages(db, "user1", direction, limit) == expected
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    for i in range(4):
+        _insert(db, "user1", "saksham", i)
+    docs, cursor = user_transactions(db, "user1", "sent", {"_id": 1}, 2)
+    docs, cursor = user_transactions(db, "user1", "sent", {"_id": 1}, 2, cursor)
+    assert len(docs) == 2 and cursor is None
+
+
+def test_received_rows_hide_balance_and_fraud_status(db):
+    txn = db.transactions.find_one({"_id": _insert(db, "user1", "saksham", 40)})
+
+    sent = ledger_row(txn, "user1")
+    assert sent["direction"] == "sent" and sent["counterparty"] == "saksham"
+    assert sent["balance"] == 960.0 and sent["fraud_status"] == "Legit"
+
+    received = ledger_row(txn, "saksham")
+    assert received["direction"] == "received" and received["counterparty"] == "user1"
+    assert not {"balance", "fraud_status", "verified"} & set(received)
+
+
+def test_api_ledger_pages_and_rejects_bad_cursor(client, login, db):
+    for i in range(3):
+        _insert(db, "saksham", "user1", i)
+    login("user1", "1234")
+
+    first = client.get("/api/ledger?direction=received&limit=2").json
+    second = client.get(f"/api/ledger?direction=received&limit=2&cursor={first['next_cursor']}").json
+    assert [row["amount"] for row in first["transactions"] + second["transactions"]] == [2, 1, 0]
+    assert second["next_cursor"] is None
+    assert all("balance" not in row for row in first["transactions"])
+    assert client.get("/api/ledger?cursor=bogus").status_code == 400
+    assert client.get("/api/ledger?direction=sideways").status_code == 400
@@ -0,0 +1,58 @@
+import login_guard
+from login_guard import WindowCounter
+
+
+def test_lockout_after_repeated_failures(login):
+    limit = login_guard.user_failures.limit
+    for _ in range(limit):
+        assert login("user1", "wrong").data == b"Invalid credentials."
+
+    response = login("user1", "1234")
+    assert response.status_code == 429
+    # Other users are unaffected
+    assert login("saksham", "hello123").status_code == 302
+
+
+def test_successful_login_resets_failures(login):
+    limit = login_guard.user_failures.limit
+    for _ in range(limit - 1):
+        login("user1", "wrong")
+    assert login("user1", "1234").status_code == 302
+
+    for _ in range(limit - 1):
+        login("user1", "wrong")
+    assert login("user1", "1234").status_code == 302
+
+
+def test_lockout_expires_with_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(login_guard.time, "monotonic", lambda: now[0])
+    counter = WindowCounter(limit=2, window=60)
+    counter.hit("user1")
+    counter.hit("user1")
+    assert counter.exceeded("user1")
+    now[0] += 61
+    assert not counter.exceeded("user1")
+
+
+def test_full_counter_evicts_oldest_unlocked_keys():
+    counter = WindowCounter(limit=2, window=60, max_keys=3)
+    counter.hit("locked")
+    counter.hit("locked")
+    counter.hit("a")
+    counter.hit("b")
+
+    counter.hit("c")
+    assert list(counter._counts) == ["locked", "b", "c"]
+    assert counter.exceeded("locked")
+
+
+def test_full_counter_never_drops_lockouts(caplog):
+    counter = WindowCounter(limit=1, window=60, max_keys=2)
+    counter.hit("x")
+    counter.hit("y")
+
+    counter.hit("z")
+    assert counter.exceeded("x") and counter.exceeded("y")
+    assert "z" not in counter._counts
+    assert "not counting new keys" in caplog.text
@@ -0,0 +1,31 @@
+import argparse
+
+import digital_signature
+import migrate
+from encryption import encrypt_data
+from hashing import generate_hash
+
+
+def _legacy_doc(payload, **overrides):
+    hash_value = generate_hash(payload)
+    doc = {"enc_data": encrypt_data(payload), "hash": hash_value,
+           "signature_hex": digital_signature.get_signer("ed25519").sign(hash_value).hex(),
+           "signature_scheme": "ed25519"}
+    doc.update(overrides)
+    return {k: v for k, v in doc.items() if v is not None}
+
+
+def test_binary_security_skips_and_reports_docs_without_hash_or_signature(db, capsys):
+    good = db.transactions.insert_one(_legacy_doc("user1|saksham|1.0")).inserted_id
+    no_hash = db.transactions.insert_one(_legacy_doc("user1|saksham|2.0", hash=None)).inserted_id
+    no_signature = db.transactions.insert_one(_legacy_doc("user1|saksham|3.0", signature_hex=None)).inserted_id
+    bad_hex = db.transactions.insert_one(_legacy_doc("user1|saksham|4.0", signature_hex="zz")).inserted_id
+
+    migrate.migrate_binary_security(db, argparse.Namespace(batch_size=2, dry_run=False))
+
+    assert isinstance(db.transactions.find_one({"_id": good})["hash"], bytes)
+    for oid in (no_hash, no_signature, bad_hex):
+        assert isinstance(db.transactions.find_one({"_id": oid})["enc_data"], str)
+    out = capsys.readouterr().out
+    assert "transactions: 1 payloads to binary" in out
+    assert "transactions: 3 skipped" in out and str(no_hash) in out
@@ -0,0 +1,100 @@
+import pytest
+from pymongo.errors import AutoReconnect
+
+import cache
+import indexes
+from notifications import NotificationDispatcher, notify
+
+
+def _notify(*users):
+    notify([(user, f"hello {user}") for user in users], "test", "payload")
+
+
+def _unread(db, user):
+    return db.notifications.count_documents({"user_id": user, "read": False})
+
+
+def test_mark_read_by_ids(client, login, db):
+    _notify("user1", "user1", "saksham")
+    first, second = db.notifications.find({"user_id": "user1"})
+    other = db.notifications.find_one({"user_id": "saksham"})
+    login("user1", "1234")
+
+    response = client.post("/notifications/mark_read", json={"ids": [str(first["_id"]), str(other["_id"])]})
+    assert response.json == {"updated": 1}
+    read = db.notifications.find_one({"_id": first["_id"]})
+    assert read["read"] is True and "read_at" in read
+    assert "read_at" not in db.notifications.find_one({"_id": second["_id"]})
+    # Another user's notification is never touched
+    assert _unread(db, "saksham") == 1
+
+
+def test_mark_read_rejects_bad_input(client, login):
+    login("user1", "1234")
+    assert client.post("/notifications/mark_read", json={"ids": "nope"}).status_code == 400
+    assert client.post("/notifications/mark_read", json={"ids": ["0" * 24] * 101}).status_code == 400
+    assert client.post("/notifications/mark_read", json={"ids": ["not-an-id"]}).status_code == 400
+
+
+def test_mark_all_read_invalidates_unread_count(client, login, db):
+    _notify("user1", "user1")
+    login("user1", "1234")
+    client.get("/dashboard")
+    assert cache.get_cache().get("unread:user1") == 2
+
+    assert client.post("/notifications/mark_all_read", json={}).json == {"updated": 2}
+    assert _unread(db, "user1") == 0
+    assert db.notifications.count_documents({"read_at": {"$exists": True}}) == 2
+    assert cache.get_cache().get("unread:user1") is None
+
+
+def test_read_notifications_expire_via_ttl_index(db):
+    indexes.ensure_indexes(db)
+    ttl = [info for info in db.notifications.index_information().values() if "expireAfterSeconds" in info]
+    assert len(ttl) == 1
+    assert ttl[0]["key"] == [("read_at", 1)]
+    assert ttl[0]["expireAfterSeconds"] == indexes.READ_NOTIFICATION_TTL_SECONDS
+
+
+def test_partial_insert_failure_is_retried_without_duplicates(db, monkeypatch):
+    insert_many = db.notifications.insert_many
+    attempts = []
+
+    def flaky(docs, **kwargs):
+        attempts.append(len(docs))
+        if len(attempts) == 1:
+            insert_many(docs[:1], **kwargs)
+            raise AutoReconnect("connection reset")
+        return insert_many(docs, **kwargs)
+
+    monkeypatch.setattr(db.notifications, "insert_many", flaky)
+    dispatcher = NotificationDispatcher(workers=1, retry_delay_ms=1)
+    dispatcher.submit([("user1", "a"), ("saksham", "b")], "test", "payload")
+    assert dispatcher.flush(5)
+
+    assert len(attempts) == 2
+    assert db.notifications.count_documents({}) == 2
+    assert dispatcher.failed == 0
+
+
+def test_batch_is_dropped_and_logged_after_retries(db, monkeypatch, caplog):
+    def down(docs, **kwargs):
+        raise AutoReconnect("down")
+
+    monkeypatch.setattr(db.notifications, "insert_many", down)
+    dispatcher = NotificationDispatcher(workers=1, retries=2, retry_delay_ms=1)
+    dispatcher.submit([("user1", "a")], "test", "payload")
+    assert dispatcher.flush(5)
+
+    assert dispatcher.failed == 1
+    assert caplog.text.count("retry") == 2
+    assert "notification dispatch failed (1 events dropped)" in caplog.text
+
+
+def test_synchronous_dispatch_raises_after_retries(db, monkeypatch):
+    def down(docs, **kwargs):
+        raise AutoReconnect("down")
+
+    monkeypatch.setattr(db.notifications, "insert_many", down)
+    with pytest.raises(AutoReconnect):
+        NotificationDispatcher(workers=0, retries=1, retry_delay_ms=1).submit([("user1", "a")], "test", "payload")
@@ -0,0 +1,142 @@
+import pytest
+from bson.objectid import ObjectId
+
+import reversal
+from conftest import SEED_BALANCE
+from reversal import reverse_logs
+from transfer import transfer_funds
+
+
+def _balances(db):
+    return {u["username"]: u["balance"] for u in db.users.find({}, {"_id": 0, "username": 1, "balance": 1})}
+
+
+def _transfer(db, sender, receiver, amount):
+    """A transfer with the log fields app.py writes; returns the log id."""
+    def build_documents(sender_balance):
+        txn = {"customer_id": sender, "receiver_id": receiver, "amount": float(amount),
+               "merchant": "Groceries", "card_type": "Student", "fraud_status": "Legit", "verified": True}
+        log = {"customer_id": sender, "receiver_id": receiver, "amount": float(amount),
+               "status": "completed", "can_undo": True}
+        return txn, log
+
+    result = transfer_funds(db, sender, receiver, amount, build_documents, use_transaction=False)
+    return str(db.transaction_logs.find_one({"transaction_id": str(result.transaction_id)})["_id"])
+
+
+def _log(db, log_id):
+    return db.transaction_logs.find_one({"_id": ObjectId(log_id)})
+
+
+def test_batch_is_netted_into_one_write_per_user(db, monkeypatch):
+    log_ids = [_transfer(db, "user1", "saksham", 100), _transfer(db, "saksham", "admin", 40),
+               _transfer(db, "admin", "user1", 15), _transfer(db, "user1", "saksham", 5)]
+    writes = []
+    bulk_write = db.users.bulk_write
+    monkeypatch.setattr(db.users, "bulk_write", lambda ops, **kw: writes.append(len(ops)) or bulk_write(ops, **kw))
+
+    results = reverse_logs(db, log_ids, "admin", use_transaction=False)
+    assert [r["ok"] for r in results] == [True] * 4
+    assert writes == [3]
+    assert _balances(db) == {"user1": SEED_BALANCE, "saksham": SEED_BALANCE, "admin": SEED_BALANCE}
+    assert db.transactions.count_documents({"reversed": True}) == 4
+    assert all(_log(db, log_id)["status"] == "undone" for log_id in log_ids)
+
+
+def test_receiver_without_funds_is_rejected_and_restored(db):
+    first = _transfer(db, "user1", "saksham", 100)
+    spent = _transfer(db, "saksham", "admin", SEED_BALANCE + 50)
+
+    [result] = reverse_logs(db, [first], "admin", use_transaction=False)
+    assert result["error"] == "Cannot undo: Receiver has insufficient balance"
+    log = _log(db, first)
+    assert log["status"] == "completed" and log["can_undo"] is True
+    assert "undo_batch" not in log and "undone_by" not in log
+    assert _balances(db)["saksham"] == 50
+
+    # Undone together, the earlier reversal in the batch funds the later one
+    results = reverse_logs(db, [spent, first], "admin", use_transaction=False)
+    assert [r["ok"] for r in results] == [True, True]
+    assert set(_balances(db).values()) == {SEED_BALANCE}
+
+
+def test_duplicate_invalid_and_unknown_ids(db):
+    log_id = _transfer(db, "user1", "saksham", 10)
+    results = reverse_logs(db, [log_id, log_id, "not-an-id", "0" * 24], "admin", use_transaction=False)
+
+    assert [r["ok"] for r in results] == [True, True, False, False]
+    assert results[2]["error"] == "Invalid log id"
+    assert results[3]["error"] == "Transaction log not found"
+    # Reversed once, not twice
+    assert _balances(db)["user1"] == SEED_BALANCE
+
+
+def test_already_undone_and_not_undoable_logs(db):
+    undone = _transfer(db, "user1", "saksham", 10)
+    locked = _transfer(db, "user1", "saksham", 20)
+    db.transaction_logs.update_one({"_id": _log(db, locked)["_id"]}, {"$set": {"can_undo": False}})
+    reverse_logs(db, [undone], "admin", use_transaction=False)
+
+    results = reverse_logs(db, [undone, locked], "admin", use_transaction=False)
+    assert [r["error"] for r in results] == ["Transaction already undone", "Transaction cannot be undone"]
+    assert _balances(db)["user1"] == SEED_BALANCE - 20
+
+
+def test_concurrent_claim_reverses_once(db, monkeypatch):
+    log_id = _transfer(db, "user1", "saksham", 10)
+    apply = reversal._apply
+
+    def racing_apply(*args, **kwargs):
+        # Another admin undoes the same log after this call read it
+        monkeypatch.setattr(reversal, "_apply", apply)
+        assert reverse_logs(db, [log_id], "other-admin", use_transaction=False)[0]["ok"]
+        return apply(*args, **kwargs)
+
+    monkeypatch.setattr(reversal, "_apply", racing_apply)
+    [result] = reverse_logs(db, [log_id], "admin", use_transaction=False)
+    assert result["error"] == "Transaction already undone"
+    assert _log(db, log_id)["undone_by"] == "other-admin"
+    assert _balances(db)["user1"] == SEED_BALANCE
+
+
+def test_failure_after_balances_moved_keeps_the_claim(db, monkeypatch):
+    log_id = _transfer(db, "user1", "saksham", 10)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(db.transactions, "update_many", fail)
+    with pytest.raises(RuntimeError):
+        reverse_logs(db, [log_id], "admin", use_transaction=False)
+    monkeypatch.undo()
+
+    assert _log(db, log_id)["status"] == "undone"
+    assert reverse_logs(db, [log_id], "admin", use_transaction=False)[0]["error"] == "Transaction already undone"
+    assert _balances(db)["user1"] == SEED_BALANCE
+
+
+def test_failure_before_balances_moved_releases_the_claim(db, monkeypatch):
+    log_id = _transfer(db, "user1", "saksham", 10)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(db.users, "bulk_write", fail)
+    with pytest.raises(RuntimeError):
+        reverse_logs(db, [log_id], "admin", use_transaction=False)
+    monkeypatch.undo()
+
+    assert _log(db, log_id)["can_undo"] is True
+    assert reverse_logs(db, [log_id], "admin", use_transaction=False)[0]["ok"]
+
+
+def test_undo_batch_endpoint(client, login, db):
+    log_ids = [_transfer(db, "user1", "saksham", 10), _transfer(db, "user1", "saksham", 20)]
+    login("user1", "1234")
+    assert client.post("/admin/undo_batch", json={"log_ids": log_ids}).status_code == 302
+
+    login("admin", "admin", "admin")
+    assert client.post("/admin/undo_batch", json={"log_ids": "nope"}).status_code == 400
+    response = client.post("/admin/undo_batch", json={"log_ids": log_ids + ["bad"]})
+    assert response.json["reversed"] == 2 and response.json["failed"] == 1
+    assert _balances(db)["user1"] == SEED_BALANCE
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson.objectid import ObjectId
+
+import rollups
+
+
+@pytest.fixture(autouse=True)
+def _day_key(monkeypatch):
+    # mongomock has no $toDate; every test transaction is created today
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    monkeypatch.setattr(rollups, "DAY_KEY", {"$literal": today})
+
+
+def _insert(db, **fields):
+    txn = dict({"_id": ObjectId(), "customer_id": "user1", "merchant": "Groceries", "card_type": "Student",
+                "fraud_status": "Legit", "verified": True, "amount": 10.0}, **fields)
+    db.transactions.insert_one(txn)
+    rollups.record_transaction(db, txn)
+    return txn
+
+
+def _rollups(db):
+    return {doc.pop("_id"): doc for doc in db.stats_rollups.find({})}
+
+
+def test_reconcile_matches_incremental_rollups(db):
+    for _ in range(3):
+        rollups.record_user(db)
+    _insert(db)
+    _insert(db, merchant="Travel", fraud_status="Fraudulent", amount=99.5)
+    _insert(db, customer_id="saksham", card_type="Gold", verified=False, amount=1.25)
+    undone = _insert(db, amount=40.0)
+    db.transactions.update_one({"_id": undone["_id"]}, {"$set": {"reversed": True}})
+    rollups.record_reversals(db, [undone])
+
+    assert rollups.get_stats(db) == {"transactions": 3, "fraudulent": 1, "verified": 2,
+                                     "volume": pytest.approx(110.75), "users": 3, "reversed": 1}
+    assert rollups.get_user_stats(db, "user1")["transactions"] == 2
+    assert rollups.reconcile(db) == {}
+
+
+def test_reconcile_fixes_drift_and_removes_stale_buckets(db):
+    for _ in range(3):
+        rollups.record_user(db)
+    _insert(db)
+    db.stats_rollups.update_one({"_id": rollups.GLOBAL_ID}, {"$inc": {"transactions": 5, "volume": 1.5}})
+    db.stats_rollups.insert_one({"_id": "merchant:Gone", "transactions": 1})
+
+    drift = rollups.reconcile(db)
+    assert set(drift) == {rollups.GLOBAL_ID, "merchant:Gone"}
+    assert rollups.get_stats(db)["transactions"] == 1
+    assert rollups.get_stats(db)["volume"] == pytest.approx(10.0)
+    assert "merchant:Gone" not in _rollups(db)
+    assert rollups.reconcile(db) == {}
+
+
+def test_reconcile_keeps_concurrent_increments(db, monkeypatch):
+    for _ in range(3):
+        rollups.record_user(db)
+    _insert(db)
+    db.stats_rollups.update_one({"_id": rollups.GLOBAL_ID}, {"$inc": {"transactions": 5}})
+    bulk_write = db.stats_rollups.bulk_write
+
+    def increment_then_write(ops, **kwargs):
+        # A transaction counted between reconcile's read and its write
+        db.stats_rollups.update_one({"_id": rollups.GLOBAL_ID}, {"$inc": {"transactions": 1}})
+        return bulk_write(ops, **kwargs)
+
+    monkeypatch.setattr(db.stats_rollups, "bulk_write", increment_then_write)
+    rollups.reconcile(db)
+    # The drift of 5 is removed and the concurrent +1 survives
+    assert rollups.get_stats(db)["transactions"] == 2
@@ -0,0 +1,26 @@
+import os
+
+from runtime import ProcessLocal, env_int
+
+
+def test_env_int_falls_back_on_missing_or_malformed(monkeypatch):
+    monkeypatch.setenv("SAFEPAY_TEST_INT", "12")
+    assert env_int("SAFEPAY_TEST_INT", 3) == 12
+    monkeypatch.setenv("SAFEPAY_TEST_INT", "twelve")
+    assert env_int("SAFEPAY_TEST_INT", 3) == 3
+    monkeypatch.delenv("SAFEPAY_TEST_INT")
+    assert env_int("SAFEPAY_TEST_INT", 3) == 3
+
+
+def test_process_local_builds_once_per_process(monkeypatch):
+    builds = []
+    local = ProcessLocal(lambda: builds.append(1) or len(builds))
+    assert not local.started()
+    assert local.get() == local.get() == 1
+    assert local.started()
+
+    # A forked child rebuilds on first use
+    parent = os.getpid()
+    monkeypatch.setattr(os, "getpid", lambda: parent + 1)
+    assert not local.started()
+    assert local.get() == local.get() == 2
@@ -0,0 +1,36 @@
+import pytest
+
+from scoring import MicroBatcher
+
+
+def _score_batch(items):
+    if "bad" in items:
+        raise ValueError("unknown Card_Type")
+    return [f"scored {item}" for item in items]
+
+
+def test_batch_failure_only_fails_the_bad_item():
+    calls = []
+
+    def score_batch(items):
+        calls.append(list(items))
+        return _score_batch(items)
+
+    # A long wait window so all three land in one batch
+    batcher = MicroBatcher(score_batch, max_batch_size=3, max_wait_ms=1000)
+    futures = [batcher.submit(item) for item in ("a", "bad", "b")]
+
+    assert futures[0].result(5) == "scored a"
+    assert futures[2].result(5) == "scored b"
+    with pytest.raises(ValueError, match="unknown Card_Type"):
+        futures[1].result(5)
+    assert calls[0] == ["a", "bad", "b"]
+    assert calls[1:] == [["a"], ["bad"], ["b"]]
+
+
+def test_single_item_failure_is_raised_to_its_caller():
+    batcher = MicroBatcher(_score_batch, max_batch_size=1)
+    with pytest.raises(ValueError):
+        batcher.score("bad", timeout=5)
+    # The worker survives and keeps serving
+    assert batcher.score("ok", timeout=5) == "scored ok"
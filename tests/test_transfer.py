@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import SEED_BALANCE, TRANSACTION_FORM
+from transfer import transfer_funds
+
+
+def _balances(db):
+    return {u["username"]: u["balance"] for u in db.users.find({}, {"_id": 0, "username": 1, "balance": 1})}
+
+
+def _build_documents(sender_balance):
+    return {"note": "txn"}, {"note": "log"}
+
+
+def test_transfer_moves_money_and_records_balances(db):
+    result = transfer_funds(db, "user1", "saksham", 125.5, _build_documents, use_transaction=False)
+
+    assert _balances(db) == {"user1": SEED_BALANCE - 125.5, "saksham": SEED_BALANCE + 125.5, "admin": SEED_BALANCE}
+    txn = db.transactions.find_one({"_id": result.transaction_id})
+    log = db.transaction_logs.find_one({"transaction_id": str(result.transaction_id)})
+    assert txn["balance"] == SEED_BALANCE - 125.5
+    assert log["sender_balance_before"] == SEED_BALANCE
+    assert log["sender_balance_after"] == SEED_BALANCE - 125.5
+    assert log["receiver_balance_before"] == SEED_BALANCE
+    assert log["receiver_balance_after"] == SEED_BALANCE + 125.5
+
+
+def test_transfers_conserve_money(db):
+    for sender, receiver, amount in [("user1", "saksham", 10), ("saksham", "admin", 20.25), ("admin", "user1", 5)]:
+        transfer_funds(db, sender, receiver, amount, _build_documents, use_transaction=False)
+
+    assert sum(_balances(db).values()) == pytest.approx(3 * SEED_BALANCE)
+    assert db.transactions.count_documents({}) == 3
+    assert db.transaction_logs.count_documents({}) == 3
+
+
+@pytest.mark.parametrize("sender, receiver, amount, message", [
+    ("user1", "user1", 10, "Cannot transfer to self"),
+    ("user1", "saksham", 0, "Insufficient balance"),
+    ("user1", "saksham", SEED_BALANCE + 1, "Insufficient balance"),
+    ("nobody", "saksham", 10, "Sender not found"),
+    ("user1", "nobody", 10, "Receiver not found"),
+])
+def test_rejected_transfers_change_nothing(db, sender, receiver, amount, message):
+    built = []
+
+    def build_documents(sender_balance):
+        built.append(sender_balance)
+        return {}, {}
+
+    with pytest.raises(ValueError, match=message):
+        transfer_funds(db, sender, receiver, amount, build_documents, use_transaction=False)
+    assert built == []
+    assert set(_balances(db).values()) == {SEED_BALANCE}
+    assert db.transactions.count_documents({}) == 0
+
+
+def test_failed_log_insert_is_compensated(db, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(db.transaction_logs, "insert_one", fail)
+    with pytest.raises(RuntimeError):
+        transfer_funds(db, "user1", "saksham", 100, _build_documents, use_transaction=False)
+    assert set(_balances(db).values()) == {SEED_BALANCE}
+    assert db.transactions.count_documents({}) == 0
+
+
+def test_transaction_route(client, login, db):
+    login("user1", "1234")
+    response = client.post("/transaction", data=dict(TRANSACTION_FORM, Transaction_Amount="100"))
+    assert response.status_code == 200
+    assert _balances(db)["user1"] == SEED_BALANCE - 100
+
+    response = client.post("/transaction", data=dict(TRANSACTION_FORM, Transaction_Amount="999999"))
+    assert b"Insufficient balance" in response.data
+    response = client.post("/transaction", data=dict(TRANSACTION_FORM, Receiver_ID="nobody"))
+    assert b"Receiver not found" in response.data
+    assert db.transactions.count_documents({}) == 1
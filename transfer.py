@@ -0,0 +1,146 @@
+import os
+from collections import namedtuple
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+
+TransferResult = namedtuple(
+    "TransferResult",
+    ["transaction_id", "sender_balance", "receiver_balance", "transaction", "log"],
+)
+
+
+def _use_transactions() -> bool:
+    # Multi-document transactions need a replica set (Atlas always is one).
+    return os.environ.get("SAFEPAY_TRANSFER_TRANSACTIONS", "0").lower() in ("1", "true", "yes")
+
+
+def _debit(db, sender_id, amount, session=None):
+    """Atomically take `amount` from sender if the balance covers it.
+
+    Returns the sender's balance before the debit.
+    """
+    before = db.users.find_one_and_update(
+        {"username": sender_id, "balance": {"$gte": amount}},
+        {"$inc": {"balance": -amount}},
+        projection={"_id": 0, "balance": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+    if before is None:
+        # Only the failure path pays for the extra read.
+        if db.users.find_one({"username": sender_id}, {"_id": 1}, session=session) is None:
+            raise ValueError("Sender not found")
+        raise ValueError("Insufficient balance")
+    return float(before.get("balance", 0.0))
+
+
+def _credit(db, receiver_id, amount, session=None):
+    """Atomically add `amount` to receiver; returns the balance before."""
+    before = db.users.find_one_and_update(
+        {"username": receiver_id},
+        {"$inc": {"balance": amount}},
+        projection={"_id": 0, "balance": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+    if before is None:
+        raise ValueError("Receiver not found")
+    return float(before.get("balance", 0.0))
+
+
+def _record_balances(txn_doc, log_doc, sender_balance, receiver_balance, amount):
+    """Write the balances the debit and credit actually saw into the documents."""
+    txn_doc["balance"] = sender_balance - amount
+    log_doc.update(
+        sender_balance_before=sender_balance,
+        sender_balance_after=sender_balance - amount,
+        receiver_balance_before=receiver_balance,
+        receiver_balance_after=receiver_balance + amount,
+    )
+
+
+def _apply(db, sender_id, receiver_id, amount, txn_doc, log_doc, session=None):
+    # Only the four writes happen here; documents are built beforehand so a
+    # transaction retry does not redo encryption, signing or scoring.
+    sender_balance = _debit(db, sender_id, amount, session)
+    try:
+        receiver_balance = _credit(db, receiver_id, amount, session)
+    except Exception:
+        if session is None:
+            db.users.update_one({"username": sender_id}, {"$inc": {"balance": amount}})
+        raise
+
+    txn_id = ObjectId()
+    txn_doc = dict(txn_doc, _id=txn_id)
+    log_doc = dict(log_doc, transaction_id=str(txn_id))
+    _record_balances(txn_doc, log_doc, sender_balance, receiver_balance, amount)
+    try:
+        db.transactions.insert_one(txn_doc, session=session)
+        db.transaction_logs.insert_one(log_doc, session=session)
+    except Exception:
+        if session is None:
+            # Best-effort compensation so a failed record never leaves money
+            # moved or a transaction without its log.
+            db.transactions.delete_one({"_id": txn_id})
+            db.users.update_one({"username": receiver_id}, {"$inc": {"balance": -amount}})
+            db.users.update_one({"username": sender_id}, {"$inc": {"balance": amount}})
+        raise
+
+    return TransferResult(txn_id, sender_balance, receiver_balance, txn_doc, log_doc)
+
+
+def _check_accounts(db, sender_id, receiver_id, amount):
+    """Reject unknown accounts and uncovered amounts up front; return the sender's balance.
+
+    Only a fast path: the debit re-checks the balance atomically.
+    """
+    users = {
+        u["username"]: u
+        for u in db.users.find({"username": {"$in": [sender_id, receiver_id]}}, {"_id": 0, "username": 1, "balance": 1})
+    }
+    if sender_id not in users:
+        raise ValueError("Sender not found")
+    if receiver_id not in users:
+        raise ValueError("Receiver not found")
+    balance = float(users[sender_id].get("balance", 0.0))
+    if balance < amount:
+        raise ValueError("Insufficient balance")
+    return balance
+
+
+def transfer_funds(db, sender_id, receiver_id, amount, build_documents, use_transaction=None):
+    """Move `amount` from sender to receiver and record the transaction.
+
+    `build_documents(sender_balance)` receives the sender's balance as read
+    before the transfer and must return the (transaction, log) documents to
+    insert. It runs before any money moves, so expensive work (encryption,
+    signing, fraud scoring) is outside the debit/credit window and is never
+    repeated by a transaction retry. The engine then fills in the balances
+    the writes actually saw (`balance` on the transaction, the
+    `*_balance_before/after` fields on the log) and the `transaction_id`.
+
+    The debit is guarded by `balance >= amount` and both balance changes use
+    `$inc`, so concurrent transfers never fail on a stale read. With
+    `use_transaction` (default: SAFEPAY_TRANSFER_TRANSACTIONS) all four
+    writes run in one multi-document transaction; otherwise failed steps are
+    compensated.
+    """
+    amount = float(amount)
+    if sender_id == receiver_id:
+        raise ValueError("Cannot transfer to self")
+    if amount <= 0:
+        raise ValueError("Insufficient balance")
+
+    sender_balance = _check_accounts(db, sender_id, receiver_id, amount)
+    txn_doc, log_doc = build_documents(sender_balance)
+
+    if use_transaction is None:
+        use_transaction = _use_transactions()
+    if not use_transaction:
+        return _apply(db, sender_id, receiver_id, amount, txn_doc, log_doc)
+
+    with db.client.start_session() as session:
+        return session.with_transaction(
+            lambda s: _apply(db, sender_id, receiver_id, amount, txn_doc, log_doc, session=s)
+        )